@@ -62,8 +62,8 @@ const AdminDashboard = () => {
             const formData = new FormData();
             formData.append('file', file);
             try {
-                await axios.post(`http://127.0.0.1:8000/api/ai/admin/${endpoint}`, formData);
-                alert("Upload Successful!");
+                const res = await axios.post(`http://127.0.0.1:8000/api/ai/admin/${endpoint}`, formData);
+                alert(res.data.job_id ? "Upload received! Indexing is running in the background." : "Upload Successful!");
                 fetchFiles();
             } catch (err) { alert("Upload Failed"); }
         };
@@ -73,7 +73,7 @@ const AdminDashboard = () => {
     const handleDeleteFile = async (type, filename) => {
         if (window.confirm(`Delete ${filename} from ${type.toUpperCase()}?`)) {
             try {
-                await axios.delete(`http://127.0.0.1:8000/api/ai/files/${type}/${filename}`);
+                await axios.delete(`http://127.0.0.1:8000/api/ai/files/${type}/${encodeURIComponent(filename)}`);
                 fetchFiles();
             } catch (err) { alert("Delete failed"); }
         }
@@ -11,9 +11,11 @@ const AgentDashboard = () => {
 
     const fetchStats = async () => {
         try {
-            const res = await axios.get('http://127.0.0.1:8000/api/tickets/all'); // Admin/Agent endpoint
-            const open = res.data.filter(t => t.status === 'Open').length;
-            const closed = res.data.filter(t => t.status === 'Completed').length;
+            // Precomputed counters; no need to download every ticket
+            const res = await axios.get('http://127.0.0.1:8000/api/tickets/stats');
+            const byStatus = res.data.by_status || {};
+            const open = byStatus['Open'] || 0;
+            const closed = byStatus['Completed'] || 0;
             setStats({ open, closed, queueSize: open });
         } catch (err) { console.error(err); }
     };
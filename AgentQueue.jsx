@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { 
     Edit2, Save, X, Bot, Send, User, 
@@ -7,6 +7,7 @@ import {
 
 const AgentQueue = () => {
     const [tickets, setTickets] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [filter, setFilter] = useState('All');
     const [selectedTicket, setSelectedTicket] = useState(null);
     const [editMode, setEditMode] = useState(false);
@@ -16,16 +17,45 @@ const AgentQueue = () => {
     const [isPreviewOpen, setIsPreviewOpen] = useState(false);
 
     // --- DATA FETCHING ---
-    const fetchQueue = async () => {
+    const requestQueue = async (cursor = null) => {
+        const token = localStorage.getItem('token');
+        const params = { limit: 50 };
+        if (filter !== 'All') params.category = filter;
+        if (cursor) params.cursor = cursor;
+        const res = await axios.get('http://127.0.0.1:8000/api/tickets/queue', {
+            headers: { 'Authorization': `Bearer ${token}` },
+            params
+        });
+        return res.data;
+    };
+
+    // Server-side filtered, cursor-paginated queue (pass a cursor to append the next page)
+    const fetchQueue = async (cursor = null) => {
         try {
-            const token = localStorage.getItem('token');
-            const res = await axios.get('http://127.0.0.1:8000/api/tickets/all', {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
-            setTickets(res.data);
+            const data = await requestQueue(cursor);
+            setTickets(cursor ? (prev) => [...prev, ...data.items] : data.items);
+            setNextCursor(data.next_cursor);
         } catch (err) { console.error("Error fetching queue", err); }
     };
 
+    // Merges the newest page into the loaded rows, keeping pages added with Load More
+    const refreshHead = async () => {
+        try {
+            const data = await requestQueue();
+            setTickets(prev => {
+                const fresh = new Set(data.items.map(t => t.id));
+                return [...data.items, ...prev.filter(t => !fresh.has(t.id))];
+            });
+        } catch (err) { console.error("Error refreshing queue", err); }
+    };
+
+    // Applies an event's fields to the loaded row; rows that leave the category filter are dropped
+    const patchTicket = (ticketId, fields) => {
+        setTickets(prev => prev
+            .map(t => t.id === ticketId ? { ...t, ...fields } : t)
+            .filter(t => t.id !== ticketId || filter === 'All' || t.category === filter));
+    };
+
     const fetchMessages = async (ticketId) => {
         try {
             const token = localStorage.getItem('token');
@@ -39,7 +69,35 @@ const AgentQueue = () => {
         }
     };
 
-    useEffect(() => { fetchQueue(); }, []);
+    useEffect(() => { fetchQueue(); }, [filter]);
+
+    // Live queue updates pushed by the server instead of polling: known rows are
+    // patched from the event, and bursts of new tickets share one debounced refetch
+    const refreshTimer = useRef(null);
+    useEffect(() => {
+        const scheduleRefresh = () => {
+            clearTimeout(refreshTimer.current);
+            refreshTimer.current = setTimeout(refreshHead, 500);
+        };
+        const source = new EventSource(`http://127.0.0.1:8000/api/tickets/events?channel=tickets&token=${encodeURIComponent(localStorage.getItem('token'))}`);
+        source.addEventListener('ticket.created', scheduleRefresh);
+        ['ticket.triaged', 'ticket.triage_failed', 'ticket.updated'].forEach(type =>
+            source.addEventListener(type, (e) => {
+                const event = JSON.parse(e.data);
+                patchTicket(event.ticket_id, event.data);
+                // A ticket triaged into the filtered category is not loaded yet
+                if (filter !== 'All' && event.data.category === filter) scheduleRefresh();
+            })
+        );
+        source.addEventListener('message.created', (e) => {
+            const event = JSON.parse(e.data);
+            if (event.data.ticket_status) patchTicket(event.ticket_id, { status: event.data.ticket_status });
+        });
+        return () => {
+            source.close();
+            clearTimeout(refreshTimer.current);
+        };
+    }, [filter]);
 
     useEffect(() => {
         if (selectedTicket) {
@@ -47,6 +105,17 @@ const AgentQueue = () => {
         }
     }, [selectedTicket]);
 
+    // Live thread updates for the open ticket
+    useEffect(() => {
+        if (!selectedTicket) return;
+        const source = new EventSource(`http://127.0.0.1:8000/api/tickets/events?channel=ticket:${selectedTicket.id}&token=${encodeURIComponent(localStorage.getItem('token'))}`);
+        source.addEventListener('message.created', (e) => {
+            const msg = JSON.parse(e.data).data;
+            setChatHistory(prev => prev.some(m => m.id === msg.id) ? prev : [...prev, msg]);
+        });
+        return () => source.close();
+    }, [selectedTicket?.id]);
+
     // --- HANDLERS ---
     const handleSelectTicket = (ticket) => {
         console.log('Selecting ticket:', ticket); // Debug log
@@ -68,7 +137,6 @@ const AgentQueue = () => {
             });
             setResponse('');
             fetchMessages(selectedTicket.id);
-            fetchQueue();
         } catch (err) { alert("Failed to send response. The ticket might be closed."); }
     };
 
@@ -84,13 +152,13 @@ const AgentQueue = () => {
                 headers: { 'Authorization': `Bearer ${token}` }
             });
             setEditMode(false);
-            fetchQueue();
+            patchTicket(selectedTicket.id, editData);
             setSelectedTicket({ ...selectedTicket, ...editData });
             alert("Triage updated!");
         } catch (err) { alert("Failed to update ticket. Completed tickets cannot be edited."); }
     };
 
-    const filteredTickets = filter === 'All' ? tickets : tickets.filter(t => t.category === filter);
+    const filteredTickets = tickets;
 
     // --- DETAIL VIEW ---
     if (selectedTicket) { 
@@ -300,6 +368,13 @@ const AgentQueue = () => {
                     </tbody>
                 </table>
             </div>
+            {nextCursor && (
+                <div className="flex justify-center">
+                    <button onClick={() => fetchQueue(nextCursor)} className="px-6 py-2 rounded-xl text-sm font-bold transition-all hover:shadow-lg" style={{backgroundColor: '#bc9d6e', color: 'white'}}>
+                        Load More
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -61,6 +61,24 @@ const CustomerDashboard = () => {
         fetchMyTickets(); 
     }, []);
 
+    // Live replies and status changes for the open ticket
+    useEffect(() => {
+        if (!selectedTicket) return;
+        const source = new EventSource(`http://127.0.0.1:8000/api/tickets/events?channel=ticket:${selectedTicket.id}&token=${encodeURIComponent(localStorage.getItem('token'))}`);
+        source.addEventListener('message.created', (e) => {
+            const msg = JSON.parse(e.data).data;
+            setMessages(prev => prev.some(m => m.id === msg.id) ? prev : [...prev, msg]);
+            setSelectedTicket(prev => prev && { ...prev, status: msg.ticket_status });
+        });
+        ['ticket.updated', 'ticket.triaged'].forEach(type =>
+            source.addEventListener(type, (e) => {
+                const update = JSON.parse(e.data).data;
+                setSelectedTicket(prev => prev && { ...prev, ...update });
+            })
+        );
+        return () => source.close();
+    }, [selectedTicket?.id]);
+
     const handleLogout = () => {
         localStorage.clear();
         navigate('/');
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Search, HelpCircle, Book, MessageCircle, ArrowRight, User, ShieldCheck } from 'lucide-react';
 import axios from 'axios';
@@ -46,13 +46,55 @@ const Home = () => {
         }
     };
 
-    // Task 3: KB Search
+    // FAQ typeahead: served from the in-memory index, so it can run on every keystroke.
+    // Each keystroke aborts the previous request so a slow, stale response never overwrites newer results.
+    const suggestRequest = useRef(null);
+    const handleFaqType = async (value) => {
+        setFaqQuery(value);
+        suggestRequest.current?.abort();
+        if (!value.trim()) {
+            suggestRequest.current = null;
+            setFaqResults([]);
+            return;
+        }
+        const controller = new AbortController();
+        suggestRequest.current = controller;
+        try {
+            const res = await axios.get('http://127.0.0.1:8000/api/ai/faq/suggest', {
+                params: { q: value, limit: 5 },
+                signal: controller.signal
+            });
+            if (suggestRequest.current === controller) setFaqResults(res.data);
+        } catch (err) {
+            if (!axios.isCancel(err)) console.error(err);
+        }
+    };
+
+    // Task 3: KB Search (streamed so the answer appears token by token)
     const handleKbSearch = async () => {
         const formData = new FormData();
         formData.append('question', kbQuery);
+        setKbAnswer('');
         try {
-            const res = await axios.post('http://127.0.0.1:8000/api/ai/ask', formData);
-            setKbAnswer(res.data.answer);
+            const res = await fetch('http://127.0.0.1:8000/api/ai/ask/stream', { method: 'POST', body: formData });
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const eventLine = raw.split('\n').find(l => l.startsWith('event: '));
+                    const dataLine = raw.split('\n').find(l => l.startsWith('data: '));
+                    if (!eventLine || !dataLine) continue;
+                    const data = JSON.parse(dataLine.slice(6));
+                    if (eventLine.slice(7) === 'token') setKbAnswer(prev => prev + data.text);
+                    if (eventLine.slice(7) === 'error') console.error(data.detail);
+                }
+            }
         } catch (err) { console.error(err); }
     };
 
@@ -108,6 +150,12 @@ const Home = () => {
                         <h2 className="text-2xl font-bold text-slate-800">Quick FAQs</h2>
                     </div>
                     <div className="mb-6">
+                        <input 
+                            type="text" placeholder="Search FAQs..."
+                            className="w-full p-3 mb-3 rounded-2xl outline-none transition-all" style={{backgroundColor: 'rgba(255, 255, 255, 0.9)', color: '#569296'}}
+                            value={faqQuery}
+                            onChange={(e) => handleFaqType(e.target.value)}
+                        />
                         <select 
                             className="w-full p-3 rounded-2xl outline-none transition-all cursor-pointer" 
                             style={{backgroundColor: 'rgba(255, 255, 255, 0.9)', color: '#569296'}}
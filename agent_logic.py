@@ -1,49 +1,20 @@
-import io
 import os
 import json
-import PyPDF2
-import os
-from docx import Document
-from groq import Groq
+from app.services.llm_gateway import llm_gateway
+from app.services.attachment_text import get_attachment_text
 
-# 1. Setup
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY)
+# 1. Setup: all calls go through the shared LLM gateway (Groq, or the fake client when LLM_BACKEND=fake)
+TRIAGE_MODEL = "llama-3.3-70b-versatile"
 
-def get_clean_text(file_path):
-    """Detects file type and extracts text from attachments."""
-    if not file_path or not os.path.exists(file_path):
-        return "No attachment content available."
-        
-    try:
-        if file_path.lower().endswith(".pdf"):
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                return " ".join([p.extract_text() for p in reader.pages])
-        
-        elif file_path.lower().endswith(".docx"):
-            doc = Document(file_path)
-            return " ".join([p.text for p in doc.paragraphs])
-        
-        elif file_path.lower().endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
+# Only this much attachment text is sent to the LLM, so extraction stops there
+TRIAGE_ATTACHMENT_CHARS = 2000
 
-    except Exception as e:
-        return f"Extraction Error: {str(e)}"
-    return ""
+def get_clean_text(file_path, max_chars=None):
+    """Detects file type and extracts text from attachments (cached by content hash)."""
+    return get_attachment_text(file_path, max_chars)
 
-def agent_triage(file_path, user_msg):
-    """Main AI function that processes the real user message and file content."""
-    content = get_clean_text(file_path)
-    
-    prompt = f"""
-    Role: Senior Support Triage Agent
-    Inputs: 
-      - Message: {user_msg}
-      - Attachment: {content[:2000]} 
-
-    Task:
+# Shared by single and batched triage so both classify the same way
+TRIAGE_RULES = """
     1. Classify into EXACTLY ONE category: [IT, HR, Facilities]. 
        - Facilities: Office maintenance, HotDesk bookings, gym access, cafeteria, fire drills, gates, building security.
        - IT: Software errors, VPN, MFA, hardware breakages, password locks, Wi-Fi.
@@ -55,7 +26,36 @@ def agent_triage(file_path, user_msg):
        - High: ACTIVE safety hazards (not drills), total work-stoppers (cannot log in), hardware breakages, or system outages.
 
     3. Summarize the issue in exactly 2 concise bullet points.
+"""
+
+# Batched triage: tickets per request and per-ticket input limits (override via environment)
+TRIAGE_BATCH_SIZE = int(os.getenv("TRIAGE_BATCH_SIZE", "10"))
+TRIAGE_BATCH_MESSAGE_CHARS = int(os.getenv("TRIAGE_BATCH_MESSAGE_CHARS", "1500"))
+TRIAGE_BATCH_ATTACHMENT_CHARS = int(os.getenv("TRIAGE_BATCH_ATTACHMENT_CHARS", "500"))
+
+def _normalize_triage(result):
+    # REFINEMENT: Ensure assigned_to is a single string for the database
+    if "/" in result['assigned_to']:
+        result['assigned_to'] = result['assigned_to'].split("/")[0].strip()
+    
+    # REFINEMENT: Flatten ai_summary to string to avoid MySQL Operand Errors
+    if isinstance(result['ai_summary'], list):
+        result['ai_summary'] = " ".join(result['ai_summary'])
+    
+    return result
 
+def agent_triage(file_path, user_msg):
+    """Main AI function that processes the real user message and file content."""
+    content = get_clean_text(file_path, TRIAGE_ATTACHMENT_CHARS)
+    
+    prompt = f"""
+    Role: Senior Support Triage Agent
+    Inputs: 
+      - Message: {user_msg}
+      - Attachment: {content[:TRIAGE_ATTACHMENT_CHARS]} 
+
+    Task:
+{TRIAGE_RULES}
     Return ONLY JSON:
     {{
         "assigned_to": "IT/HR/Facilities",
@@ -64,20 +64,60 @@ def agent_triage(file_path, user_msg):
     }}
     """
     
-    response = client.chat.completions.create(
+    content = llm_gateway.complete(
         messages=[{"role": "user", "content": prompt}],
-        model="llama-3.3-70b-versatile",
+        model=TRIAGE_MODEL,
         response_format={"type": "json_object"}
     )
     
-    result = json.loads(response.choices[0].message.content)
+    result = json.loads(content)
+    return _normalize_triage(result)
 
-    # REFINEMENT: Ensure assigned_to is a single string for the database
-    if "/" in result['assigned_to']:
-        result['assigned_to'] = result['assigned_to'].split("/")[0].strip()
-    
-    # REFINEMENT: Flatten ai_summary to string to avoid MySQL Operand Errors
-    if isinstance(result['ai_summary'], list):
-        result['ai_summary'] = " ".join(result['ai_summary'])
-    
-    return result
\ No newline at end of file
+def agent_triage_batch(items):
+    """
+    Triages several tickets in one LLM request, sending the rules once.
+    `items` are dicts with "id", "message" and optional "file_path".
+    Returns {ticket_id: triage result}; tickets the model skipped or
+    answered malformed are left out so the caller can retry them.
+    """
+    blocks = []
+    for item in items:
+        block = f"    Ticket {item['id']}:\n      - Message: {(item.get('message') or '')[:TRIAGE_BATCH_MESSAGE_CHARS]}"
+        if item.get("file_path"):
+            attachment = get_clean_text(item["file_path"], TRIAGE_BATCH_ATTACHMENT_CHARS)
+            block += f"\n      - Attachment: {attachment[:TRIAGE_BATCH_ATTACHMENT_CHARS]}"
+        blocks.append(block)
+    tickets = "\n".join(blocks)
+
+    prompt = f"""
+    Role: Senior Support Triage Agent
+    Inputs: {len(items)} independent tickets.
+{tickets}
+
+    Task, for EACH ticket separately:
+{TRIAGE_RULES}
+    Return ONLY JSON with one entry per ticket, using the ticket numbers above as "id":
+    {{
+        "results": [
+            {{"id": 0, "assigned_to": "IT/HR/Facilities", "priority": "Low/Medium/High", "ai_summary": "Point 1. Point 2."}}
+        ]
+    }}
+    """
+
+    content = llm_gateway.complete(
+        messages=[{"role": "user", "content": prompt}],
+        model=TRIAGE_MODEL,
+        response_format={"type": "json_object"}
+    )
+
+    wanted = {item["id"] for item in items}
+    results = {}
+    for entry in json.loads(content).get("results", []):
+        try:
+            ticket_id = int(entry["id"])
+            if ticket_id in wanted and entry.get("assigned_to") and entry.get("priority"):
+                entry.setdefault("ai_summary", "")
+                results[ticket_id] = _normalize_triage(entry)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
@@ -0,0 +1,167 @@
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+import mimetypes
+from dataclasses import dataclass
+from urllib.parse import quote
+from fastapi.responses import FileResponse, StreamingResponse, Response
+
+# Storage configuration (override via environment)
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "app/attachments")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(100 * 1024 * 1024)))
+ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", str(1024 * 1024)))
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+@dataclass
+class StoredAttachment:
+    path: str
+    sha256: str
+    size: int
+    filename: str
+    deduplicated: bool
+
+
+def _extension(filename: str):
+    # The extension is kept on disk: text extraction dispatches on it
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,10}", ext) else ""
+
+
+def path_for(sha256: str, ext: str = ""):
+    return os.path.join(ATTACHMENT_DIR, sha256[:2], f"{sha256}{ext}")
+
+
+async def save_upload(upload, max_bytes: int = ATTACHMENT_MAX_BYTES):
+    """
+    Streams an UploadFile to disk in chunks (disk writes run in a thread),
+    hashing as it goes, and files it under its SHA-256. Identical content
+    is stored once. Raises AttachmentTooLarge past `max_bytes`.
+    """
+    tmp_dir = os.path.join(ATTACHMENT_DIR, "tmp")
+    await asyncio.to_thread(os.makedirs, tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while chunk := await upload.read(ATTACHMENT_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise AttachmentTooLarge(f"Attachment exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            digest.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.remove, tmp_path)
+        raise
+    await asyncio.to_thread(f.close)
+
+    sha256 = digest.hexdigest()
+    final_path = path_for(sha256, _extension(upload.filename))
+    deduplicated = await asyncio.to_thread(_commit, tmp_path, final_path)
+    return StoredAttachment(final_path, sha256, size, os.path.basename(upload.filename or ""), deduplicated)
+
+
+def _commit(tmp_path, final_path):
+    """Moves the temp file into place; returns True when the content was already stored."""
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return True
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return False
+
+
+# --- Downloads ---
+def _etag(path, sha256=None):
+    if sha256:
+        return f'"{sha256}"'
+    # Files stored before content addressing: weak validator from size and mtime
+    stat = os.stat(path)
+    return f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single byte range; None to ignore it; raises ValueError if unsatisfiable."""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None  # multi-range or malformed: serve the whole file
+    start, end = match.groups()
+    if start == "":
+        if end == "":
+            return None
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+async def _iter_range(path, start, end):
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(ATTACHMENT_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def attachment_response(request, path: str, filename: str = None, sha256: str = None):
+    """
+    Conditional, range-aware download. Full responses use FileResponse, which
+    the server can send with sendfile/pathsend (zero-copy); single byte ranges
+    are streamed from a thread. Content-addressed files get a strong ETag and
+    are cacheable forever.
+    """
+    etag = _etag(path, sha256)
+    size = os.path.getsize(path)
+    filename = filename or os.path.basename(path)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable" if sha256 else "private, no-cache",
+        # Inline so the preview modal can render it; the name is kept for "save as"
+        "Content-Disposition": f"inline; filename*=utf-8''{quote(filename)}",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+            })
+            return StreamingResponse(_iter_range(path, start, end), status_code=206,
+                                     media_type=media_type, headers=headers)
+
+    return FileResponse(path, headers=headers, media_type=mimetypes.guess_type(filename)[0])
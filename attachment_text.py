@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Extraction configuration (override via environment)
+EXTRACT_WORKERS = int(os.getenv("ATTACHMENT_EXTRACT_WORKERS", "2"))
+EXTRACT_TIMEOUT = float(os.getenv("ATTACHMENT_EXTRACT_TIMEOUT", "60"))
+TEXT_CACHE_DIR = os.getenv("ATTACHMENT_TEXT_CACHE_DIR", "app/temp_uploads/.text_cache")
+TEXT_CACHE_SIZE = int(os.getenv("ATTACHMENT_TEXT_CACHE_SIZE", "256"))
+
+NO_CONTENT = "No attachment content available."
+
+
+def extract_text(file_path: str, max_chars: int = None):
+    """
+    Extracts text from a PDF/DOCX/TXT attachment, stopping as soon as
+    `max_chars` characters are collected. Returns (text, complete) where
+    `complete` is False when extraction stopped early at the budget.
+    """
+    lower = file_path.lower()
+    parts, total = [], 0
+
+    def budget_reached():
+        return max_chars is not None and total >= max_chars
+
+    if lower.endswith(".pdf"):
+        import PyPDF2
+        with open(file_path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            for page in reader.pages:
+                if budget_reached():
+                    break
+                text = page.extract_text() or ""
+                parts.append(text)
+                total += len(text) + 1
+        complete = not budget_reached()
+
+    elif lower.endswith(".docx"):
+        from docx import Document
+        doc = Document(file_path)
+        for paragraph in doc.paragraphs:
+            if budget_reached():
+                break
+            parts.append(paragraph.text)
+            total += len(paragraph.text) + 1
+        complete = not budget_reached()
+
+    elif lower.endswith(".txt"):
+        with open(file_path, "r", encoding="utf-8") as f:
+            text = f.read(max_chars) if max_chars is not None else f.read()
+            complete = max_chars is None or not f.read(1)
+        parts.append(text)
+
+    else:
+        return "", True
+
+    text = " ".join(parts)
+    if max_chars is not None:
+        text = text[:max_chars]
+    return text, complete
+
+
+def file_content_hash(file_path: str):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractedTextCache:
+    """
+    Extracted text keyed by attachment content hash: a small in-memory LRU in
+    front of JSON files on disk, so other workers and processes reuse it too.
+    Entries remember whether they hold the full text or only a prefix.
+    """
+
+    def __init__(self, directory=TEXT_CACHE_DIR, size=TEXT_CACHE_SIZE):
+        self.directory = directory
+        self.size = size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, content_hash):
+        return os.path.join(self.directory, f"{content_hash}.json")
+
+    def get(self, content_hash: str, max_chars: int = None):
+        """Returns cached text covering `max_chars` (or the whole file when None), else None."""
+        with self._lock:
+            entry = self._memory.get(content_hash)
+            if entry is not None:
+                self._memory.move_to_end(content_hash)
+        if entry is None:
+            path = self._path(content_hash)
+            if not os.path.exists(path):
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._remember(content_hash, entry)
+
+        if entry["complete"]:
+            return entry["text"] if max_chars is None else entry["text"][:max_chars]
+        if max_chars is not None and len(entry["text"]) >= max_chars:
+            return entry["text"][:max_chars]
+        return None
+
+    def put(self, content_hash: str, text: str, complete: bool):
+        entry = {"text": text, "complete": complete}
+        self._remember(content_hash, entry)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(content_hash) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(content_hash))
+
+    def _remember(self, content_hash, entry):
+        with self._lock:
+            self._memory[content_hash] = entry
+            self._memory.move_to_end(content_hash)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+
+text_cache = ExtractedTextCache()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _pool
+
+
+def get_attachment_text(file_path: str, max_chars: int = None, content_hash: str = None):
+    """
+    Cached, budgeted text for an attachment. Parsing runs in a separate
+    process so a large PDF never holds the GIL of the API process.
+    """
+    if not file_path or not os.path.exists(file_path):
+        return NO_CONTENT
+
+    try:
+        content_hash = content_hash or file_content_hash(file_path)
+        cached = text_cache.get(content_hash, max_chars)
+        if cached is not None:
+            return cached
+
+        future = _get_pool().submit(extract_text, file_path, max_chars)
+        text, complete = future.result(timeout=EXTRACT_TIMEOUT)
+        text_cache.put(content_hash, text, complete)
+        return text
+    except Exception as e:
+        return f"Extraction Error: {str(e)}"
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
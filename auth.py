@@ -1,8 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.async_database import get_async_db
 from app import models, schemas
-from app.services.auth_utils import hash_password, verify_password, create_access_token
+from app.services.auth_utils import (
+    hash_password_async, verify_and_update_password, create_access_token,
+    invalidate_user, revoke_token, oauth2_scheme
+)
+from app.services.rate_limit import login_ip_limiter, login_email_limiter, register_ip_limiter
+
+def _too_many_requests(retry_after: int):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts. Please try again later.",
+        headers={"Retry-After": str(retry_after)}
+    )
 
 router = APIRouter(
     prefix="/api/auth",
@@ -13,17 +25,24 @@ router = APIRouter(
 @router.post("/register/{role}")
 async def register(
     role: str, 
+    request: Request,
     name: str = Form(...), 
     email: str = Form(...), 
     password: str = Form(...), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = register_ip_limiter.retry_after(client_ip)
+    if retry_after:
+        raise _too_many_requests(retry_after)
+    register_ip_limiter.hit(client_ip)
+
     # Validation: Only allow specific roles
     if role not in ["customer", "agent", "admin"]:
         raise HTTPException(status_code=400, detail="Invalid role")
 
     # Check if user already exists
-    db_user = db.query(models.User).filter(models.User.email == email).first()
+    db_user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -31,33 +50,56 @@ async def register(
     new_user = models.User(
         name=name,
         email=email,
-        password=hash_password(password),
+        password=await hash_password_async(password),
         role=role
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return {"status": "success", "message": f"{role.capitalize()} registered successfully"}
 
 # --- TASK 4: LOGIN API ---
 @router.post("/login")
 async def login(
+    request: Request,
     email: str = Form(...), 
     password: str = Form(...), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # 0. Rate limit per client IP (all attempts) and per email (failed attempts)
+    client_ip = request.client.host if request.client else "unknown"
+    email_key = email.strip().lower()
+    retry_after = max(login_ip_limiter.retry_after(client_ip), login_email_limiter.retry_after(email_key))
+    if retry_after:
+        raise _too_many_requests(retry_after)
+    login_ip_limiter.hit(client_ip)
+
     # 1. Find user by email
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
     
-    # 2. Verify user exists and password is correct
-    if not user or not verify_password(password, user.password):
+    # 2. Verify user exists and password is correct (bcrypt runs in the password pool)
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_and_update_password(password, user.password)
+    if not valid:
+        login_email_limiter.hit(email_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Invalid email or password"
         )
+    login_email_limiter.reset(email_key)
+
+    # Transparently upgrade hashes made with an old cost factor
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     
     # 3. Create JWT Token containing email and role
-    access_token = create_access_token(data={"sub": user.email, "role": user.role})
+    access_token = create_access_token(data={
+        "sub": user.email,
+        "role": user.role,
+        "uid": user.id,
+        "name": user.name
+    })
     
     # 4. Return token and role for Frontend routing
     return {
@@ -66,33 +108,43 @@ async def login(
         "role": user.role,
         "redirect_url": f"/dashboard/{user.role}"
     }
+# --- LOGOUT: Revoke the current token ---
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme)):
+    if not revoke_token(token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return {"status": "success", "message": "Logged out"}
+
 # Add this to your existing auth.py router
 @router.get("/users/{role}")
-async def get_users_by_role(role: str, db: Session = Depends(get_db)):
+async def get_users_by_role(role: str, db: AsyncSession = Depends(get_async_db)):
     # Validation to ensure we only query valid roles
     if role not in ["customer", "agent", "admin"]:
         raise HTTPException(status_code=400, detail="Invalid role")
         
-    users = db.query(models.User).filter(models.User.role == role).all()
+    users = (await db.execute(select(models.User).where(models.User.role == role))).scalars().all()
     return users
 
 # --- TASK: LIST ALL AGENTS ---
 @router.get("/agents")
-async def get_agents(db: Session = Depends(get_db)):
+async def get_agents(db: AsyncSession = Depends(get_async_db)):
     # Fetch only users whose role is 'agent'
-    agents = db.query(models.User).filter(models.User.role == "agent").all()
+    agents = (await db.execute(select(models.User).where(models.User.role == "agent"))).scalars().all()
     return agents
 
 # --- TASK: DELETE AGENT ---
 @router.delete("/agent/{agent_id}")
-async def delete_agent(agent_id: int, db: Session = Depends(get_db)):
-    agent = db.query(models.User).filter(models.User.id == agent_id, models.User.role == "agent").first()
+async def delete_agent(agent_id: int, db: AsyncSession = Depends(get_async_db)):
+    agent = (await db.execute(
+        select(models.User).where(models.User.id == agent_id, models.User.role == "agent")
+    )).scalars().first()
     
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    db.delete(agent)
-    db.commit()
+    await db.delete(agent)
+    await db.commit()
+    invalidate_user(agent_id)
     return {"status": "success", "message": "Agent deleted successfully"}
 
 # --- TASK: UPDATE AGENT ---
@@ -101,15 +153,16 @@ async def update_agent(
     agent_id: int, 
     name: str = Form(None), 
     email: str = Form(None), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    agent = db.query(models.User).filter(models.User.id == agent_id).first()
+    agent = await db.get(models.User, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="User not found")
 
     if name: agent.name = name
     if email: agent.email = email
     
-    db.commit()
-    db.refresh(agent)
+    await db.commit()
+    invalidate_user(agent_id)
+    await db.refresh(agent)
     return {"status": "success", "message": "Agent updated successfully", "agent": agent}
\ No newline at end of file
@@ -1,14 +1,32 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+from collections import OrderedDict
+import os
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.async_database import get_async_db, AsyncSessionLocal
+from app.services.metrics import stage
 from app import models
 
 # Configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; hashes made with a different cost are re-hashed on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 SECRET_KEY = "YOUR_SUPER_SECRET_KEY" 
 ALGORITHM = "HS256"
 
@@ -21,17 +39,122 @@ def hash_password(password: str):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt is CPU-bound; a small dedicated pool keeps it off the event loop and caps
+# how many cores a login storm can take away from ticket traffic
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+async def hash_password_async(password: str):
+    loop = asyncio.get_running_loop()
+    with stage("bcrypt_hash"):
+        return await loop.run_in_executor(_password_executor, hash_password, password)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost factor."""
+    loop = asyncio.get_running_loop()
+    with stage("bcrypt_verify"):
+        return await loop.run_in_executor(
+            _password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+        )
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
+    # jti identifies this token so it can be revoked individually
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# --- AUTH FAST PATH: resolved-user cache + token denylist ---
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Detached snapshot of the fields request handlers need from models.User."""
+    id: int
+    name: str
+    email: str
+    role: str
+
+class UserCache:
+    """Bounded TTL cache of resolved users keyed by user id."""
+
+    def __init__(self, ttl=AUTH_USER_CACHE_TTL, size=AUTH_USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if time.monotonic() > expires_at:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user: AuthenticatedUser):
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+class TokenDenylist:
+    """In-memory set of revoked token ids, each kept only until the token would expire anyway."""
+
+    def __init__(self):
+        self._revoked = {}  # jti -> exp (unix seconds)
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, exp: float):
+        with self._lock:
+            self._revoked[jti] = exp
+            self._prune()
+
+    def is_revoked(self, jti: str):
+        with self._lock:
+            return jti in self._revoked
+
+    def _prune(self):
+        now = time.time()
+        for jti in [jti for jti, exp in self._revoked.items() if exp < now]:
+            del self._revoked[jti]
+
+user_cache = UserCache()
+token_denylist = TokenDenylist()
+
+def invalidate_user(user_id: int):
+    """Call after a user is updated or deleted so the next request re-reads them."""
+    user_cache.invalidate(user_id)
+
+def revoke_token(token: str):
+    """Adds a valid token to the denylist. Returns False if the token cannot be decoded."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    if payload.get("jti"):
+        token_denylist.revoke(payload["jti"], payload.get("exp", time.time()))
+    return True
+
+def _snapshot(user):
+    return AuthenticatedUser(id=user.id, name=user.name, email=user.email, role=user.role)
+
 # --- NEW: SPRINT 3 AUTH DEPENDENCY ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     """
-    Decodes the JWT, validates it, and fetches the user from the database.
-    Used to link tickets to specific customers.
+    Decodes the JWT, validates it, and resolves the user.
+    Tokens carry the user id, so repeat requests are served from the user
+    cache without a database round-trip. Used to link tickets to specific customers.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -47,9 +170,33 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    # 2. Fetch user from MySQL
-    user = db.query(models.User).filter(models.User.email == email).first()
+    jti = payload.get("jti")
+    if jti and token_denylist.is_revoked(jti):
+        raise credentials_exception
+
+    # 2. Fast path: user id claim + cache
+    user_id = payload.get("uid")
+    if user_id is not None:
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        user = await db.get(models.User, user_id)
+    else:
+        # Tokens issued before the uid claim existed
+        user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
+
     if user is None:
         raise credentials_exception
-        
-    return user
\ No newline at end of file
+
+    resolved = _snapshot(user)
+    user_cache.put(resolved)
+    return resolved
+
+async def authenticate_token(token: str):
+    """
+    get_current_user for tokens passed outside the Authorization header (an
+    EventSource cannot set headers). Uses its own short-lived session so
+    long-lived streams never hold a pooled connection.
+    """
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(token, db)
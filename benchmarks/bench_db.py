@@ -0,0 +1,166 @@
+"""
+Concurrent-request throughput: sync Session vs AsyncSession inside async endpoints.
+
+Seeds a throwaway SQLite database with the app schema, mounts the same
+"my tickets" query twice (once on a sync Session, the way the routers used
+to, once on the async engine) and fires concurrent requests at each.
+
+    python -m app.benchmarks.bench_db --tickets 20000 --requests 500 --concurrency 50
+
+--query-delay-ms adds a per-query server-side delay (a SQLite function) to
+approximate a networked MySQL round-trip; with it, the sync variant
+serialises on the event loop while the async one overlaps.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app import models
+from app.benchmarks.seed import CATEGORIES
+
+
+def _install_delay(engine, delay_ms):
+    """Registers sleep_ms() on every connection so each query costs `delay_ms`."""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _record):
+        def sleep_ms(ms):
+            time.sleep(ms / 1000)
+            return 1
+        # Deterministic, so SQLite evaluates it once per query rather than once per row
+        dbapi_connection.create_function("sleep_ms", 1, sleep_ms, deterministic=True)
+
+
+def seed(db_path, n_customers, n_tickets):
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"name": f"Customer {i}", "email": f"c{i}@bench.local", "password": "x", "role": "customer"}
+            for i in range(1, n_customers + 1)
+        ])
+        conn.execute(models.Ticket.__table__.insert(), [
+            {
+                "subject": f"Subject {i}",
+                "message": "Synthetic benchmark ticket",
+                "customer_id": random.randint(1, n_customers),
+                "status": random.choice(["Open", "In Progress", "Completed"]),
+                "category": random.choice(CATEGORIES),
+                "priority": random.choice(["Low", "Medium", "High"]),
+                "triage_status": "Triaged",
+            }
+            for i in range(1, n_tickets + 1)
+        ])
+    engine.dispose()
+
+
+def build_app(db_path, delay_ms, pool_size):
+    # Unbounded overflow: sessions are closed by dependency teardown, which needs
+    # the event loop the sync queries are blocking, so a bounded pool deadlocks
+    # as soon as concurrency exceeds it
+    sync_engine = create_engine(
+        f"sqlite:///{db_path}", connect_args={"check_same_thread": False}, pool_size=pool_size, max_overflow=-1
+    )
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", pool_size=pool_size, max_overflow=0, pool_pre_ping=True
+    )
+    _install_delay(sync_engine, delay_ms)
+    _install_delay(async_engine.sync_engine, delay_ms)
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as session:
+            yield session
+
+    def my_tickets_stmt(customer_id):
+        stmt = select(models.Ticket).where(models.Ticket.customer_id == customer_id)
+        if delay_ms:
+            stmt = stmt.where(func.sleep_ms(delay_ms) == 1)
+        return stmt
+
+    app = FastAPI()
+
+    @app.get("/sync/{customer_id}")
+    async def sync_tickets(customer_id: int, db: Session = Depends(get_sync_db)):
+        return {"count": len(db.execute(my_tickets_stmt(customer_id)).scalars().all())}
+
+    @app.get("/async/{customer_id}")
+    async def async_tickets(customer_id: int, db: AsyncSession = Depends(get_async_db)):
+        return {"count": len((await db.execute(my_tickets_stmt(customer_id))).scalars().all())}
+
+    return app, sync_engine, async_engine
+
+
+async def run(app, prefix, n_requests, concurrency, n_customers):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(f"/{prefix}/{random.randint(1, n_customers)}")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": n_requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-delay-ms", type=int, default=5)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, args.customers, args.tickets)
+        app, sync_engine, async_engine = build_app(db_path, args.query_delay_ms, args.pool_size)
+
+        print(f"{args.tickets} tickets, {args.requests} requests, concurrency {args.concurrency}, "
+              f"query delay {args.query_delay_ms} ms")
+
+        async def compare():
+            # One event loop for both runs: pooled aiosqlite connections are tied to it
+            for label, prefix in (("sync Session (before)", "sync"), ("AsyncSession (after)", "async")):
+                stats = await run(app, prefix, args.requests, args.concurrency, args.customers)
+                print(f"{label:24} {stats['rps']:8.1f} req/s   p50 {stats['p50']:7.1f} ms   p95 {stats['p95']:7.1f} ms")
+            await async_engine.dispose()
+
+        asyncio.run(compare())
+        sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
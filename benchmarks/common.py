@@ -0,0 +1,60 @@
+"""Shared helpers for the benchmark scripts: environment setup and latency reporting."""
+import os
+import time
+import statistics
+
+
+def configure_env(db_path=None, llm_latency_ms=0, token_delay_ms=0):
+    """
+    Points the app at a benchmark database and the fake LLM. Must run before
+    any `app.*` module is imported, since they read configuration at import.
+    """
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ["FAKE_LLM_TOKEN_DELAY_MS"] = str(token_delay_ms)
+    os.environ.setdefault("EMBEDDING_WARMUP", "off")
+    # Load generators hit login from one address; keep the limiter out of the numbers
+    os.environ.setdefault("LOGIN_RATE_PER_IP", "1000000000")
+    os.environ.setdefault("LOGIN_FAILURES_PER_EMAIL", "1000000000")
+    if db_path:
+        os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.abspath(db_path)}"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(name, latencies, elapsed, errors=0):
+    """Latency percentiles (ms) and throughput for one scenario."""
+    values = sorted(latencies)
+    return {
+        "name": name,
+        "requests": len(values),
+        "errors": errors,
+        "throughput": len(values) / elapsed if elapsed else 0.0,
+        "p50": percentile(values, 50) * 1000,
+        "p95": percentile(values, 95) * 1000,
+        "p99": percentile(values, 99) * 1000,
+        "mean": (statistics.fmean(values) * 1000) if values else 0.0,
+    }
+
+
+def print_report(rows, unit="req/s"):
+    print(f"{'scenario':32} {'n':>7} {'err':>5} {unit:>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in rows:
+        print(f"{row['name']:32} {row['requests']:7d} {row['errors']:5d} {row['throughput']:10.1f} "
+              f"{row['p50']:9.2f} {row['p95']:9.2f} {row['p99']:9.2f}")
+
+
+def time_calls(name, fn, repeat):
+    """Runs `fn` `repeat` times and summarizes its latency (for micro-benchmarks)."""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    return summarize(name, latencies, time.perf_counter() - started)
@@ -0,0 +1,146 @@
+"""
+Endpoint load test: tickets, auth and RAG routes against a seeded SQLite
+database, with Groq replaced by the fake client.
+
+    python -m app.benchmarks.load --tickets 100000 --requests 300 --concurrency 20 --llm-latency-ms 400
+
+Requests go through the ASGI app in-process (httpx ASGITransport), so the
+numbers cover routing, auth, DB, retrieval and the fake LLM but not the
+network. Reports p50/p95/p99 latency and throughput per scenario.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from app.benchmarks.common import configure_env, summarize, print_report
+
+SCENARIOS = ("queue", "stats", "search", "ticket_detail", "my_tickets", "messages", "login", "raise", "ask", "all_tickets")
+SEARCH_TERMS = ("vpn", "payroll overtime", "gym access", "outlook crash", "disconnect", "screen crack")
+
+
+def build_app():
+    """The routers and timing middleware, without main.py's startup side effects."""
+    from fastapi import FastAPI
+    from app.routers import auth, tickets, rag
+
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.include_router(tickets.router)
+    app.include_router(rag.router)
+    return app
+
+
+def _scenario_requests(name, ctx, rng):
+    """(method, url, kwargs) for one request of scenario `name`."""
+    ticket_id = rng.randint(1, ctx["tickets"])
+    customer = rng.randint(1, ctx["customers"])
+    if name == "queue":
+        return "GET", "/api/tickets/queue", {"params": {"limit": 50, "status": rng.choice(["Open", "In Progress"])}}
+    if name == "stats":
+        return "GET", "/api/tickets/stats", {}
+    if name == "search":
+        return "GET", "/api/tickets/search", {"params": {"q": rng.choice(SEARCH_TERMS), "limit": 20}}
+    if name == "all_tickets":
+        return "GET", "/api/tickets/all", {}
+    if name == "ticket_detail":
+        return "GET", f"/api/tickets/{ticket_id}", {"headers": ctx["agent_headers"]}
+    if name == "messages":
+        return "GET", f"/api/tickets/{ticket_id}/messages", {"headers": ctx["agent_headers"]}
+    if name == "my_tickets":
+        return "GET", "/api/tickets/my-tickets", {"headers": ctx["customer_headers"][customer % len(ctx["customer_headers"])]}
+    if name == "login":
+        return "POST", "/api/auth/login", {"data": {"email": f"customer{customer}@bench.local", "password": ctx["password"]}}
+    if name == "raise":
+        return "POST", "/api/tickets/raise", {
+            "data": {"subject": "Benchmark ticket", "message": "VPN keeps disconnecting since this morning."},
+            "headers": ctx["customer_headers"][0],
+        }
+    if name == "ask":
+        return "POST", "/api/ai/ask", {"data": {"question": rng.choice(ctx["questions"])}}
+    raise ValueError(f"Unknown scenario {name}")
+
+
+async def run_scenario(client, name, ctx, n_requests, concurrency, seed=0):
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        method, url, kwargs = _scenario_requests(name, ctx, rng)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    return summarize(name, latencies, time.perf_counter() - started, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test tickets, auth and RAG endpoints")
+    parser.add_argument("--db", default=None, help="existing database from app.benchmarks.seed (default: seed a fresh one)")
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--kb-files", type=int, default=3)
+    parser.add_argument("--scenarios", default=",".join(s for s in SCENARIOS if s != "all_tickets"),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    args = parser.parse_args()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="support_bench_")
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, "bench.db")
+    configure_env(db_path, llm_latency_ms=args.llm_latency_ms)
+    # Chroma, manifests and uploads use relative paths; keep them inside the scratch directory
+    os.chdir(workdir)
+
+    from app.benchmarks.seed import seed_database, generate_kb_corpus, BENCH_PASSWORD
+    if not args.db:
+        print(f"Seeding {args.tickets} tickets into {db_path} ...")
+        seed_database(db_path, args.tickets, args.customers)
+
+    ctx = {"tickets": args.tickets, "customers": args.customers, "password": BENCH_PASSWORD}
+    if "ask" in scenarios:
+        from app.services.rag_service import load_txt_to_db
+        paths = generate_kb_corpus(os.path.join(workdir, "kb"), files=args.kb_files)
+        started = time.perf_counter()
+        for path in paths:
+            load_txt_to_db(path)
+        print(f"KB ingest: {len(paths)} files in {time.perf_counter() - started:.2f}s")
+        ctx["questions"] = ["How do I fix my VPN?", "Who handles payroll questions?",
+                            "My gym card does not work", "What should I do about a cracked screen?"]
+
+    import httpx
+    from app.services.auth_utils import create_access_token
+
+    def headers(uid, role):
+        token = create_access_token({"sub": f"{role}{uid}@bench.local", "role": role, "uid": uid})
+        return {"Authorization": f"Bearer {token}"}
+
+    ctx["customer_headers"] = [headers(uid, "customer") for uid in range(1, min(args.customers, 50) + 1)]
+    ctx["agent_headers"] = headers(args.customers + 1, "agent")
+
+    async def run_all():
+        transport = httpx.ASGITransport(app=build_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            rows = []
+            for name in scenarios:
+                rows.append(await run_scenario(client, name, ctx, args.requests, args.concurrency))
+            return rows
+
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"fake LLM latency {args.llm_latency_ms} ms")
+    print_report(asyncio.run(run_all()))
+
+
+if __name__ == "__main__":
+    main()
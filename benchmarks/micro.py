@@ -0,0 +1,73 @@
+"""
+Micro-benchmarks for the RAG pipeline pieces: chunking, embedding,
+keyword (BM25) search and hybrid retrieval.
+
+    python -m app.benchmarks.micro --paragraphs 2000 --repeat 50
+
+Embedding and hybrid retrieval load the MiniLM model; pass --skip-model to
+time only the pure-Python stages.
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from app.benchmarks.common import configure_env, time_calls, print_report
+
+QUERIES = ["How do I fix my VPN?", "payroll missing overtime", "gym access card", "cracked laptop screen"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for chunking, embedding and retrieval")
+    parser.add_argument("--paragraphs", type=int, default=2000, help="size of the synthetic KB file")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=64, help="texts per embedding call")
+    parser.add_argument("--skip-model", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="support_micro_")
+    configure_env()
+    os.chdir(workdir)
+
+    from app.benchmarks.seed import generate_kb_corpus
+    from app.services.rag_service import iter_text_chunks
+    from app.services.hybrid_search import BM25Index, tokenize
+
+    path = generate_kb_corpus(os.path.join(workdir, "kb"), files=1, paragraphs_per_file=args.paragraphs)[0]
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    chunks = list(iter_text_chunks(path))
+    print(f"Corpus: {size_mb:.2f} MB, {len(chunks)} chunks")
+
+    rows = [time_calls("chunking (whole file)", lambda: sum(1 for _ in iter_text_chunks(path)), max(1, args.repeat // 10))]
+
+    index = BM25Index()
+    started = time.perf_counter()
+    index.add([f"c{i}" for i in range(len(chunks))], chunks)
+    print(f"BM25 build: {time.perf_counter() - started:.3f}s")
+    queries = iter(QUERIES * args.repeat)
+    rows.append(time_calls("bm25 search", lambda: index.search(next(queries), 10), args.repeat))
+    rows.append(time_calls("tokenize (1 chunk)", lambda: tokenize(chunks[0]), args.repeat * 10))
+
+    if not args.skip_model:
+        from app.services.embedding_service import embed_texts, warm_up
+        from app.services.rag_service import load_txt_to_db, _retrieve_context
+
+        started = time.perf_counter()
+        warm_up()
+        print(f"Embedding model load: {time.perf_counter() - started:.2f}s")
+        batch = chunks[:args.batch_size]
+        rows.append(time_calls(f"embed batch of {len(batch)}", lambda: embed_texts(batch), args.repeat))
+        rows.append(time_calls("embed 1 query", lambda: embed_texts([QUERIES[0]]), args.repeat))
+
+        started = time.perf_counter()
+        load_txt_to_db(path)
+        print(f"KB ingest (load_txt_to_db): {time.perf_counter() - started:.2f}s")
+        query_vectors = [embed_texts([q])[0] for q in QUERIES]
+        pairs = iter(list(zip(QUERIES, query_vectors)) * args.repeat)
+        rows.append(time_calls("hybrid retrieval", lambda: _retrieve_context(*next(pairs)), args.repeat))
+
+    print_report(rows, unit="calls/s")
+
+
+if __name__ == "__main__":
+    main()
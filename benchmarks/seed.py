@@ -0,0 +1,144 @@
+"""
+Synthetic data for benchmarks: a SQLite database of users, tickets and
+messages, and a plain-text knowledge-base corpus.
+
+    python -m app.benchmarks.seed --db bench.db --tickets 100000 --kb-dir bench_kb
+"""
+import os
+import random
+import argparse
+import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+BENCH_PASSWORD = "benchmark-password"
+INSERT_BATCH = 10000
+
+CATEGORIES = ("IT", "HR", "Facilities")
+PRIORITIES = ("Low", "Medium", "High")
+STATUSES = ("Open", "In Progress", "Completed")
+TOPICS = {
+    "IT": ["VPN keeps disconnecting", "MFA code not accepted", "Laptop screen cracked", "Password locked out",
+           "Wi-Fi drops in meeting rooms", "Outlook crashes on start"],
+    "HR": ["Payroll missing overtime", "Question about sick leave", "Paternity leave dates",
+           "Probation review timing", "Benefits enrolment deadline"],
+    "Facilities": ["HotDesk booking failed", "Gym access card not working", "Cafeteria menu request",
+                   "Fire drill schedule", "Car park gate stuck open"],
+}
+FILLER = ("since this morning", "for the whole team", "after the latest update", "on the third floor",
+          "every time I try", "and it is blocking my work", "whenever I travel", "since last week")
+
+
+def _sentence(rng, category):
+    return f"{rng.choice(TOPICS[category])} {rng.choice(FILLER)}."
+
+
+def seed_database(db_path, tickets=10000, customers=1000, agents=20, messages_per_ticket=3, seed=42):
+    """Creates (or replaces) `db_path` with the app schema and synthetic rows."""
+    # Imported lazily so configure_env() can run first
+    from app import models
+    from app.services.auth_utils import hash_password
+    from app.services.ticket_stats import rebuild_ticket_stats
+    from app.services.ticket_search import rebuild_search_index
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    # One real bcrypt hash shared by every user keeps seeding fast and logins valid
+    password = hash_password(BENCH_PASSWORD)
+    now = datetime.datetime.utcnow()
+
+    with engine.begin() as conn:
+        users = [{"name": f"Customer {i}", "email": f"customer{i}@bench.local", "password": password, "role": "customer"}
+                 for i in range(1, customers + 1)]
+        users += [{"name": f"Agent {i}", "email": f"agent{i}@bench.local", "password": password, "role": "agent"}
+                  for i in range(1, agents + 1)]
+        conn.execute(models.User.__table__.insert(), users)
+
+    agent_ids = list(range(customers + 1, customers + agents + 1))
+    for start in range(0, tickets, INSERT_BATCH):
+        ticket_rows, message_rows = [], []
+        for ticket_id in range(start + 1, min(tickets, start + INSERT_BATCH) + 1):
+            category = rng.choice(CATEGORIES)
+            created = now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            status = rng.choice(STATUSES)
+            responder = rng.choice(agent_ids) if status != "Open" and agent_ids else None
+            ticket_rows.append({
+                "id": ticket_id,
+                "subject": rng.choice(TOPICS[category]),
+                "message": " ".join(_sentence(rng, category) for _ in range(3)),
+                "category": category,
+                "priority": rng.choice(PRIORITIES),
+                "ai_summary": _sentence(rng, category),
+                "status": status,
+                "triage_status": "Triaged",
+                "triage_source": "llm",
+                "customer_id": rng.randint(1, customers),
+                "created_at": created,
+                "first_responder_id": responder,
+                "first_response_at": created + datetime.timedelta(minutes=rng.randint(1, 600)) if responder else None,
+            })
+            for n in range(messages_per_ticket):
+                role = "customer" if n % 2 == 0 else "agent"
+                message_rows.append({
+                    "ticket_id": ticket_id,
+                    "sender_role": role,
+                    "sender_name": "Customer" if role == "customer" else "Agent",
+                    "text": _sentence(rng, category),
+                    "created_at": created + datetime.timedelta(minutes=10 * (n + 1)),
+                })
+        with engine.begin() as conn:
+            conn.execute(models.Ticket.__table__.insert(), ticket_rows)
+            if message_rows:
+                conn.execute(models.Message.__table__.insert(), message_rows)
+        print(f"  seeded {min(tickets, start + INSERT_BATCH)}/{tickets} tickets")
+
+    session = sessionmaker(bind=engine)()
+    try:
+        rebuild_ticket_stats(session)
+        rebuild_search_index(session)
+    finally:
+        session.close()
+    engine.dispose()
+    return {"customers": customers, "agents": agents, "tickets": tickets}
+
+
+def generate_kb_corpus(directory, files=5, paragraphs_per_file=200, seed=7):
+    """Writes synthetic support articles; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"kb_article_{i}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(paragraphs_per_file):
+                category = rng.choice(CATEGORIES)
+                sentences = " ".join(_sentence(rng, category) for _ in range(rng.randint(3, 8)))
+                f.write(f"{category} guidance: {sentences} Contact the {category} desk if this persists.\n\n")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark SQLite database and KB corpus")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--tickets", type=int, default=10000, help="10k to 1M")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--messages-per-ticket", type=int, default=3)
+    parser.add_argument("--kb-dir", default=None, help="also write a synthetic KB corpus here")
+    parser.add_argument("--kb-files", type=int, default=5)
+    parser.add_argument("--kb-paragraphs", type=int, default=200)
+    args = parser.parse_args()
+
+    from app.benchmarks.common import configure_env
+    configure_env(args.db)
+    print(seed_database(args.db, args.tickets, args.customers, args.agents, args.messages_per_ticket))
+    if args.kb_dir:
+        print(generate_kb_corpus(args.kb_dir, args.kb_files, args.kb_paragraphs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+import os
+import csv
+import json
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, or_
+from app.database import SessionLocal
+from app import models
+from app.services.agent_logic import agent_triage, agent_triage_batch, TRIAGE_BATCH_SIZE
+from app.services.llm_gateway import LLMUnavailable
+from app.services.ticket_stats import ticket_snapshot, batch_counter_statements, ticket_update, snapshot_after
+from app.services.ticket_search import ticket_index_statements
+from app.services.triage_worker import TRIAGE_PENDING, TRIAGE_IMPORT_PENDING, TRIAGE_DONE, TRIAGE_FAILED
+from app.services.events import get_broker, TICKETS_CHANNEL
+from app.services.triage_classifier import (
+    triage_classifier, ticket_text, local_summary, SOURCE_CLASSIFIER, SOURCE_LLM, SOURCE_IMPORT, SOURCE_AGENT
+)
+
+# Bulk configuration (override via environment)
+BULK_TRIAGE_CONCURRENCY = int(os.getenv("BULK_TRIAGE_CONCURRENCY", "4"))
+BULK_COMMIT_SIZE = int(os.getenv("BULK_COMMIT_SIZE", "500"))
+BULK_TRIAGE_MAX_RETRIES = int(os.getenv("BULK_TRIAGE_MAX_RETRIES", "3"))
+BULK_TRIAGE_RETRY_BACKOFF = float(os.getenv("BULK_TRIAGE_RETRY_BACKOFF", "2.0"))
+# Rejected import rows listed on the job (the count covers all of them)
+BULK_MAX_REPORTED_ERRORS = 100
+
+TICKET_STATUSES = ("Open", "In Progress", "Completed")
+
+# Re-triage scopes accepted by the admin endpoint
+RETRIAGE_SCOPES = {
+    "failed": [TRIAGE_FAILED],
+    "pending": [TRIAGE_PENDING, TRIAGE_IMPORT_PENDING],
+    "unfinished": [TRIAGE_PENDING, TRIAGE_IMPORT_PENDING, TRIAGE_FAILED],
+    "all": None,
+}
+
+
+# --- Import file parsing ---
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def iter_import_rows(file_path: str):
+    """
+    Yields ticket dicts from a CSV (header row) or JSONL file, one line at a
+    time. Unparseable JSONL lines are yielded as None so they can be reported.
+    """
+    if file_path.lower().endswith(".jsonl"):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield None
+    else:
+        with open(file_path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+
+
+def _customer_ids_for(db, emails):
+    if not emails:
+        return {}
+    rows = db.execute(select(models.User.id, models.User.email).where(models.User.email.in_(emails))).all()
+    return {row.email: row.id for row in rows}
+
+
+def _existing_user_ids(db, ids):
+    if not ids:
+        return set()
+    return set(db.execute(select(models.User.id).where(models.User.id.in_(ids))).scalars())
+
+
+def _row_customer_id(row):
+    """The row's customer_id as an int, None when absent; raises ValueError when malformed."""
+    value = row.get("customer_id")
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid customer_id {value!r}")
+
+
+def _text_field(row, name):
+    """A stripped string field, None when absent or blank; raises ValueError for non-text values."""
+    value = row.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be text, got {type(value).__name__}")
+    return value.strip() or None
+
+
+def _ticket_from_row(row, customers, user_ids):
+    """
+    Maps an import row onto a Ticket; rows that already carry category and
+    priority skip the LLM. Raises ValueError naming the problem for rows that
+    cannot be imported (no message, unknown customer, bad status or field type).
+    """
+    if row is None:
+        raise ValueError("invalid JSON")
+    if not isinstance(row, dict):
+        raise ValueError("not a JSON object")
+    message = _text_field(row, "message")
+    if not message:
+        raise ValueError("missing message")
+    subject, email = _text_field(row, "subject"), _text_field(row, "customer_email")
+    category, priority = _text_field(row, "category"), _text_field(row, "priority")
+    ai_summary = _text_field(row, "ai_summary")
+    customer_id = _row_customer_id(row)
+    if customer_id is not None:
+        if customer_id not in user_ids:
+            raise ValueError(f"unknown customer_id {customer_id}")
+    elif email:
+        customer_id = customers.get(email)
+        if customer_id is None:
+            raise ValueError(f"unknown customer_email {email!r}")
+    else:
+        raise ValueError("missing customer_id or customer_email")
+    status = _text_field(row, "status") or "Open"
+    if status not in TICKET_STATUSES:
+        raise ValueError(f"invalid status {status!r}")
+    pre_triaged = bool(category and priority)
+    return models.Ticket(
+        subject=subject or message[:80].strip(),
+        message=message,
+        customer_id=customer_id,
+        status=status,
+        category=category,
+        priority=priority,
+        ai_summary=ai_summary,
+        triage_status=TRIAGE_DONE if pre_triaged else TRIAGE_IMPORT_PENDING,
+        triage_source=SOURCE_IMPORT if pre_triaged else None,
+        created_at=_parse_datetime(row.get("created_at")) or datetime.datetime.utcnow(),
+    )
+
+
+# --- Batched LLM triage ---
+def _triage_with_retry(items):
+    """
+    Triages a batch in one request, retrying with exponential backoff when
+    the answer is malformed or incomplete. Tickets the batch call did not
+    answer fall back to single-ticket triage. LLM outages are not retried
+    here: the gateway already has, and the tickets stay unanswered.
+    """
+    results = {}
+    remaining = list(items)
+    for attempt in range(1, BULK_TRIAGE_MAX_RETRIES + 1):
+        try:
+            results.update(agent_triage_batch(remaining))
+            remaining = [item for item in remaining if item["id"] not in results]
+            if not remaining:
+                return results
+        except LLMUnavailable as e:
+            print(f"Bulk Triage Error: {str(e)}")
+            return results
+        except Exception as e:
+            print(f"Bulk Triage Error (attempt {attempt}): {str(e)}")
+        if attempt < BULK_TRIAGE_MAX_RETRIES:
+            time.sleep(BULK_TRIAGE_RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    for item in remaining:
+        try:
+            results[item["id"]] = agent_triage(item.get("file_path"), item["message"])
+        except LLMUnavailable as e:
+            print(f"Bulk Triage Error: {str(e)}")
+            break
+        except Exception as e:
+            print(f"Bulk Triage Error (ticket {item['id']}): {str(e)}")
+    return results
+
+
+def _apply_results(db, tickets, results):
+    """
+    Writes one page of triage results and the matching stats in a single
+    commit. Each ticket is written with a compare-and-set UPDATE on the state
+    it was read in, so a ticket changed while the LLM was running (an agent
+    edit, the triage worker) is left alone and counted as skipped. Tickets
+    with no result are only marked failed if they had no triage yet.
+    """
+    changes, written, failed, skipped = [], [], 0, 0
+    for ticket in tickets:
+        before = ticket_snapshot(ticket)
+        triage = results.get(ticket.id)
+        if triage is None and ticket.triage_status not in (TRIAGE_PENDING, TRIAGE_IMPORT_PENDING, TRIAGE_FAILED):
+            # Keep the earlier triage rather than failing a ticket that already had one
+            skipped += 1
+            continue
+        if triage is None:
+            values = {
+                "triage_status": TRIAGE_FAILED,
+                "ai_summary": "AI triage could not be completed. Please triage manually.",
+            }
+        elif triage.get("source") == SOURCE_CLASSIFIER:
+            values = {
+                "category": triage["category"],
+                "priority": triage["priority"],
+                "ai_summary": local_summary(ticket.message),
+                "triage_source": SOURCE_CLASSIFIER,
+                "triage_confidence": triage["confidence"],
+                "triage_status": TRIAGE_DONE,
+            }
+        else:
+            values = {
+                "category": triage.get('assigned_to', 'IT'),
+                "priority": triage.get('priority', 'Medium'),
+                "ai_summary": str(triage.get('ai_summary', "No summary provided")),
+                "triage_source": SOURCE_LLM,
+                "triage_confidence": None,
+                "triage_status": TRIAGE_DONE,
+            }
+        # Written by the guarded UPDATE, never by an ORM flush
+        db.expunge(ticket)
+        guard = {**before, "triage_source": ticket.triage_source}
+        if db.execute(ticket_update(ticket.id, guard, values)).rowcount != 1:
+            skipped += 1
+            continue
+        for field, value in values.items():
+            setattr(ticket, field, value)
+        changes.append((before, snapshot_after(before, values)))
+        written.append(ticket)
+        failed += values["triage_status"] == TRIAGE_FAILED
+    for stmt in batch_counter_statements(db, changes) + ticket_index_statements(db, written):
+        db.execute(stmt)
+    db.commit()
+    return len(written) - failed, failed, skipped
+
+
+def _triage_and_store(db, executor, tickets, progress):
+    # Confident local predictions first; only the rest are packed into LLM batches
+    results = {}
+    decisions = triage_classifier.classify_many([ticket_text(t.subject, t.message) for t in tickets])
+    for ticket, decision in zip(tickets, decisions):
+        if decision is not None:
+            results[ticket.id] = {
+                "source": SOURCE_CLASSIFIER,
+                "category": decision.category,
+                "priority": decision.priority,
+                "confidence": decision.confidence,
+            }
+    progress["classified_locally"] = progress.get("classified_locally", 0) + len(results)
+
+    items = [
+        {"id": t.id, "message": t.message or "", "file_path": t.file_path}
+        for t in tickets if t.id not in results
+    ]
+    batches = [items[i:i + TRIAGE_BATCH_SIZE] for i in range(0, len(items), TRIAGE_BATCH_SIZE)]
+    for batch_results in executor.map(_triage_with_retry, batches):
+        results.update(batch_results)
+
+    triaged, failed, skipped = _apply_results(db, tickets, results)
+    progress["triaged"] = progress.get("triaged", 0) + triaged
+    progress["failed"] = progress.get("failed", 0) + failed
+    progress["triage_skipped"] = progress.get("triage_skipped", 0) + skipped
+
+
+def _not_reviewed(query):
+    """Leaves out tickets an agent labelled or closed; re-triage would overwrite their decision."""
+    return query.filter(
+        models.Ticket.status != "Completed",
+        or_(models.Ticket.triage_source.is_(None), models.Ticket.triage_source != SOURCE_AGENT),
+    )
+
+
+def _triage_pages(job, statuses, min_id=None, max_id=None, include_reviewed=False):
+    """
+    Walks matching tickets in id order, BULK_COMMIT_SIZE at a time: each page is
+    split into LLM batches that run BULK_TRIAGE_CONCURRENCY at once, then
+    committed together. Progress is reported on the job.
+    """
+    last_id = (min_id - 1) if min_id is not None else 0
+
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=BULK_TRIAGE_CONCURRENCY, thread_name_prefix="bulk-triage") as executor:
+            while True:
+                job.check_cancelled()
+                query = db.query(models.Ticket).filter(models.Ticket.id > last_id)
+                if max_id is not None:
+                    query = query.filter(models.Ticket.id <= max_id)
+                if statuses is not None:
+                    query = query.filter(models.Ticket.triage_status.in_(statuses))
+                if not include_reviewed:
+                    query = _not_reviewed(query)
+                tickets = query.order_by(models.Ticket.id.asc()).limit(BULK_COMMIT_SIZE).all()
+                if not tickets:
+                    break
+                last_id = tickets[-1].id
+                _triage_and_store(db, executor, tickets, job.progress)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _announce(kind, progress):
+    # One queue-level event per job; agents refresh rather than receive thousands of updates
+    get_broker().publish([TICKETS_CHANNEL], {"type": kind, "ticket_id": None, "data": dict(progress)})
+
+
+# --- Job entry points ---
+def run_import_job(job, file_path: str, triage: bool = True):
+    """
+    Imports tickets from an uploaded CSV/JSONL file, then triages the new ones
+    in batches. Unlabelled tickets wait as "Import pending", which only this
+    job (or an admin re-triage) picks up; with triage=False they stay there.
+    """
+    progress = job.progress
+    progress.update({"imported": 0, "skipped": 0, "errors": []})
+    first_id = last_id = None
+
+    db = SessionLocal()
+    try:
+        page = []
+
+        def flush():
+            nonlocal first_id, last_id
+            rows = [row for _, row in page if isinstance(row, dict)]
+            emails = {
+                row["customer_email"].strip() for row in rows
+                if isinstance(row.get("customer_email"), str) and row["customer_email"].strip() and not row.get("customer_id")
+            }
+            customers = _customer_ids_for(db, emails)
+            ids = set()
+            for row in rows:
+                try:
+                    ids.add(_row_customer_id(row))
+                except ValueError:
+                    pass
+            user_ids = _existing_user_ids(db, ids - {None})
+            tickets = []
+            for row_number, row in page:
+                try:
+                    tickets.append(_ticket_from_row(row, customers, user_ids))
+                except ValueError as e:
+                    progress["skipped"] += 1
+                    if len(progress["errors"]) < BULK_MAX_REPORTED_ERRORS:
+                        progress["errors"].append({"row": row_number, "error": str(e)})
+            db.add_all(tickets)
+            db.flush()
+            for stmt in batch_counter_statements(db, [(None, ticket_snapshot(t)) for t in tickets]):
+                db.execute(stmt)
+            for stmt in ticket_index_statements(db, tickets):
+                db.execute(stmt)
+            db.commit()
+            # Human labels from the legacy helpdesk train the local pre-classifier
+            labelled = [t for t in tickets if t.triage_source == SOURCE_IMPORT]
+            if labelled:
+                try:
+                    triage_classifier.learn_many(
+                        [ticket_text(t.subject, t.message) for t in labelled],
+                        [t.category for t in labelled],
+                        [t.priority for t in labelled]
+                    )
+                except Exception as e:
+                    print(f"Triage Classifier Error: {str(e)}")
+            if tickets:
+                first_id = tickets[0].id if first_id is None else first_id
+                last_id = tickets[-1].id
+            progress["imported"] += len(tickets)
+            page.clear()
+
+        for row_number, row in enumerate(iter_import_rows(file_path), start=1):
+            page.append((row_number, row))
+            if len(page) >= BULK_COMMIT_SIZE:
+                job.check_cancelled()
+                flush()
+        if page:
+            flush()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    if triage and first_id is not None:
+        _triage_pages(job, [TRIAGE_IMPORT_PENDING], min_id=first_id, max_id=last_id)
+    _announce("tickets.imported", progress)
+    return dict(progress)
+
+
+def run_retriage_job(job, scope: str = "failed", ticket_ids=None, include_reviewed: bool = False):
+    """
+    Re-runs triage for existing tickets, either an explicit id list or a
+    triage-status scope. Agent-labelled and Completed tickets are skipped
+    unless `include_reviewed` is set.
+    """
+    if ticket_ids:
+        job.progress["total"] = len(ticket_ids)
+        ids = sorted(set(ticket_ids))
+        db = SessionLocal()
+        try:
+            with ThreadPoolExecutor(max_workers=BULK_TRIAGE_CONCURRENCY, thread_name_prefix="bulk-triage") as executor:
+                for i in range(0, len(ids), BULK_COMMIT_SIZE):
+                    job.check_cancelled()
+                    query = db.query(models.Ticket).filter(models.Ticket.id.in_(ids[i:i + BULK_COMMIT_SIZE]))
+                    if not include_reviewed:
+                        query = _not_reviewed(query)
+                    tickets = query.order_by(models.Ticket.id.asc()).all()
+                    job.progress["excluded"] = job.progress.get("excluded", 0) + len(ids[i:i + BULK_COMMIT_SIZE]) - len(tickets)
+                    _triage_and_store(db, executor, tickets, job.progress)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    else:
+        _triage_pages(job, RETRIAGE_SCOPES[scope], include_reviewed=include_reviewed)
+    _announce("tickets.retriaged", job.progress)
+    return dict(job.progress)
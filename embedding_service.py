@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import socket
+import struct
+import threading
+import socketserver
+from chromadb.api.types import EmbeddingFunction
+from app.services.metrics import stage
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# When set, embeddings come from a shared embedding worker listening on this Unix socket
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "")
+# "background" (default), "blocking" or "off"
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "background")
+
+
+def _send_message(sock, payload):
+    data = json.dumps(payload).encode("utf-8")
+    sock.sendall(struct.pack("!I", len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        part = sock.recv(size - len(buf))
+        if not part:
+            raise ConnectionError("Embedding socket closed")
+        buf.extend(part)
+    return bytes(buf)
+
+
+def _recv_message(sock):
+    (size,) = struct.unpack("!I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+class _LocalEmbedder:
+    """Loads the MiniLM model in this process."""
+
+    def __init__(self, model_name):
+        from chromadb.utils import embedding_functions
+        self._ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+    def embed(self, texts):
+        return self._ef(texts)
+
+
+class _SocketEmbedder:
+    """Client for the shared embedding worker; one short-lived connection per call."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+    def embed(self, texts):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            _send_message(sock, {"texts": list(texts)})
+            reply = _recv_message(sock)
+        if "error" in reply:
+            raise RuntimeError(f"Embedding worker error: {reply['error']}")
+        return reply["embeddings"]
+
+
+class SharedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function that loads its backend on first use. Every
+    collection and caller in the process shares one instance, so the model
+    is loaded at most once per process (or never, when a socket worker is used).
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, socket_path=EMBEDDING_SOCKET):
+        self.model_name = model_name
+        self.socket_path = socket_path
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._backend is not None
+
+    def _get_backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    if self.socket_path:
+                        self._backend = _SocketEmbedder(self.socket_path)
+                    else:
+                        self._backend = _LocalEmbedder(self.model_name)
+        return self._backend
+
+    def __call__(self, input):
+        backend = self._get_backend()
+        with stage("embedding"):
+            return backend.embed(input)
+
+
+_embedding_function = SharedEmbeddingFunction()
+
+
+def get_embedding_function():
+    return _embedding_function
+
+
+def embed_texts(texts):
+    return _embedding_function(list(texts))
+
+
+def warm_up():
+    """Loads the backend and runs one embedding so the first user request is not the slow one."""
+    embed_texts(["warm up"])
+
+
+def start_warm_up():
+    """Applies EMBEDDING_WARMUP at API startup without delaying it unless asked to."""
+    if EMBEDDING_WARMUP == "off":
+        return
+    if EMBEDDING_WARMUP == "blocking":
+        warm_up()
+        return
+
+    def _run():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"Embedding Warm-up Error: {str(e)}")
+
+    threading.Thread(target=_run, name="embedding-warmup", daemon=True).start()
+
+
+# --- Shared embedding worker process ---
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = _recv_message(self.request)
+            embeddings = self.server.embedder.embed(request["texts"])
+            _send_message(self.request, {"embeddings": [list(map(float, e)) for e in embeddings]})
+        except Exception as e:
+            _send_message(self.request, {"error": str(e)})
+
+
+class _EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, model_name=EMBEDDING_MODEL):
+    """
+    Runs a local embedding worker holding the only copy of the model.
+    Start it once, then point every API worker at it with EMBEDDING_SOCKET.
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _EmbeddingServer(socket_path, _EmbeddingRequestHandler)
+    server.embedder = _LocalEmbedder(model_name)
+    server.embedder.embed(["warm up"])
+    print(f"Embedding worker ready on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    # python -m app.services.embedding_service /tmp/support_embeddings.sock
+    serve(sys.argv[1] if len(sys.argv) > 1 else "/tmp/support_embeddings.sock")
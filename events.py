@@ -0,0 +1,131 @@
+import os
+import json
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+
+# Per-subscriber buffer; slow clients lose their oldest events rather than blocking publishers
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "100"))
+
+# Agents listen here for queue-level activity
+TICKETS_CHANNEL = "tickets"
+
+
+def ticket_channel(ticket_id: int):
+    return f"ticket:{ticket_id}"
+
+
+def customer_channel(customer_id: int):
+    return f"customer:{customer_id}"
+
+
+class EventBroker(ABC):
+    """
+    Pub/sub interface used by the routers. The in-process implementation below
+    serves a single API process; a broker backed by a local message server can
+    be swapped in with `set_broker` without touching the publishers.
+    """
+
+    def bind_loop(self, loop):
+        """Called at startup with the API event loop; brokers that need it keep a reference."""
+
+    @abstractmethod
+    def publish(self, channels, event: dict):
+        ...
+
+    @abstractmethod
+    def subscribe(self, channels):
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        ...
+
+
+class Subscription:
+    def __init__(self, channels, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.channels = set(channels)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker(EventBroker):
+    """Fans events out to asyncio queues; safe to publish from worker threads."""
+
+    def __init__(self):
+        self._channels = {}  # channel -> set of Subscription
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def bind_loop(self, loop):
+        self._loop = loop
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channels, event: dict):
+        """Delivers the event once to every subscriber of any of `channels`."""
+        with self._lock:
+            subscribers = set()
+            for channel in channels:
+                subscribers.update(self._channels.get(channel, ()))
+        if not subscribers:
+            return
+
+        def _fan_out():
+            for subscription in subscribers:
+                subscription.deliver(event)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            _fan_out()
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(_fan_out)
+
+
+_broker = InProcessBroker()
+
+
+def get_broker():
+    return _broker
+
+
+def set_broker(broker: EventBroker):
+    global _broker
+    _broker = broker
+
+
+def publish_ticket_event(event_type: str, ticket_id: int, customer_id: int = None, data: dict = None):
+    """Publishes a ticket-related event to the queue, per-ticket and per-customer channels."""
+    event = {"type": event_type, "ticket_id": ticket_id, "data": data or {}}
+    channels = [TICKETS_CHANNEL, ticket_channel(ticket_id)]
+    if customer_id is not None:
+        channels.append(customer_channel(customer_id))
+    _broker.publish(channels, event)
+
+
+def format_sse(event: dict):
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
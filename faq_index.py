@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import threading
+from app.services.hybrid_search import tokenize
+
+# Typeahead configuration (override via environment)
+FAQ_SUGGEST_LIMIT = int(os.getenv("FAQ_SUGGEST_LIMIT", "8"))
+# Share of the query's trigrams a question must contain to match when no word prefix does (typos)
+FAQ_TRIGRAM_THRESHOLD = float(os.getenv("FAQ_TRIGRAM_THRESHOLD", "0.4"))
+FAQ_PREFIX_MAX = 12
+
+QUESTION_WEIGHT, ANSWER_WEIGHT = 3.0, 1.0
+
+
+def parse_faq(document: str):
+    """Splits a "Q: ... A: ..." pair into (question, answer); free text becomes the answer."""
+    if "A:" in document:
+        question, answer = document.split("A:", 1)
+        return question.replace("Q:", "").strip(), answer.strip()
+    return "Matched Content", document.strip()
+
+
+def _trigrams(text: str):
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _order_key(doc_id: str, metadata):
+    # Ids end in the pair's position within its file ("faq_<source hash>_<i>")
+    position = doc_id.rsplit("_", 1)[-1]
+    return ((metadata or {}).get("source", ""), int(position) if position.isdigit() else 0, doc_id)
+
+
+class FaqSnapshot:
+    """
+    Immutable view of the FAQ collection: the parsed records, the pre-encoded
+    /faq/all body with its ETag, and word-prefix and trigram indexes over
+    questions and answers for typeahead.
+    """
+
+    def __init__(self, ids, documents, metadatas):
+        rows = sorted(zip(ids, documents, metadatas or [None] * len(ids)), key=lambda row: _order_key(row[0], row[2]))
+        self.records = []
+        self.prefixes = {}   # (field, prefix) -> {record index}
+        self.trigrams = {}   # trigram -> {record index}
+        self.words = []      # record index -> (question words, answer words)
+        for i, (doc_id, document, metadata) in enumerate(rows):
+            metadata = metadata or {}
+            if "question" in metadata and "answer" in metadata:
+                question, answer = metadata["question"], metadata["answer"]
+            else:
+                # Pairs uploaded before parsing moved to ingest time
+                question, answer = parse_faq(document or "")
+            self.records.append({"id": doc_id, "question": question, "answer": answer})
+
+            question_words, answer_words = set(tokenize(question)), set(tokenize(answer))
+            self.words.append((question_words, answer_words))
+            for field, words in (("q", question_words), ("a", answer_words)):
+                for word in words:
+                    for n in range(1, min(len(word), FAQ_PREFIX_MAX) + 1):
+                        self.prefixes.setdefault((field, word[:n]), set()).add(i)
+            for gram in _trigrams(question):
+                self.trigrams.setdefault(gram, set()).add(i)
+
+        public = [{"question": r["question"], "answer": r["answer"]} for r in self.records]
+        self.body = json.dumps(public, ensure_ascii=False).encode("utf-8")
+        self.version = hashlib.sha256(self.body).hexdigest()[:16]
+        self.etag = f'"faq-{self.version}"'
+
+    def _prefix_matches(self, field, term):
+        found = self.prefixes.get((field, term[:FAQ_PREFIX_MAX]), set())
+        if len(term) <= FAQ_PREFIX_MAX:
+            return found
+        slot = 0 if field == "q" else 1
+        return {i for i in found if any(word.startswith(term) for word in self.words[i][slot])}
+
+    def suggest(self, query: str, limit: int = FAQ_SUGGEST_LIMIT):
+        """
+        Records whose words start with every query term, questions weighted
+        above answers; falls back to trigram overlap with the question so
+        typos still match. No embedding is involved.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for field, weight in (("q", QUESTION_WEIGHT), ("a", ANSWER_WEIGHT)):
+                for i in self._prefix_matches(field, term):
+                    term_scores[i] = max(term_scores.get(i, 0.0), weight)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {i: score + term_scores[i] for i, score in scores.items() if i in term_scores}
+            if not scores:
+                break
+
+        if not scores:
+            grams = _trigrams(query)
+            shared = {}
+            for gram in grams:
+                for i in self.trigrams.get(gram, ()):
+                    shared[i] = shared.get(i, 0) + 1
+            scores = {i: count / len(grams) for i, count in shared.items() if count / len(grams) >= FAQ_TRIGRAM_THRESHOLD}
+
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))[:limit]
+        return [{"question": self.records[i]["question"], "answer": self.records[i]["answer"]} for i in ranked]
+
+
+class FaqIndex:
+    """
+    Snapshot of the FAQ collection built on first use and dropped whenever
+    FAQs are uploaded or deleted, so reads never touch Chroma in between.
+    Uploads and deletes in other workers are seen through the shared stamp.
+    """
+
+    def __init__(self, get_collection, stamp=None):
+        self._get_collection = get_collection
+        self._stamp = stamp
+        self._snapshot = None
+        self._snapshot_stamp = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        stamp = self._stamp.current() if self._stamp else None
+        snapshot = self._snapshot
+        if snapshot is None or stamp != self._snapshot_stamp:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or stamp != self._snapshot_stamp:
+                    generation = self._generation
+                    results = self._get_collection().get(include=["documents", "metadatas"])
+                    snapshot = FaqSnapshot(results['ids'], results['documents'], results.get('metadatas'))
+                    # An upload that landed mid-build must not be hidden behind this snapshot
+                    if generation == self._generation:
+                        self._snapshot = snapshot
+                        self._snapshot_stamp = stamp
+        return snapshot
+
+    def invalidate(self):
+        """Drops the snapshot here and, through the stamp, in every other worker."""
+        if self._stamp is not None:
+            self._stamp.bump()
+        self._generation += 1
+        self._snapshot = None
+
+    def suggest(self, query: str, limit: int = FAQ_SUGGEST_LIMIT):
+        return self.snapshot().suggest(query, limit)
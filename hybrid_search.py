@@ -0,0 +1,216 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from app.services.metrics import stage
+
+# Retrieval configuration (override via environment)
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "10"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1200"))
+# e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty disables re-ranking
+RAG_RERANKER_MODEL = os.getenv("RAG_RERANKER_MODEL", "")
+
+# Keeps error codes, versions and product names intact: "0x80070005", "err-42", "v2.1"
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[\-\._][a-z0-9]+)*")
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring. Only term statistics
+    are held in memory; documents stay in Chroma and are fetched by id.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}   # term -> {doc_id: term frequency}
+        self.doc_terms = {}  # doc_id -> unique terms (for removal)
+        self.doc_len = {}
+        self.total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, ids, documents):
+        with self._lock:
+            for doc_id, text in zip(ids, documents):
+                self._remove(doc_id)
+                counts = Counter(tokenize(text or ""))
+                for term, tf in counts.items():
+                    self.postings.setdefault(term, {})[doc_id] = tf
+                self.doc_terms[doc_id] = tuple(counts)
+                length = sum(counts.values())
+                self.doc_len[doc_id] = length
+                self.total_len += length
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def search(self, query: str, n_results: int):
+        """Returns up to n_results (doc_id, score) pairs, best first."""
+        with self._lock:
+            n_docs = len(self.doc_len)
+            if not n_docs:
+                return []
+            avg_len = self.total_len / n_docs
+            scores = {}
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+
+class CollectionKeywordIndex:
+    """
+    BM25 index kept alongside one Chroma collection. Built from the collection
+    on first use, then updated incrementally by the ingestion and delete paths
+    of this worker; rebuilt when the shared stamp shows another worker changed it.
+    """
+
+    def __init__(self, get_collection, stamp=None):
+        self._get_collection = get_collection
+        self._stamp = stamp
+        self._index = None
+        self._built_stamp = None
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        stamp = self._stamp.current() if self._stamp else None
+        if self._index is None or stamp != self._built_stamp:
+            with self._lock:
+                if self._index is None or stamp != self._built_stamp:
+                    # Stamp read before the build: a change landing mid-build triggers another
+                    index = BM25Index()
+                    results = self._get_collection().get(include=["documents"])
+                    index.add(results['ids'], results['documents'])
+                    self._index = index
+                    self._built_stamp = stamp
+        return self._index
+
+    def add(self, ids, documents):
+        # Before the first search there is nothing to update: the build will include these
+        if self._index is not None:
+            self._index.add(ids, documents)
+
+    def remove(self, ids):
+        if self._index is not None:
+            self._index.remove(ids)
+
+    def reset(self):
+        self._index = None
+
+    def search(self, query: str, n_results: int):
+        return self._ensure().search(query, n_results)
+
+
+def rrf_fuse(ranked_lists, k=RRF_K):
+    """Reciprocal rank fusion of several ranked id lists; returns ids best first."""
+    scores = {}
+    for ranking in ranked_lists:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def rerank(query: str, hits):
+    """Re-orders hits with a local cross-encoder when RAG_RERANKER_MODEL is set."""
+    global _reranker
+    if not RAG_RERANKER_MODEL or len(hits) < 2:
+        return hits
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                _reranker = CrossEncoder(RAG_RERANKER_MODEL)
+    scores = _reranker.predict([(query, hit["document"]) for hit in hits])
+    for hit, score in zip(hits, scores):
+        hit["rerank_score"] = float(score)
+    return sorted(hits, key=lambda hit: hit["rerank_score"], reverse=True)
+
+
+def estimate_tokens(text: str):
+    # ~4 characters per token is close enough for budgeting English prompts
+    return max(1, len(text) // 4)
+
+
+def pack_context(hits, token_budget=RAG_CONTEXT_TOKEN_BUDGET):
+    """Keeps the best hits whose combined size fits the prompt token budget (always at least one)."""
+    packed, used = [], 0
+    for hit in hits:
+        cost = estimate_tokens(hit["document"])
+        if packed and used + cost > token_budget:
+            break
+        packed.append(hit)
+        used += cost
+    return packed
+
+
+def hybrid_query(coll, keyword_index, query: str, query_embedding, n_results: int, candidates=RAG_CANDIDATES):
+    """
+    Dense + BM25 retrieval fused with RRF, optionally re-ranked. Returns up to
+    n_results hits as dicts with id, document, metadata and distance.
+    """
+    with stage("vector_search"):
+        dense = coll.query(
+            query_embeddings=[query_embedding],
+            n_results=candidates,
+            include=["documents", "metadatas", "distances"]
+        )
+    hits = {}
+    dense_ids = dense['ids'][0] if dense['ids'] else []
+    for i, doc_id in enumerate(dense_ids):
+        hits[doc_id] = {
+            "id": doc_id,
+            "document": dense['documents'][0][i],
+            "metadata": dense['metadatas'][0][i] if dense.get('metadatas') else None,
+            "distance": dense['distances'][0][i] if dense.get('distances') else None,
+        }
+
+    with stage("keyword_search"):
+        keyword_ids = [doc_id for doc_id, _ in keyword_index.search(query, candidates)]
+    missing = [doc_id for doc_id in keyword_ids if doc_id not in hits]
+    if missing:
+        extra = coll.get(ids=missing, include=["documents", "metadatas"])
+        for i, doc_id in enumerate(extra['ids']):
+            hits[doc_id] = {
+                "id": doc_id,
+                "document": extra['documents'][i],
+                "metadata": extra['metadatas'][i] if extra.get('metadatas') else None,
+                "distance": None,
+            }
+
+    fused = [hits[doc_id] for doc_id in rrf_fuse([dense_ids, keyword_ids]) if doc_id in hits]
+    if RAG_RERANKER_MODEL:
+        with stage("rerank"):
+            fused = rerank(query, fused[:candidates])
+    return fused[:n_results]
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+MANIFEST_DIR = os.getenv("KB_MANIFEST_DIR", "./local_rag_db/manifests")
+
+
+class ChangeStamp:
+    """
+    Shared marker of a collection's last change, kept next to its manifest.
+    Uvicorn workers cache collection state in memory (answers, BM25, FAQ
+    snapshot, manifest); each compares the stamp with the one its state was
+    built from and rebuilds when another worker changed the collection.
+    """
+
+    def __init__(self, collection_name: str, directory: str = MANIFEST_DIR):
+        self.path = os.path.join(directory, f"{collection_name}.stamp")
+
+    def current(self):
+        """The stamp value, or None before the collection's first change."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def bump(self):
+        """Marks the collection as changed; call after the change is written."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Written in place: a reader that catches it half-written only rebuilds once more
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+
+
+class FileManifest:
+    """
+    Per-collection registry of ingested files: which chunk ids each file owns,
+    the hash of the content they were built from, and listing details (chunk
+    count, size, ingest time). Persisted as JSON next to the Chroma store so
+    re-ingestion can diff against the previous version and admin listing never
+    has to scan the collection. With a stamp, the cached copy is re-read after
+    another worker changed the collection.
+    """
+
+    def __init__(self, collection_name: str, directory: str = MANIFEST_DIR, stamp: ChangeStamp = None):
+        self.path = os.path.join(directory, f"{collection_name}.json")
+        self._lock = threading.Lock()
+        self._files = None
+        self._stamp = stamp
+        self._loaded_stamp = None
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _load(self):
+        stamp = self._stamp.current() if self._stamp else None
+        if self._files is None or stamp != self._loaded_stamp:
+            self._loaded_stamp = stamp
+            if self.exists:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._files = json.load(f)
+            else:
+                self._files = {}
+        return self._files
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._files, f)
+        # Atomic swap so a crash never leaves a half-written manifest
+        os.replace(tmp_path, self.path)
+
+    def get(self, filename: str):
+        with self._lock:
+            entry = self._load().get(filename)
+            return dict(entry) if entry else None
+
+    def filenames(self):
+        with self._lock:
+            return list(self._load().keys())
+
+    def summaries(self):
+        """Listing details for every file, without the chunk id lists."""
+        with self._lock:
+            return [
+                {
+                    "filename": name,
+                    "chunk_count": entry.get("chunk_count", len(entry["chunk_ids"])),
+                    "size_bytes": entry.get("size_bytes"),
+                    "ingested_at": entry.get("ingested_at"),
+                }
+                for name, entry in self._load().items()
+            ]
+
+    def put(self, filename: str, file_hash: str, chunk_ids, size_bytes: int = None):
+        with self._lock:
+            self._load()[filename] = {
+                "file_hash": file_hash,
+                "chunk_ids": list(chunk_ids),
+                "chunk_count": len(chunk_ids),
+                "size_bytes": size_bytes,
+                "ingested_at": time.time(),
+            }
+            self._save()
+
+    def remove(self, filename: str):
+        with self._lock:
+            entry = self._load().pop(filename, None)
+            if entry is not None:
+                self._save()
+            return entry
+
+    def bootstrap(self, entries: dict):
+        """Seeds a manifest that does not exist yet (used to adopt chunks indexed before manifests)."""
+        with self._lock:
+            self._loaded_stamp = self._stamp.current() if self._stamp else None
+            self._files = {
+                name: {"file_hash": None, "chunk_ids": ids, "chunk_count": len(ids), "size_bytes": None, "ingested_at": None}
+                for name, ids in entries.items()
+            }
+            self._save()
@@ -0,0 +1,104 @@
+import os
+import re
+import json
+import time
+import random
+from types import SimpleNamespace
+from groq import Groq
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0"))
+# Fraction of calls that fail with a 503, for exercising retries and the circuit breaker
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+
+class FakeLLMError(Exception):
+    """Upstream-style error raised by the fake client; carries an HTTP status like the Groq SDK."""
+
+    def __init__(self, message, status_code=503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeLLMClient:
+    """
+    Local stand-in for the Groq client exposing the same
+    `client.chat.completions.create(...)` surface, including `stream=True`.
+    Answers are deterministic so tests can assert on them.
+    """
+
+    def __init__(self, latency_ms=FAKE_LLM_LATENCY_MS, token_delay_ms=FAKE_LLM_TOKEN_DELAY_MS, reply=None,
+                 failure_rate=FAKE_LLM_FAILURE_RATE):
+        self.latency_ms = latency_ms
+        self.token_delay_ms = token_delay_ms
+        self.reply = reply
+        self.failure_rate = failure_rate
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, model=None, stream=False, response_format=None, timeout=None, **kwargs):
+        self.calls.append({"messages": messages, "model": model, "stream": stream})
+        text = self._reply_for(messages, response_format)
+
+        if self.latency_ms:
+            # Honour the per-call timeout like the real SDK does
+            if timeout is not None and self.latency_ms / 1000 > timeout:
+                time.sleep(timeout)
+                raise TimeoutError("Fake LLM request timed out")
+            time.sleep(self.latency_ms / 1000)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise FakeLLMError("Fake LLM upstream unavailable")
+
+        if stream:
+            return self._stream(text)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(
+                prompt_tokens=sum(len(m["content"].split()) for m in messages),
+                completion_tokens=len(text.split())
+            )
+        )
+
+    def _stream(self, text):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if self.token_delay_ms:
+                time.sleep(self.token_delay_ms / 1000)
+            token = word if i == len(words) - 1 else word + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    def _reply_for(self, messages, response_format):
+        if self.reply is not None:
+            return self.reply
+        if response_format and response_format.get("type") == "json_object":
+            # Batched triage prompts list their tickets as "Ticket <id>:"
+            batch_ids = re.findall(r"^\s*Ticket (\d+):", messages[-1]["content"], re.M)
+            if batch_ids:
+                return json.dumps({"results": [
+                    {
+                        "id": int(ticket_id),
+                        "assigned_to": "IT",
+                        "priority": "Medium",
+                        "ai_summary": "Fake triage summary. Generated by the local test client."
+                    }
+                    for ticket_id in batch_ids
+                ]})
+            return json.dumps({
+                "assigned_to": "IT",
+                "priority": "Medium",
+                "ai_summary": "Fake triage summary. Generated by the local test client."
+            })
+        question = messages[-1]["content"]
+        return f"This is a fake answer to: {question}"
+
+
+def get_llm_client():
+    """
+    Returns the configured chat-completion client. LLM_BACKEND is "groq" (default)
+    or "fake" for tests, demos and benchmarks without network access.
+    """
+    if os.getenv("LLM_BACKEND", "groq") == "fake":
+        return FakeLLMClient()
+    # Retries are done by the LLM gateway, so the SDK's own are switched off
+    return Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
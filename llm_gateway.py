@@ -0,0 +1,255 @@
+import os
+import time
+import random
+import threading
+from app.services.llm_clients import get_llm_client
+from app.services.metrics import stage, histogram, gauge, LLM_REQUEST_DURATION, LLM_TOKENS, LLM_ERRORS
+
+# Gateway configuration (override via environment)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Consecutive retryable failures (timeouts, 5xx, 429) that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+
+LLM_TIME_TO_FIRST_TOKEN = histogram(
+    "llm_time_to_first_token_seconds", "Delay before the first streamed token", ("model",)
+)
+
+# Upstream statuses worth retrying; other 4xx mean the request itself is wrong
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not produce an answer in time; callers fall back."""
+
+
+class CircuitOpen(LLMUnavailable):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+def _error_reason(error):
+    status = getattr(error, "status_code", None)
+    return str(status) if status is not None else type(error).__name__
+
+
+def _record_usage(model, response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+        LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+
+def _is_retryable(error):
+    status = getattr(error, "status_code", None)
+    return status is None or status in RETRYABLE_STATUS or status >= 500
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds; then lets a single trial call through (half-open)
+    and closes again on its success.
+    """
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def abandon_trial(self):
+        """Frees the half-open trial slot when the call never reached upstream."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """
+    Single entry point for chat completions: per-call deadline, retries with
+    exponential backoff and jitter, a circuit breaker and a cap on concurrent
+    upstream calls. The backend is whatever `get_llm_client()` returns
+    (Groq, or the local fake with LLM_BACKEND=fake) unless one is passed in.
+    """
+
+    def __init__(self, client=None, timeout=LLM_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES,
+                 backoff=LLM_RETRY_BACKOFF, max_concurrency=LLM_MAX_CONCURRENCY, breaker=None):
+        self._client = client
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_llm_client()
+        return self._client
+
+    def set_client(self, client):
+        """Swaps the backend, e.g. for a FakeLLMClient in tests and benchmarks."""
+        self._client = client
+
+    def _attempts(self, deadline):
+        """Yields once per allowed attempt, sleeping the backoff in between."""
+        for attempt in range(1, self.max_retries + 1):
+            if time.monotonic() >= deadline:
+                return
+            if not self.breaker.allow():
+                raise CircuitOpen("LLM circuit breaker is open")
+            yield attempt
+            delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+            if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                return
+            time.sleep(delay)
+
+    def _record_error(self, error):
+        # Only upstream trouble (timeouts, 5xx, throttling) counts towards opening the
+        # circuit; a rejected request says nothing about upstream health
+        if _is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.abandon_trial()
+
+    def _acquire(self, deadline):
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self.breaker.abandon_trial()
+            raise LLMUnavailable("Timed out waiting for an LLM slot")
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def complete(self, messages, model=DEFAULT_MODEL, timeout=None, **kwargs):
+        """Returns the completion text, or raises LLMUnavailable once retries and the deadline are spent."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last_error = None
+        for attempt in self._attempts(deadline):
+            self._acquire(deadline)
+            remaining = max(0.001, deadline - time.monotonic())
+            started = time.perf_counter()
+            try:
+                with stage("llm"):
+                    response = self.client.chat.completions.create(
+                        messages=messages, model=model, timeout=remaining, **kwargs
+                    )
+                content = response.choices[0].message.content
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model=model, outcome="ok")
+                _record_usage(model, response)
+            except Exception as e:
+                last_error = e
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model=model, outcome="error")
+                LLM_ERRORS.inc(model=model, reason=_error_reason(e))
+                self._record_error(e)
+                print(f"LLM Error (attempt {attempt}): {str(e)}")
+                if not _is_retryable(e):
+                    break
+                continue
+            finally:
+                self._release()
+            self.breaker.record_success()
+            return content
+        raise LLMUnavailable(f"LLM call failed: {last_error or 'deadline exceeded'}")
+
+    def stream(self, messages, model=DEFAULT_MODEL, timeout=None, **kwargs):
+        """
+        Yields completion tokens. Failures before the first token are retried
+        like `complete`; once tokens have been sent the error propagates.
+        The timeout covers connecting and the first token.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last_error = None
+        for attempt in self._attempts(deadline):
+            self._acquire(deadline)
+            remaining = max(0.001, deadline - time.monotonic())
+            started = False
+            began, chunks = time.perf_counter(), 0
+            try:
+                stream = self.client.chat.completions.create(
+                    messages=messages, model=model, stream=True, timeout=remaining, **kwargs
+                )
+                for chunk in stream:
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                        LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - began, model=model)
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        chunks += 1
+                        yield token
+                if not started:
+                    self.breaker.record_success()
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - began, model=model, outcome="ok")
+                # Streams carry no usage block; one chunk is roughly one token
+                LLM_TOKENS.inc(chunks, model=model, kind="stream_chunks")
+                return
+            except Exception as e:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - began, model=model, outcome="error")
+                LLM_ERRORS.inc(model=model, reason=_error_reason(e))
+                if started:
+                    raise
+                last_error = e
+                self._record_error(e)
+                print(f"LLM Stream Error (attempt {attempt}): {str(e)}")
+                if not _is_retryable(e):
+                    break
+            finally:
+                self._release()
+        raise LLMUnavailable(f"LLM stream failed: {last_error or 'deadline exceeded'}")
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "circuit": self.breaker.state,
+            "in_flight": in_flight,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+llm_gateway = LLMGateway()
+gauge("llm_in_flight_requests", "LLM calls currently holding a gateway slot", lambda: llm_gateway.stats()["in_flight"])
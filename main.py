@@ -1,10 +1,23 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # Change these lines to include 'app.'
 from app.database import engine, Base
+import asyncio
 import app.models as models
 from app.routers import auth, tickets, rag
+from app.services.triage_worker import triage_pool
+from app.services.events import get_broker
+from app.services.embedding_service import start_warm_up
+from app.services.attachment_text import shutdown_pool as shutdown_extract_pool
+from app.services.ticket_stats import ensure_ticket_stats
+from app.services.ticket_search import ensure_search_index
+from app.services.schema_upgrade import ensure_columns
+from app.services.metrics import (
+    registry, instrument_engine, start_trace, server_timing, HTTP_REQUEST_DURATION, METRICS_TRACING
+)
 
 app = FastAPI(title="AI Support Helpdesk")
 
@@ -18,9 +31,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- 1b. Request Timing (feeds /metrics; Server-Timing spans when METRICS_TRACING=on) ---
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    spans = start_trace() if METRICS_TRACING else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        # Route templates (/api/tickets/{ticket_id}) keep label cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            elapsed, method=request.method, route=route.path if route else "unmatched", status=status
+        )
+    if spans is not None:
+        response.headers["Server-Timing"] = server_timing(spans, elapsed)
+    return response
+
 # --- 2. Initialize Database ---
 # This creates the 'users' and 'tickets' tables in MySQL automatically
 models.Base.metadata.create_all(bind=engine)
+# create_all never alters existing tables: add the columns newer versions introduced
+ensure_columns(engine)
+instrument_engine(engine, "sync")
 
 # --- 3. Include Routers ---
 # This pulls in all the logic from auth.py and tickets.py
@@ -28,6 +64,29 @@ app.include_router(auth.router)
 app.include_router(tickets.router)
 app.include_router(rag.router)
 
+# --- 4. Background Workers ---
+# Starts the triage worker pool so ticket submission never waits on the LLM
+@app.on_event("startup")
+async def start_background_workers():
+    # Loads the embedding model (or connects to the shared embedding worker) off the startup path
+    start_warm_up()
+    # Lets worker threads publish ticket events onto the API loop
+    get_broker().bind_loop(asyncio.get_running_loop())
+    # One-time build of the dashboard aggregates for databases created before them
+    await asyncio.to_thread(ensure_ticket_stats)
+    await asyncio.to_thread(ensure_search_index)
+    await triage_pool.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await triage_pool.stop()
+    shutdown_extract_pool()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of request, stage, DB and LLM metrics."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "Support Backend is Running", "docs": "/docs"}
\ No newline at end of file
@@ -0,0 +1,221 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# "off" (default) or "on": adds a Server-Timing header with per-stage spans to every response
+METRICS_TRACING = os.getenv("METRICS_TRACING", "off").lower() in ("1", "on", "true", "yes")
+
+# Seconds; covers sub-millisecond DB queries up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value read from a callback at scrape time (queue depths, in-flight calls)."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn):
+        super().__init__(name, help_text)
+        self.fn = fn
+
+    def _samples(self):
+        try:
+            return [f"{self.name} {float(self.fn())}"]
+        except Exception:
+            return []
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        lines = []
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {entry[-2]}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {entry[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    return registry.register(Counter(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def gauge(name, help_text, fn):
+    return registry.register(Gauge(name, help_text, fn))
+
+
+# --- Shared metrics ---
+HTTP_REQUEST_DURATION = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+STAGE_DURATION = histogram(
+    "pipeline_stage_duration_seconds", "Time spent in a named pipeline stage", ("stage",)
+)
+DB_QUERY_DURATION = histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("engine",)
+)
+LLM_REQUEST_DURATION = histogram(
+    "llm_request_duration_seconds", "LLM call latency per attempt", ("model", "outcome")
+)
+LLM_TOKENS = counter("llm_tokens_total", "LLM tokens reported by the backend", ("model", "kind"))
+LLM_ERRORS = counter("llm_errors_total", "Failed LLM attempts", ("model", "reason"))
+
+
+# --- Per-request tracing spans ---
+_spans = contextvars.ContextVar("metrics_spans", default=None)
+
+
+def start_trace():
+    """Begins collecting spans for the current request; returns the span list."""
+    spans = []
+    _spans.set(spans)
+    return spans
+
+
+@contextmanager
+def stage(name):
+    """Times a block into pipeline_stage_duration_seconds and the current request's spans."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=name)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def server_timing(spans, total=None):
+    """Server-Timing header value, one entry per stage (durations summed, in ms)."""
+    totals = {}
+    for name, elapsed in list(spans):
+        totals[name] = totals.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={duration * 1000:.1f}" for name, duration in totals.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def instrument_engine(engine, name):
+    """Records every SQL statement on `engine` (a sync Engine, or AsyncEngine.sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        DB_QUERY_DURATION.observe(elapsed, engine=name)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append(("db", elapsed))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("metrics_query_start") if conn is not None else None
+        if starts:
+            starts.pop()
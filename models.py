@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index
 from app.database import Base
 import datetime
 
@@ -23,10 +23,35 @@ class Ticket(Base):
     priority = Column(String(50))
     ai_summary = Column(Text)
     status = Column(String(20), default="Open")
+    # Background triage state: "Pending triage" (or "Import pending") -> "Triaged" / "Triage failed"
+    triage_status = Column(String(30), default="Pending triage", index=True)
+    # Who set category/priority: "classifier", "llm", "agent", "import" or "duplicate";
+    # confidence for the classifier, similarity for duplicates
+    triage_source = Column(String(20))
+    triage_confidence = Column(Float)
+    # First ticket of the incident this one duplicates (triage copied from it)
+    duplicate_of_id = Column(Integer, index=True)
     # NEW FIELD: Connects ticket to the user who raised it
     customer_id = Column(Integer, index=True) 
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     file_path = Column(String(255))
+    # Content-addressed attachments: original name, SHA-256 (also the ETag) and size in bytes
+    file_name = Column(String(255))
+    file_hash = Column(String(64), index=True)
+    file_size = Column(Integer)
+    # Set by the first agent reply; feeds per-agent workload and time-to-first-response
+    first_responder_id = Column(Integer, index=True)
+    first_response_at = Column(DateTime)
+
+    # Composite indexes backing the keyset-paginated agent queue:
+    # each filter column is followed by the (created_at, id) sort key
+    __table_args__ = (
+        Index("ix_tickets_created_id", "created_at", "id"),
+        Index("ix_tickets_status_created_id", "status", "created_at", "id"),
+        Index("ix_tickets_category_created_id", "category", "created_at", "id"),
+        Index("ix_tickets_priority_created_id", "priority", "created_at", "id"),
+        Index("ix_tickets_customer_created_id", "customer_id", "created_at", "id"),
+    )
 
 
 class Message(Base):
@@ -39,3 +64,27 @@ class Message(Base):
     text = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Serves "thread for ticket X in order" and after_id/since cursors from the index alone
+    __table_args__ = (
+        Index("ix_messages_ticket_created_id", "ticket_id", "created_at", "id"),
+    )
+
+
+# --- Dashboard aggregates, maintained incrementally alongside ticket writes ---
+class TicketCounter(Base):
+    __tablename__ = "ticket_counters"
+
+    # e.g. ("status", "Open"), ("priority", "High"), ("total", "all")
+    dimension = Column(String(30), primary_key=True)
+    value = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class AgentWorkload(Base):
+    __tablename__ = "agent_workload"
+
+    agent_id = Column(Integer, primary_key=True)
+    open_tickets = Column(Integer, default=0, nullable=False)
+    completed_tickets = Column(Integer, default=0, nullable=False)
+    responded_tickets = Column(Integer, default=0, nullable=False)
+    response_seconds_total = Column(Integer, default=0, nullable=False)
@@ -1,14 +1,24 @@
 import os
+import uuid
+import asyncio
 import shutil
-from fastapi import APIRouter, Form, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Form, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse, Response
 from app.services.rag_service import (
     ask_rag_bot, 
+    stream_rag_bot,
     load_txt_to_db, 
+    run_kb_ingest_job,
     load_faq_to_db, 
-    get_uploaded_filenames, 
+    get_uploaded_files,
     delete_file_from_db,
-    faq_collection  # Ensure this is exported from your service
+    search_faq_collection,
+    get_faqs_from_db,
+    faq_index
 )
+from app.services.rag_cache import answer_cache
+from app.services.llm_gateway import llm_gateway
+from app.services.jobs import job_registry
 
 router = APIRouter(prefix="/api/ai", tags=["AI Knowledge Base"])
 
@@ -17,78 +27,132 @@ router = APIRouter(prefix="/api/ai", tags=["AI Knowledge Base"])
 async def ask_question(question: str = Form(...)):
     """Queries the Knowledge Base using RAG and LLM."""
     try:
-        answer = ask_rag_bot(question)
+        # Retrieval and the gateway (slot wait, retry backoff) block; keep them off the event loop
+        answer = await asyncio.to_thread(ask_rag_bot, question)
         return {"question": question, "answer": answer}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ask/stream")
+async def ask_question_stream(question: str = Form(...)):
+    """Streams the RAG answer as Server-Sent Events: sources first, then tokens."""
+    return StreamingResponse(
+        stream_rag_bot(question),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- ADMIN: ANSWER CACHE MONITORING ---
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters and sizes of the RAG answer cache, for threshold tuning."""
+    return answer_cache.stats()
+
+@router.get("/llm/status")
+async def get_llm_status():
+    """Circuit breaker state and in-flight calls of the shared LLM gateway."""
+    return llm_gateway.stats()
+
+@router.post("/admin/cache/clear")
+async def clear_answer_cache():
+    """Manually drops every cached answer."""
+    answer_cache.invalidate()
+    return {"message": "Answer cache cleared"}
+
 # --- TASK 2: FAQ INSTANT SEARCH (Home Page) ---
 @router.get("/faq/search")
 async def search_faqs(q: str = Query(..., min_length=2)):
-    """Performs a vector search specifically on the FAQ collection."""
+    """Performs a hybrid keyword + vector search specifically on the FAQ collection."""
     try:
-        # Search the FAQ collection in ChromaDB
-        results = faq_collection.query(
-            query_texts=[q],
-            n_results=5
-        )
-        
-        # Format the vector results for the Frontend
-        formatted_results = []
-        for i in range(len(results['documents'][0])):
-            content = results['documents'][0][i]
-            # Assumes format "Q: [question] \n A: [answer]"
-            if "A:" in content:
-                q_part, a_part = content.split("A:", 1)
-                formatted_results.append({
-                    "question": q_part.replace("Q:", "").strip(),
-                    "answer": a_part.strip()
-                })
-            else:
-                formatted_results.append({
-                    "question": "Matched Content", 
-                    "answer": content
-                })
-        return formatted_results
+        # Search the FAQ collection (BM25 fused with ChromaDB similarity); Q/A come pre-parsed
+        return await asyncio.to_thread(search_faq_collection, q, n_results=5)
     except Exception as e:
         return []
 
+@router.get("/faq/suggest")
+async def suggest_faqs(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(8, ge=1, le=20)):
+    """Typeahead over FAQ questions and answers from the in-memory prefix/trigram index (no embedding)."""
+    try:
+        # The first call after an upload builds the snapshot with a blocking Chroma read
+        return await asyncio.to_thread(faq_index.suggest, q, limit)
+    except Exception as e:
+        print(f"FAQ Suggest Error: {str(e)}")
+        return []
+
+@router.get("/faq/all")
+async def get_all_faqs(request: Request):
+    """Every FAQ as question/answer pairs; cached until the next upload and revalidated by ETag."""
+    snapshot = await asyncio.to_thread(get_faqs_from_db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "X-FAQ-Version": snapshot.version}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and snapshot.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
 # --- ADMIN: FILE MANAGEMENT (KB) ---
-@router.post("/admin/upload-knowledge")
+@router.post("/admin/upload-knowledge", status_code=202)
 async def upload_kb(file: UploadFile = File(...)):
-    """Uploads and embeds a technical text file into the KB collection."""
-    file_path = f"app/temp_uploads/{file.filename}"
-    # Ensure temp directory exists
+    """Saves a technical text file and indexes it into the KB collection as a background job."""
     os.makedirs("app/temp_uploads", exist_ok=True)
-    
+    # Unique temp name so concurrent uploads of the same file never collide
+    file_path = f"app/temp_uploads/kb_{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    success = load_txt_to_db(file_path)
-    os.remove(file_path)
-    return {"message": "Knowledge Base Updated"}
+        while chunk := await file.read(1024 * 1024):
+            buffer.write(chunk)
+
+    job = job_registry.submit("kb_ingest", run_kb_ingest_job, file_path, file.filename)
+    return {"message": "Knowledge Base ingestion started", "job_id": job.id}
+
+# --- ADMIN: INGESTION JOB PROGRESS & CANCELLATION ---
+@router.get("/admin/ingest-jobs")
+async def list_ingest_jobs():
+    """Lists recent knowledge-base ingestion jobs, newest last."""
+    return {"jobs": [job.to_dict() for job in job_registry.list("kb_ingest")]}
+
+@router.get("/admin/ingest-jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = job_registry.get(job_id)
+    if not job or job.kind != "kb_ingest":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.delete("/admin/ingest-jobs/{job_id}")
+async def cancel_ingest_job(job_id: str):
+    """Requests cancellation; chunks already indexed by the job are removed."""
+    job = job_registry.get(job_id)
+    if not job or job.kind != "kb_ingest":
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.cancel()
+    return {"message": "Cancellation requested", "job_id": job.id}
 
 # --- ADMIN: FILE MANAGEMENT (FAQ) ---
 @router.post("/admin/upload-faq")
 async def upload_faq(file: UploadFile = File(...)):
     """Uploads and embeds Q&A pairs into the FAQ collection."""
-    file_path = f"app/temp_uploads/{file.filename}"
     os.makedirs("app/temp_uploads", exist_ok=True)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    success = load_faq_to_db(file_path)
-    os.remove(file_path)
+    # Unique temp name so concurrent uploads of the same file never collide
+    file_path = f"app/temp_uploads/faq_{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+    try:
+        # Copying and embedding block, so both run off the event loop
+        success = await asyncio.to_thread(_store_faq_upload, file.file, file_path, file.filename)
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
     return {"message": "FAQ Section Updated"}
 
+def _store_faq_upload(source, file_path: str, filename: str):
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+    return load_faq_to_db(file_path, filename)
+
 # --- ADMIN: CONTENT LISTING & DELETION ---
 @router.get("/files/{type}")
 async def list_files(type: str):
     """Lists unique filenames in either the 'kb' or 'faq' collections."""
     # type can be 'kb' or 'faq'
-    files = get_uploaded_filenames(type)
-    return {"files": files}
+    details = get_uploaded_files(type)
+    return {"files": [d["filename"] for d in details], "details": details}
 
 @router.delete("/files/{type}/{filename}")
 async def delete_file(type: str, filename: str):
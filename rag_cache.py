@@ -0,0 +1,162 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.services.kb_manifest import ChangeStamp
+
+# Cache configuration (override via environment)
+EXACT_CACHE_SIZE = int(os.getenv("RAG_EXACT_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("RAG_SEMANTIC_CACHE_SIZE", "500"))
+CACHE_TTL_SECONDS = float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_THRESHOLD = float(os.getenv("RAG_SEMANTIC_THRESHOLD", "0.92"))
+
+
+def normalize_query(query: str):
+    """Lowercases, strips punctuation and collapses whitespace so trivial variants share a key."""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+class AnswerCache:
+    """
+    Two-level answer cache for the RAG bot:
+      1. Exact LRU keyed on the normalized query text.
+      2. Semantic cache keyed on the query embedding, hit when cosine similarity
+         to a cached query is above the threshold.
+    Both levels honour the TTL and are cleared whenever the KB collection changes,
+    including changes made by another worker (seen through the shared stamp).
+    """
+
+    def __init__(self, exact_size=EXACT_CACHE_SIZE, semantic_size=SEMANTIC_CACHE_SIZE,
+                 ttl=CACHE_TTL_SECONDS, threshold=SEMANTIC_THRESHOLD, stamp=None):
+        self.exact_size = exact_size
+        self.semantic_size = semantic_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._exact = OrderedDict()     # key -> (answer, stored_at)
+        self._semantic = OrderedDict()  # key -> (unit embedding, answer, stored_at)
+        self._lock = threading.Lock()
+        self.version = 0
+        self.stamp = stamp
+        self._seen_stamp = stamp.current() if stamp else None
+        self._counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _expired(self, stored_at):
+        return time.monotonic() - stored_at > self.ttl
+
+    def _sync(self):
+        """Drops every entry if another worker changed the KB (called with the lock held)."""
+        if self.stamp is None:
+            return
+        stamp = self.stamp.current()
+        if stamp != self._seen_stamp:
+            self._seen_stamp = stamp
+            self._clear()
+
+    def get_exact(self, query: str):
+        key = normalize_query(query)
+        with self._lock:
+            self._sync()
+            entry = self._exact.get(key)
+            if entry is None:
+                return None
+            answer, stored_at = entry
+            if self._expired(stored_at):
+                del self._exact[key]
+                return None
+            self._exact.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return answer
+
+    def get_semantic(self, query: str, embedding):
+        """Returns the answer of the most similar cached query above the threshold, else None."""
+        vector = _unit(embedding)
+        with self._lock:
+            self._sync()
+            best_key, best_score = None, self.threshold
+            for key, (cached_vector, _, stored_at) in list(self._semantic.items()):
+                if self._expired(stored_at):
+                    del self._semantic[key]
+                    continue
+                score = float(np.dot(vector, cached_vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._semantic.move_to_end(best_key)
+            answer = self._semantic[best_key][1]
+            self._counters["semantic_hits"] += 1
+            self._put_exact(normalize_query(query), answer)
+            return answer
+
+    def put(self, query: str, embedding, answer: str, version: int):
+        """Stores an answer unless the KB changed since `version` was read."""
+        key = normalize_query(query)
+        with self._lock:
+            self._sync()
+            if version != self.version:
+                return
+            self._put_exact(key, answer)
+            self._semantic[key] = (_unit(embedding), answer, time.monotonic())
+            self._semantic.move_to_end(key)
+            while len(self._semantic) > self.semantic_size:
+                self._semantic.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _put_exact(self, key, answer):
+        self._exact[key] = (answer, time.monotonic())
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.exact_size:
+            self._exact.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def invalidate(self):
+        """
+        Drops every cached answer; called when the support_kb collection changes.
+        Bumps the shared stamp so the other workers drop theirs too.
+        """
+        with self._lock:
+            if self.stamp is not None:
+                self.stamp.bump()
+                self._seen_stamp = self.stamp.current()
+            self._clear()
+
+    def _clear(self):
+        self._exact.clear()
+        self._semantic.clear()
+        self.version += 1
+        self._counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "exact_entries": len(self._exact),
+                "semantic_entries": len(self._semantic),
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "version": self.version,
+            }
+
+
+def _unit(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+answer_cache = AnswerCache(stamp=ChangeStamp("support_kb"))
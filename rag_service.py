@@ -1,68 +1,414 @@
 import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import chromadb
-from chromadb.utils import embedding_functions
-from groq import Groq
 from dotenv import load_dotenv
+from app.services.rag_cache import answer_cache
+from app.services.llm_gateway import llm_gateway, LLMUnavailable
+from app.services.embedding_service import get_embedding_function
+from app.services.kb_manifest import FileManifest, ChangeStamp
+from app.services.hybrid_search import CollectionKeywordIndex, hybrid_query, pack_context
+from app.services.faq_index import FaqIndex, parse_faq
 
 load_dotenv()
 
-# 1. Setup Local Embeddings
-local_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
+# 1. Setup Local Embeddings (shared, loaded on first use or at warm-up)
+local_ef = get_embedding_function()
 
-# Initialize ChromaDB (Persistent storage)
+# Initialize ChromaDB (Persistent storage) lazily so importing this module stays cheap
 # Note: This will create a 'local_rag_db' folder in your project root
-client = chromadb.PersistentClient(path="./local_rag_db")
-collection = client.get_or_create_collection("support_kb", embedding_function=local_ef)
+_client = None
+_collections = {}
+_collections_lock = threading.Lock()
 
-# 2. Setup Groq
-GROQ_API_KEY = os.getenv("GROQ_API_KEY") # Better to use env variable
-groq_client = Groq(api_key=GROQ_API_KEY)
+def _get_collection(name: str, metadata: dict = None):
+    global _client
+    if name not in _collections:
+        with _collections_lock:
+            if _client is None:
+                _client = chromadb.PersistentClient(path="./local_rag_db")
+            if name not in _collections:
+                _collections[name] = _client.get_or_create_collection(name, embedding_function=local_ef, metadata=metadata)
+    return _collections[name]
+
+def get_kb_collection():
+    return _get_collection("support_kb")
+
+def get_faq_collection():
+    return _get_collection("faq_kb")
+
+def get_ticket_collection():
+    # One embedding per ticket (subject + message) for similar-ticket lookup; cosine distance
+    return _get_collection("ticket_embeddings", metadata={"hnsw:space": "cosine"})
+
+# Bumped on every KB/FAQ change so each uvicorn worker refreshes its in-memory state
+kb_stamp = ChangeStamp("support_kb")
+faq_stamp = ChangeStamp("faq_kb")
+
+kb_manifest = FileManifest("support_kb", stamp=kb_stamp)
+kb_keywords = CollectionKeywordIndex(get_kb_collection, stamp=kb_stamp)
+
+# 2. Setup Groq (or the local fake client when LLM_BACKEND=fake)
+RAG_MODEL = "llama-3.3-70b-versatile"
+NO_CONTEXT_ANSWER = "I'm sorry, I couldn't find any relevant information in our knowledge base."
+# Returned (and never cached) while the LLM is failing or the circuit breaker is open
+LLM_UNAVAILABLE_ANSWER = "Our assistant is temporarily unavailable. Please try again in a moment."
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+
+# 3. Ingestion settings (override via environment)
+KB_CHUNK_SIZE, KB_CHUNK_OVERLAP = 500, 100
+KB_READ_SIZE = 64 * 1024
+KB_EMBED_BATCH_SIZE = int(os.getenv("KB_EMBED_BATCH_SIZE", "64"))
+KB_EMBED_WORKERS = int(os.getenv("KB_EMBED_WORKERS", "2"))
+
+KB_MIN_PARAGRAPH = 100
+
+def _windows(text: str, chunk_size: int, step: int):
+    """Splits one oversized paragraph into overlapping windows."""
+    while True:
+        yield text[:chunk_size]
+        if len(text) <= chunk_size:
+            return
+        text = text[step:]
+
+def iter_text_chunks(file_path: str, progress: dict = None, chunk_size=KB_CHUNK_SIZE, overlap=KB_CHUNK_OVERLAP):
+    """
+    Lazily yields chunks from a text file, reading it line by line so memory
+    stays bounded regardless of file size.
+
+    Chunk boundaries are content-defined: one chunk per paragraph (blank-line
+    separated), short paragraphs such as headings are merged into the next one,
+    and paragraphs longer than `chunk_size` are split into overlapping windows.
+    Editing one paragraph therefore only changes that paragraph's chunks, which
+    keeps content-hash chunk ids stable across re-uploads.
+    """
+    step = chunk_size - overlap
+    lines, length, carry = [], 0, ""
+
+    def flush():
+        paragraph = " ".join(lines).strip()
+        lines.clear()
+        return paragraph
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if progress is not None:
+                progress["bytes_read"] += len(line.encode("utf-8"))
+
+            if line.strip():
+                lines.append(line.strip())
+                length += len(line)
+                # Emit windows early for huge paragraphs so a file without blank lines stays streamable
+                if length >= chunk_size * 4:
+                    text = (carry + " " + flush()).strip()
+                    carry = ""
+                    while len(text) > chunk_size + step:
+                        yield text[:chunk_size]
+                        text = text[step:]
+                    lines.append(text)
+                    length = len(text)
+                continue
+
+            paragraph = flush()
+            length = 0
+            if not paragraph:
+                continue
+            paragraph = (carry + " " + paragraph).strip()
+            carry = ""
+            if len(paragraph) < KB_MIN_PARAGRAPH:
+                carry = paragraph
+                continue
+            yield from _windows(paragraph, chunk_size, step)
+
+    paragraph = (carry + " " + flush()).strip()
+    if paragraph:
+        yield from _windows(paragraph, chunk_size, step)
+
+def _hash_text(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _hash_file(file_path: str):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(KB_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(source_name: str, chunk: str):
+    """Stable id derived from the owning file and the chunk content."""
+    return f"kb_{_hash_text(source_name)[:12]}_{_hash_text(chunk)[:32]}"
+
+LEGACY_FAQ_SOURCE = "legacy_faq_upload"
+
+def _adopt_legacy_chunks(coll, manifest):
+    """
+    One-time migration for stores created before the file registry: groups
+    existing chunks by their `source` metadata, or failing that by the old
+    positional ids (doc_{filename}_{i}, faq_{i}), so the next re-upload of each
+    file replaces them instead of leaving orphans.
+    """
+    if manifest.exists:
+        return
+    legacy = {}
+    results = coll.get(include=["metadatas"])
+    for id_str, metadata in zip(results['ids'], results['metadatas']):
+        if metadata and metadata.get("source"):
+            source = metadata["source"]
+        elif id_str.startswith("doc_") and "_" in id_str[4:]:
+            source = id_str[4:].rsplit("_", 1)[0]
+        else:
+            source = LEGACY_FAQ_SOURCE
+        legacy.setdefault(source, []).append(id_str)
+    manifest.bootstrap(legacy)
+
+_source_locks = {}
+_source_locks_guard = threading.Lock()
+
+def _source_lock(collection_type: str, source_name: str):
+    """One lock per (collection, file): ingests and deletes of the same file never interleave."""
+    with _source_locks_guard:
+        return _source_locks.setdefault((collection_type, source_name), threading.Lock())
+
+def ingest_txt_file(file_path: str, source_name: str = None, job=None,
+                    batch_size=KB_EMBED_BATCH_SIZE, workers=KB_EMBED_WORKERS):
+    """Serializes ingests per file; the manifest is read and written under the file's lock."""
+    source_name = source_name or os.path.basename(file_path)
+    with _source_lock("kb", source_name):
+        return _ingest_txt_file(file_path, source_name, job, batch_size, workers)
+
+def _ingest_txt_file(file_path: str, source_name: str, job, batch_size, workers):
+    """
+    Incrementally indexes a text file into the KB collection. Chunk ids are
+    content hashes, so only chunks missing from the file's previous manifest
+    are embedded; chunks no longer present are deleted afterwards. Embedding
+    runs in batches on a worker pool and each batch is upserted as soon as it
+    is ready. When run as a job, progress is published on `job.progress`. A
+    cancellation or failure removes only the chunks this run added, so no
+    chunk is ever left without a manifest entry.
+    """
+    _adopt_legacy_chunks(get_kb_collection(), kb_manifest)
+    progress = job.progress if job else {}
+    progress.update({
+        "file": source_name,
+        "total_bytes": os.path.getsize(file_path),
+        "bytes_read": 0,
+        "chunks_indexed": 0,
+        "chunks_unchanged": 0,
+        "chunks_removed": 0,
+    })
+
+    file_hash = _hash_file(file_path)
+    previous = kb_manifest.get(source_name) or {"file_hash": None, "chunk_ids": []}
+    if previous["file_hash"] == file_hash:
+        progress["bytes_read"] = progress["total_bytes"]
+        progress["chunks_unchanged"] = len(previous["chunk_ids"])
+        return {"file": source_name, "chunks_indexed": 0, "unchanged": True}
+
+    old_ids = set(previous["chunk_ids"])
+    chunk_ids, seen = [], set()
+    added_ids = []
+    pending = deque()
+
+    def embed(ids, docs):
+        return ids, docs, local_ef(docs)
+
+    def collect(future):
+        ids, docs, embeddings = future.result()
+        # `source` metadata lets listing and deletion use where-filters instead of id parsing
+        get_kb_collection().upsert(
+            ids=ids, documents=docs, embeddings=embeddings,
+            metadatas=[{"source": source_name}] * len(ids)
+        )
+        kb_keywords.add(ids, docs)
+        added_ids.extend(ids)
+        progress["chunks_indexed"] += len(ids)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-embed") as pool:
+        try:
+            batch_ids, batch_docs = [], []
+            for chunk in iter_text_chunks(file_path, progress):
+                cid = chunk_id(source_name, chunk)
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                chunk_ids.append(cid)
+                if cid in old_ids:
+                    progress["chunks_unchanged"] += 1
+                    continue
+
+                batch_ids.append(cid)
+                batch_docs.append(chunk)
+                if len(batch_docs) < batch_size:
+                    continue
+                if job:
+                    job.check_cancelled()
+                pending.append(pool.submit(embed, batch_ids, batch_docs))
+                batch_ids, batch_docs = [], []
+                # Keep a bounded number of batches in flight so memory stays flat
+                while len(pending) >= workers * 2:
+                    collect(pending.popleft())
+
+            if batch_docs:
+                pending.append(pool.submit(embed, batch_ids, batch_docs))
+            while pending:
+                collect(pending.popleft())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            if added_ids:
+                get_kb_collection().delete(ids=added_ids)
+                kb_keywords.remove(added_ids)
+            answer_cache.invalidate()
+            raise
+
+    removed_ids = list(old_ids - seen)
+    if removed_ids:
+        get_kb_collection().delete(ids=removed_ids)
+        kb_keywords.remove(removed_ids)
+    progress["chunks_removed"] = len(removed_ids)
+    kb_manifest.put(source_name, file_hash, chunk_ids, progress["total_bytes"])
+
+    if added_ids or removed_ids:
+        answer_cache.invalidate()
+
+    return {
+        "file": source_name,
+        "chunks_indexed": progress["chunks_indexed"],
+        "chunks_unchanged": progress["chunks_unchanged"],
+        "chunks_removed": progress["chunks_removed"],
+    }
+
+def run_kb_ingest_job(job, file_path: str, source_name: str):
+    """Job entry point for admin uploads; removes the temporary upload when done."""
+    try:
+        return ingest_txt_file(file_path, source_name, job=job)
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
 def load_txt_to_db(file_path: str):
     """Chunks text files and loads them into ChromaDB with overlap."""
     if not os.path.exists(file_path):
         return False
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
-    
-    chunk_size, overlap = 500, 100
-    chunks = []
-    
-    for i in range(0, len(text), chunk_size - overlap):
-        chunk = text[i : i + chunk_size].strip()
-        if chunk:
-            chunks.append(chunk)
-    
-    ids = [f"doc_{os.path.basename(file_path)}_{i}" for i in range(len(chunks))]
-    collection.upsert(ids=ids, documents=chunks)
+    ingest_txt_file(file_path)
     return True
 
+def _build_messages(context: str, query: str):
+    return [
+        {"role": "system", "content": f"You are a helpful support assistant. Use ONLY this context: {context}. If the answer isn't there, say you don't know."},
+        {"role": "user", "content": query}
+    ]
+
+def _format_sources(hits):
+    """Compact description of the retrieved chunks, sent to the client before any tokens."""
+    return [
+        {
+            "id": hit["id"],
+            "distance": hit["distance"],
+            "metadata": hit["metadata"],
+            "snippet": hit["document"][:200]
+        }
+        for hit in hits
+    ]
+
+def _retrieve_context(query: str, query_embedding):
+    """Hybrid BM25 + vector retrieval, trimmed to the prompt token budget."""
+    hits = hybrid_query(get_kb_collection(), kb_keywords, query, query_embedding, n_results=RAG_TOP_K)
+    return pack_context(hits)
+
 def ask_rag_bot(query: str):
-    """Retrieves context and asks the LLM."""
-    results = collection.query(query_texts=[query], n_results=4)
+    """Retrieves context and asks the LLM, serving repeated questions from the answer cache."""
+    cached = answer_cache.get_exact(query)
+    if cached is not None:
+        return cached
+
+    # Embed once and reuse the vector for both the semantic cache and the KB query
+    cache_version = answer_cache.version
+    query_embedding = local_ef([query])[0]
+    cached = answer_cache.get_semantic(query, query_embedding)
+    if cached is not None:
+        return cached
+
+    hits = _retrieve_context(query, query_embedding)
     
-    if not results['documents'] or not results['documents'][0]:
-        return "I'm sorry, I couldn't find any relevant information in our knowledge base."
+    if not hits:
+        return NO_CONTEXT_ANSWER
         
-    retrieved_docs = results['documents'][0]
-    context = " ".join(retrieved_docs)
+    context = " ".join(hit["document"] for hit in hits)
     
-    chat_completion = groq_client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": f"You are a helpful support assistant. Use ONLY this context: {context}. If the answer isn't there, say you don't know."},
-            {"role": "user", "content": query}
-        ],
-        model="llama-3.3-70b-versatile", 
-    )
-    return chat_completion.choices[0].message.content
-
-# Create a second collection for FAQs
-faq_collection = client.get_or_create_collection("faq_kb", embedding_function=local_ef)
-
-def load_faq_to_db(file_path: str):
+    try:
+        answer = llm_gateway.complete(_build_messages(context, query), model=RAG_MODEL)
+    except LLMUnavailable as e:
+        print(f"RAG Error: {str(e)}")
+        return LLM_UNAVAILABLE_ANSWER
+    answer_cache.put(query, query_embedding, answer, cache_version)
+    return answer
+
+def _sse(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_rag_bot(query: str):
+    """
+    Server-Sent Events variant of ask_rag_bot. Yields a `sources` event as soon
+    as retrieval finishes, then one `token` event per streamed chunk, then `done`.
+    """
+    try:
+        cached = answer_cache.get_exact(query)
+        cache_version = answer_cache.version
+        query_embedding = None
+        if cached is None:
+            query_embedding = local_ef([query])[0]
+            cached = answer_cache.get_semantic(query, query_embedding)
+
+        if cached is not None:
+            yield _sse("sources", {"sources": [], "cached": True})
+            yield _sse("token", {"text": cached})
+            yield _sse("done", {})
+            return
+
+        hits = _retrieve_context(query, query_embedding)
+        if not hits:
+            yield _sse("sources", {"sources": [], "cached": False})
+            yield _sse("token", {"text": NO_CONTEXT_ANSWER})
+            yield _sse("done", {})
+            return
+
+        yield _sse("sources", {"sources": _format_sources(hits), "cached": False})
+
+        context = " ".join(hit["document"] for hit in hits)
+        parts = []
+        try:
+            for token in llm_gateway.stream(_build_messages(context, query), model=RAG_MODEL):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except LLMUnavailable as e:
+            # Raised only before the first token, so the fallback is the whole answer
+            print(f"RAG Error: {str(e)}")
+            yield _sse("token", {"text": LLM_UNAVAILABLE_ANSWER})
+            yield _sse("done", {"unavailable": True})
+            return
+
+        answer_cache.put(query, query_embedding, "".join(parts), cache_version)
+        yield _sse("done", {})
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+
+# Second collection for FAQs (opened through get_faq_collection)
+faq_manifest = FileManifest("faq_kb", stamp=faq_stamp)
+faq_keywords = CollectionKeywordIndex(get_faq_collection, stamp=faq_stamp)
+# Parsed Q/A records, the /faq/all payload and the typeahead index
+faq_index = FaqIndex(get_faq_collection, stamp=faq_stamp)
+
+def _collection_for(collection_type: str):
+    if collection_type == "kb":
+        return get_kb_collection(), kb_manifest
+    return get_faq_collection(), faq_manifest
+
+def load_faq_to_db(file_path: str, source_name: str = None):
     """
     Specifically for FAQs. Assumes a format like:
     Q: Question here?
@@ -71,45 +417,95 @@ def load_faq_to_db(file_path: str):
     if not os.path.exists(file_path):
         return False
 
+    source_name = source_name or os.path.basename(file_path)
+    with _source_lock("faq", source_name):
+        return _load_faq(file_path, source_name)
+
+def _load_faq(file_path: str, source_name: str):
+    _adopt_legacy_chunks(get_faq_collection(), faq_manifest)
+
     with open(file_path, "r", encoding="utf-8") as f:
         content = f.read()
     
     # Split by double newlines to separate Q&A pairs
     pairs = [p.strip() for p in content.split("\n\n") if p.strip()]
     
-    ids = [f"faq_{i}" for i in range(len(pairs))]
-    faq_collection.upsert(ids=ids, documents=pairs)
+    # Ids are scoped to the file so uploads no longer overwrite each other's pairs
+    prefix = f"faq_{_hash_text(source_name)[:12]}"
+    ids = [f"{prefix}_{i}" for i in range(len(pairs))]
+    if pairs:
+        # Parsed once here so searches and listings read question/answer from metadata
+        metadatas = []
+        for pair in pairs:
+            question, answer = parse_faq(pair)
+            metadatas.append({"source": source_name, "question": question, "answer": answer})
+        get_faq_collection().upsert(
+            ids=ids, documents=pairs, embeddings=local_ef(pairs), metadatas=metadatas
+        )
+        faq_keywords.add(ids, pairs)
+
+    previous = faq_manifest.get(source_name)
+    if previous:
+        stale_ids = list(set(previous["chunk_ids"]) - set(ids))
+        if stale_ids:
+            get_faq_collection().delete(ids=stale_ids)
+            faq_keywords.remove(stale_ids)
+    faq_manifest.put(source_name, _hash_file(file_path), ids, os.path.getsize(file_path))
+    faq_index.invalidate()
     return True
 
+def _faq_record(hit):
+    metadata = hit.get("metadata") or {}
+    if "question" in metadata and "answer" in metadata:
+        return {"question": metadata["question"], "answer": metadata["answer"]}
+    question, answer = parse_faq(hit["document"])
+    return {"question": question, "answer": answer}
+
+def search_faq_collection(query: str, n_results: int = 5):
+    """Hybrid BM25 + vector search over the FAQ collection; returns matched question/answer records."""
+    query_embedding = local_ef([query])[0]
+    hits = hybrid_query(get_faq_collection(), faq_keywords, query, query_embedding, n_results=n_results)
+    return [_faq_record(hit) for hit in hits]
+
 def get_faqs_from_db():
-    """Retrieves all uploaded FAQs for the dashboard."""
-    results = faq_collection.get()
-    return results['documents']
+    """The cached FAQ snapshot: parsed records plus the encoded /faq/all body and its ETag."""
+    return faq_index.snapshot()
 
 
 def get_uploaded_filenames(collection_type="kb"):
-    """Returns a list of unique filenames currently in the vector DB."""
-    coll = collection if collection_type == "kb" else faq_collection
-    results = coll.get()
-    
-    # Extract filename from the ID (we saved IDs as doc_filename_index)
-    filenames = set()
-    for id_str in results['ids']:
-        # Splits 'doc_my_knowledge.txt_0' into ['doc', 'my_knowledge.txt', '0']
-        parts = id_str.split('_')
-        if len(parts) >= 2:
-            filenames.add(parts[1]) 
-    return list(filenames)
+    """Returns a list of unique filenames currently in the vector DB (read from the file registry)."""
+    coll, manifest = _collection_for(collection_type)
+    _adopt_legacy_chunks(coll, manifest)
+    return manifest.filenames()
+
+def get_uploaded_files(collection_type="kb"):
+    """Registry details (chunk count, size, ingest time) for every file in a collection."""
+    coll, manifest = _collection_for(collection_type)
+    _adopt_legacy_chunks(coll, manifest)
+    return manifest.summaries()
 
 def delete_file_from_db(filename, collection_type="kb"):
     """Deletes all chunks associated with a specific filename."""
-    coll = collection if collection_type == "kb" else faq_collection
-    results = coll.get()
-    
-    # Find all IDs that belong to this filename
-    ids_to_delete = [id_str for id_str in results['ids'] if filename in id_str]
-    
-    if ids_to_delete:
-        coll.delete(ids=ids_to_delete)
-        return True
-    return False
\ No newline at end of file
+    with _source_lock("kb" if collection_type == "kb" else "faq", filename):
+        return _delete_file(filename, collection_type)
+
+def _delete_file(filename, collection_type):
+    coll, manifest = _collection_for(collection_type)
+    _adopt_legacy_chunks(coll, manifest)
+
+    entry = manifest.remove(filename)
+    if entry is None:
+        return False
+
+    coll.delete(where={"source": filename})
+    # Chunks indexed before `source` metadata existed are only reachable by id
+    if entry["chunk_ids"]:
+        coll.delete(ids=entry["chunk_ids"])
+        keywords = kb_keywords if collection_type == "kb" else faq_keywords
+        keywords.remove(entry["chunk_ids"])
+
+    if collection_type == "kb":
+        answer_cache.invalidate()
+    else:
+        faq_index.invalidate()
+    return True
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+# Login limits (override via environment): attempts per window
+LOGIN_RATE_PER_IP = int(os.getenv("LOGIN_RATE_PER_IP", "20"))
+LOGIN_FAILURES_PER_EMAIL = int(os.getenv("LOGIN_FAILURES_PER_EMAIL", "5"))
+REGISTER_RATE_PER_IP = int(os.getenv("REGISTER_RATE_PER_IP", "10"))
+RATE_WINDOW_SECONDS = float(os.getenv("RATE_WINDOW_SECONDS", "60"))
+RATE_MAX_KEYS = int(os.getenv("RATE_MAX_KEYS", "100000"))
+
+
+class SlidingWindowLimiter:
+    """
+    Counts events per key over a sliding time window. Memory is bounded:
+    the least recently seen keys are dropped beyond `max_keys`.
+    """
+
+    def __init__(self, limit: int, window: float = RATE_WINDOW_SECONDS, max_keys: int = RATE_MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events = OrderedDict()  # key -> deque of timestamps
+        self._lock = threading.Lock()
+
+    def _trim(self, key, now):
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def retry_after(self, key: str):
+        """Seconds until `key` may act again; 0 when it is under the limit."""
+        now = time.monotonic()
+        with self._lock:
+            events = self._trim(key, now)
+            if events is None or len(events) < self.limit:
+                return 0
+            return max(1, int(events[0] + self.window - now) + 1)
+
+    def hit(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            events = self._trim(key, now)
+            if events is None:
+                events = self._events[key] = deque()
+            events.append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._events.pop(key, None)
+
+
+login_ip_limiter = SlidingWindowLimiter(LOGIN_RATE_PER_IP)
+login_email_limiter = SlidingWindowLimiter(LOGIN_FAILURES_PER_EMAIL)
+register_ip_limiter = SlidingWindowLimiter(REGISTER_RATE_PER_IP)
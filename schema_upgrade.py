@@ -0,0 +1,35 @@
+from sqlalchemy import inspect, text
+from app.database import engine
+from app import models
+
+# Values for rows that existed before a column was added: tickets created
+# before background triage were triaged synchronously
+BACKFILL = {
+    ("tickets", "triage_status"): "Triaged",
+}
+
+
+def ensure_columns(bind=engine):
+    """
+    Adds columns and indexes that create_all() skips on existing tables, so
+    databases created by earlier versions keep working after an upgrade.
+    Idempotent; only nullable columns are ever added.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Schema Upgrade: added {table.name}.{column.name}")
+                value = BACKFILL.get((table.name, column.name))
+                if value is not None:
+                    conn.execute(table.update().where(column.is_(None)).values({column.name: value}))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
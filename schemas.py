@@ -53,15 +53,21 @@ class TicketBase(BaseModel):
 
 class TicketResponse(TicketBase):
     id: int
-    category: str
-    priority: str
-    ai_summary: str
+    # Filled in by the background triage worker; empty while triage is pending
+    category: Optional[str] = None
+    priority: Optional[str] = None
+    ai_summary: Optional[str] = None
     status: str
+    triage_status: Optional[str] = None
+    triage_source: Optional[str] = None
+    triage_confidence: Optional[float] = None
+    duplicate_of_id: Optional[int] = None
     customer_id: int
     # NEW: Added to show customer name in Agent Detail view
     customer_name: Optional[str] = "Standard User" 
     # NEW: Added to allow frontend to check if a file exists for preview
     file_path: Optional[str] = None 
+    file_name: Optional[str] = None
     created_at: datetime 
 
     class Config:
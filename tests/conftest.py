@@ -0,0 +1,113 @@
+"""
+Shared fixtures. Tests run on a throwaway SQLite database and the fake LLM
+client, so they need neither MySQL nor a Groq key.
+"""
+import os
+
+# Read by the app modules at import time, so set before any of them is imported
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("EMBEDDING_WARMUP", "off")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app import models
+from app.async_database import get_async_db
+from app.routers import tickets
+from app.services import triage_worker, bulk_triage, ticket_stats, ticket_search, triage_classifier
+from app.services.ticket_stats import ticket_snapshot, batch_counter_statements
+from app.services.ticket_search import FTS_TABLES, ticket_index_statements
+
+
+@pytest.fixture(autouse=True)
+def isolated_classifier(tmp_path, monkeypatch):
+    """Keeps classifier learning triggered by tests out of the real centroid file."""
+    monkeypatch.setattr(triage_classifier.triage_classifier, "path", str(tmp_path / "centroids.json"))
+    monkeypatch.setattr(triage_classifier.triage_classifier, "_labels", None)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for ddl in FTS_TABLES:
+            conn.execute(text(ddl))
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def session_factory(db_path, monkeypatch):
+    """Sync sessions on the test database, also used by the worker and job modules."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    factory = sessionmaker(bind=engine)
+    for module in (triage_worker, bulk_triage, ticket_stats, ticket_search):
+        monkeypatch.setattr(module, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def client(db_path, session_factory):
+    """The tickets router on the test database (async sessions, as in production)."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def test_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(tickets.router)
+    app.dependency_overrides[get_async_db] = test_db
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def customer(session_factory):
+    db = session_factory()
+    user = models.User(name="Test Customer", email="customer@test.local", password="x", role="customer")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+    return user
+
+
+@pytest.fixture
+def make_tickets(session_factory, customer):
+    """Inserts tickets (dicts of column values) with their counters and search rows, like the routers do."""
+    def make(*rows):
+        db = session_factory()
+        try:
+            tickets = [models.Ticket(customer_id=customer.id, **row) for row in rows]
+            db.add_all(tickets)
+            db.flush()
+            for stmt in batch_counter_statements(db, [(None, ticket_snapshot(t)) for t in tickets]):
+                db.execute(stmt)
+            for stmt in ticket_index_statements(db, tickets):
+                db.execute(stmt)
+            db.commit()
+            return [t.id for t in tickets]
+        finally:
+            db.close()
+    return make
+
+
+@pytest.fixture
+def read_counters(session_factory):
+    """{(dimension, value): count} for every non-zero ticket counter."""
+    def read():
+        db = session_factory()
+        try:
+            return {(row.dimension, row.value): row.count for row in db.query(models.TicketCounter) if row.count}
+        finally:
+            db.close()
+    return read
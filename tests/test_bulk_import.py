@@ -0,0 +1,71 @@
+"""Row validation and skipped-row reporting of the ticket import job."""
+import json
+import pytest
+from app import models
+from app.services import bulk_triage
+from app.services.jobs import Job
+from app.services.bulk_triage import run_import_job
+from app.services.triage_worker import TRIAGE_IMPORT_PENDING, TRIAGE_DONE, _pending_ticket_ids
+
+
+def _write_jsonl(path, lines):
+    path.write_text("\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def import_file(tmp_path, customer):
+    return _write_jsonl(tmp_path / "import.jsonl", [
+        {"message": "Printer jams", "customer_email": customer.email},                      # 1 ok
+        "{not json",                                                                        # 2
+        ["not", "an", "object"],                                                            # 3
+        {"customer_id": customer.id},                                                       # 4
+        {"message": "Who am I", "customer_email": "ghost@test.local"},                      # 5
+        {"message": "Bad status", "customer_id": customer.id, "status": "Closed"},          # 6
+        {"message": 42, "customer_id": customer.id},                                        # 7
+        {"message": "List subject", "subject": ["a"], "customer_id": customer.id},          # 8
+        {"message": "Bad id", "customer_id": "abc"},                                        # 9
+        {"message": "Labelled", "customer_id": customer.id, "category": "IT", "priority": "Low"},  # 10 ok
+    ])
+
+
+def test_import_reports_each_skipped_row(session_factory, import_file):
+    result = run_import_job(Job("ticket_import"), import_file, triage=False)
+
+    assert result["imported"] == 2
+    assert result["skipped"] == 8
+    errors = {error["row"]: error["error"] for error in result["errors"]}
+    assert errors == {
+        2: "invalid JSON",
+        3: "not a JSON object",
+        4: "missing message",
+        5: "unknown customer_email 'ghost@test.local'",
+        6: "invalid status 'Closed'",
+        7: "message must be text, got int",
+        8: "subject must be text, got list",
+        9: "invalid customer_id 'abc'",
+    }
+
+
+def test_import_without_triage_leaves_tickets_for_the_import_job(session_factory, import_file):
+    run_import_job(Job("ticket_import"), import_file, triage=False)
+
+    db = session_factory()
+    try:
+        states = dict(db.query(models.Ticket.message, models.Ticket.triage_status))
+    finally:
+        db.close()
+    assert states == {"Printer jams": TRIAGE_IMPORT_PENDING, "Labelled": TRIAGE_DONE}
+    # The triage worker's sweep never picks up imported tickets
+    assert _pending_ticket_ids(100) == []
+
+
+def test_reported_errors_are_capped(session_factory, tmp_path, customer, monkeypatch):
+    monkeypatch.setattr(bulk_triage, "BULK_MAX_REPORTED_ERRORS", 3)
+    path = _write_jsonl(tmp_path / "bad.jsonl", [{"customer_id": customer.id}] * 10)
+
+    result = run_import_job(Job("ticket_import"), path, triage=False)
+
+    assert result["imported"] == 0
+    assert result["skipped"] == 10
+    assert len(result["errors"]) == 3
@@ -0,0 +1,70 @@
+"""Reciprocal rank fusion of dense and BM25 results."""
+from app.services.hybrid_search import BM25Index, rrf_fuse, hybrid_query
+
+
+class FakeCollection:
+    """The slice of the Chroma collection API used by hybrid_query; dense results are fixed."""
+
+    def __init__(self, documents, dense_ids):
+        self.documents = documents
+        self.dense_ids = dense_ids
+
+    def query(self, query_embeddings, n_results, include):
+        ids = self.dense_ids[:n_results]
+        return {
+            "ids": [ids],
+            "documents": [[self.documents[i] for i in ids]],
+            "metadatas": [[{"source": "kb.txt"} for _ in ids]],
+            "distances": [[0.1 * (rank + 1) for rank in range(len(ids))]],
+        }
+
+    def get(self, ids, include):
+        return {
+            "ids": ids,
+            "documents": [self.documents[i] for i in ids],
+            "metadatas": [{"source": "kb.txt"} for _ in ids],
+        }
+
+
+class KeywordIndex:
+    def __init__(self, documents):
+        self.index = BM25Index()
+        self.index.add(list(documents), list(documents.values()))
+
+    def search(self, query, n_results):
+        return self.index.search(query, n_results)
+
+
+def test_rrf_scores_by_rank_across_lists():
+    fused = rrf_fuse([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62, d: 1/63
+    assert fused == ["a", "c", "b", "d"]
+
+
+def test_rrf_prefers_agreement_over_a_single_top_rank():
+    fused = rrf_fuse([["x", "both"], ["y", "both"]], k=60)
+    assert fused[0] == "both"
+
+
+def test_rrf_handles_empty_lists():
+    assert rrf_fuse([[], []]) == []
+    assert rrf_fuse([["a"], []]) == ["a"]
+
+
+def test_hybrid_query_merges_keyword_only_hits():
+    documents = {
+        "d1": "Reset your password from the login page.",
+        "d2": "Printers need drivers installed by IT.",
+        "d3": "Error 0x80070005 means access denied; run the installer as administrator.",
+    }
+    # Dense retrieval misses the exact error code; BM25 finds it
+    coll = FakeCollection(documents, dense_ids=["d1", "d2"])
+    hits = hybrid_query(coll, KeywordIndex(documents), "0x80070005", [0.0], n_results=3, candidates=2)
+
+    # d1 and d3 top their lists (tied); d2 is second in the dense list only
+    assert sorted(hit["id"] for hit in hits[:2]) == ["d1", "d3"]
+    assert hits[2]["id"] == "d2"
+    by_id = {hit["id"]: hit for hit in hits}
+    assert by_id["d3"]["document"] == documents["d3"]
+    assert by_id["d3"]["distance"] is None
+    assert by_id["d1"]["distance"] == 0.1
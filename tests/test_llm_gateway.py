@@ -0,0 +1,103 @@
+"""Retry classification and the circuit breaker of the LLM gateway."""
+from types import SimpleNamespace
+import pytest
+from app.services import llm_gateway
+from app.services.llm_clients import FakeLLMClient, FakeLLMError
+from app.services.llm_gateway import LLMGateway, CircuitBreaker, LLMUnavailable, CircuitOpen, _is_retryable
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class FailingClient(FakeLLMClient):
+    """Fake client whose first `failures` calls raise `error`."""
+
+    def __init__(self, error, failures):
+        super().__init__()
+        self.error = error
+        self.failures = failures
+
+    def _create(self, messages, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            self.calls.append({"messages": messages, "failed": True})
+            raise self.error
+        return super()._create(messages, **kwargs)
+
+
+def _gateway(client, max_retries=3, breaker=None):
+    return LLMGateway(client=client, timeout=5, max_retries=max_retries, backoff=0, breaker=breaker or CircuitBreaker())
+
+
+@pytest.mark.parametrize("status, retryable", [
+    (None, True), (408, True), (409, True), (429, True), (500, True), (503, True),
+    (400, False), (401, False), (404, False), (422, False),
+])
+def test_retry_classification(status, retryable):
+    error = TimeoutError("timed out") if status is None else FakeLLMError("upstream", status_code=status)
+    assert _is_retryable(error) is retryable
+
+
+def test_retryable_error_is_retried_until_success():
+    client = FailingClient(FakeLLMError("unavailable", status_code=503), failures=2)
+    gateway = _gateway(client)
+    assert gateway.complete(MESSAGES).startswith("This is a fake answer")
+    assert len(client.calls) == 3
+    assert gateway.breaker.state == "closed"
+
+
+def test_client_error_is_not_retried_and_leaves_breaker_closed():
+    client = FailingClient(FakeLLMError("bad request", status_code=400), failures=5)
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    gateway = _gateway(client, breaker=breaker)
+    with pytest.raises(LLMUnavailable):
+        gateway.complete(MESSAGES)
+    assert len(client.calls) == 1
+    assert breaker.state == "closed"
+
+
+def test_breaker_opens_after_threshold_and_rejects_without_calling_upstream():
+    client = FailingClient(FakeLLMError("unavailable", status_code=503), failures=100)
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    gateway = _gateway(client, max_retries=3, breaker=breaker)
+    with pytest.raises(LLMUnavailable):
+        gateway.complete(MESSAGES)
+    assert breaker.state == "open"
+
+    calls = len(client.calls)
+    with pytest.raises(CircuitOpen):
+        gateway.complete(MESSAGES)
+    assert len(client.calls) == calls
+
+
+def test_half_open_trial_closes_breaker_on_success(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(llm_gateway, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    # Only one trial call at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_half_open_trial_reopens_breaker(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(llm_gateway, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_stream_retries_before_first_token():
+    client = FailingClient(TimeoutError("timed out"), failures=1)
+    gateway = _gateway(client)
+    assert "".join(gateway.stream(MESSAGES)) == "This is a fake answer to: hello"
+    assert len(client.calls) == 2
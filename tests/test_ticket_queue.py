@@ -0,0 +1,54 @@
+"""Keyset pagination of the Agent Queue."""
+import datetime
+import pytest
+
+BASE = datetime.datetime(2024, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def queue_ids(make_tickets):
+    # Several tickets share a created_at, so the id tie-breaker decides their order
+    offsets = [0, 0, 0, 5, 5, 10, 20, 20]
+    return make_tickets(*[
+        {"subject": f"Ticket {i}", "message": "m", "status": "Open", "created_at": BASE + datetime.timedelta(minutes=m)}
+        for i, m in enumerate(offsets)
+    ])
+
+
+def _all_pages(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = client.get("/api/tickets/queue", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.json()
+        ids.extend(item["id"] for item in body["items"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_newest_first_pages_cover_every_ticket_once(client, queue_ids):
+    ids, pages = _all_pages(client, limit=3)
+    created = {ticket_id: i for i, ticket_id in enumerate(queue_ids)}
+    offsets = [0, 0, 0, 5, 5, 10, 20, 20]
+    assert ids == sorted(queue_ids, key=lambda t: (offsets[created[t]], t), reverse=True)
+    assert pages == 3
+
+
+def test_oldest_first_with_filter(client, queue_ids, make_tickets):
+    (completed,) = make_tickets({"subject": "Done", "message": "m", "status": "Completed", "created_at": BASE})
+    ids, _ = _all_pages(client, limit=2, sort="oldest", status="Open")
+    assert completed not in ids
+    assert ids == queue_ids
+
+
+def test_last_full_page_has_no_cursor(client, queue_ids):
+    body = client.get("/api/tickets/queue", params={"limit": len(queue_ids)}).json()
+    assert len(body["items"]) == len(queue_ids)
+    assert body["next_cursor"] is None
+
+
+def test_invalid_cursor_is_rejected(client, queue_ids):
+    response = client.get("/api/tickets/queue", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
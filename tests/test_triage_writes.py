@@ -0,0 +1,136 @@
+"""Compare-and-set triage writes and the ticket counters they maintain."""
+from types import SimpleNamespace
+from app import models
+from app.services import triage_worker
+from app.services.ticket_stats import counter_deltas, rebuild_ticket_stats
+from app.services.triage_worker import TRIAGE_PENDING, TRIAGE_DONE
+from app.services.triage_classifier import SOURCE_AGENT, SOURCE_LLM
+
+LLM_TRIAGE = {"assigned_to": "IT", "priority": "Low", "ai_summary": "LLM summary"}
+
+
+def _ticket(session_factory, ticket_id):
+    db = session_factory()
+    try:
+        return db.query(models.Ticket).filter(models.Ticket.id == ticket_id).one()
+    finally:
+        db.close()
+
+
+def _rebuilt_counters(session_factory, read_counters):
+    db = session_factory()
+    try:
+        rebuild_ticket_stats(db)
+    finally:
+        db.close()
+    return read_counters()
+
+
+def _llm_only(monkeypatch, agent_triage):
+    """Routes triage straight to `agent_triage`: no embedding, duplicates or classifier."""
+    monkeypatch.setattr(triage_worker, "embed_ticket", lambda ticket: None)
+    monkeypatch.setattr(triage_worker, "triage_classifier", SimpleNamespace(classify=lambda text, embedding: None))
+    monkeypatch.setattr(triage_worker, "agent_triage", agent_triage)
+
+
+def test_counter_deltas_for_created_ticket():
+    after = {"status": "Open", "category": None, "priority": None, "triage_status": TRIAGE_PENDING}
+    assert counter_deltas(None, after) == {
+        ("status", "Open"): 1,
+        ("triage_status", TRIAGE_PENDING): 1,
+        ("total", "all"): 1,
+    }
+
+
+def test_counter_deltas_only_touch_changed_fields():
+    before = {"status": "Open", "category": None, "priority": None, "triage_status": TRIAGE_PENDING}
+    after = {"status": "Open", "category": "IT", "priority": "High", "triage_status": TRIAGE_DONE}
+    assert counter_deltas(before, after) == {
+        ("category", "IT"): 1,
+        ("priority", "High"): 1,
+        ("triage_status", TRIAGE_PENDING): -1,
+        ("triage_status", TRIAGE_DONE): 1,
+    }
+    assert counter_deltas(after, after) == {}
+
+
+def test_triage_write_updates_counters_once(session_factory, make_tickets, read_counters, monkeypatch):
+    _llm_only(monkeypatch, lambda file_path, message: dict(LLM_TRIAGE))
+    ticket_id, _ = make_tickets(
+        {"subject": "VPN down", "message": "Cannot connect", "status": "Open", "triage_status": TRIAGE_PENDING},
+        {"subject": "Invoice", "message": "Wrong amount", "status": "Open", "triage_status": TRIAGE_PENDING},
+    )
+
+    triage_worker._triage_ticket(ticket_id)
+    # A second run finds nothing to do and must not move the counters again
+    triage_worker._triage_ticket(ticket_id)
+
+    ticket = _ticket(session_factory, ticket_id)
+    assert (ticket.category, ticket.priority, ticket.triage_source) == ("IT", "Low", SOURCE_LLM)
+    counts = read_counters()
+    assert counts[("triage_status", TRIAGE_DONE)] == 1
+    assert counts[("triage_status", TRIAGE_PENDING)] == 1
+    assert counts[("total", "all")] == 2
+    assert counts == _rebuilt_counters(session_factory, read_counters)
+
+
+def test_triage_does_not_overwrite_agent_edit(session_factory, make_tickets, read_counters, client, monkeypatch):
+    (ticket_id,) = make_tickets(
+        {"subject": "Laptop", "message": "Screen flickers", "status": "Open", "triage_status": TRIAGE_PENDING}
+    )
+
+    def agent_edits_during_llm_call(file_path, message):
+        # The agent saves labels while the LLM is still working on the ticket
+        response = client.put(f"/api/tickets/update/{ticket_id}", data={
+            "category": "Hardware", "priority": "High", "status": "In Progress",
+        })
+        assert response.status_code == 200
+        return dict(LLM_TRIAGE)
+
+    _llm_only(monkeypatch, agent_edits_during_llm_call)
+    triage_worker._triage_ticket(ticket_id)
+
+    ticket = _ticket(session_factory, ticket_id)
+    assert (ticket.category, ticket.priority, ticket.status) == ("Hardware", "High", "In Progress")
+    assert (ticket.triage_status, ticket.triage_source) == (TRIAGE_DONE, SOURCE_AGENT)
+    assert ticket.ai_summary != LLM_TRIAGE["ai_summary"]
+    counts = read_counters()
+    assert ("category", "IT") not in counts
+    assert counts == _rebuilt_counters(session_factory, read_counters)
+
+
+def test_store_triage_skips_agent_labelled_ticket(session_factory, make_tickets):
+    (ticket_id,) = make_tickets({
+        "subject": "Refund", "message": "Charged twice", "status": "Open", "category": "Billing",
+        "priority": "High", "triage_status": TRIAGE_PENDING, "triage_source": SOURCE_AGENT,
+    })
+
+    assert triage_worker._store_triage(ticket_id, {"category": "IT", "triage_status": TRIAGE_DONE}) is None
+    assert _ticket(session_factory, ticket_id).category == "Billing"
+
+
+def test_agent_edit_between_reread_and_write_wins(session_factory, make_tickets, read_counters, client, monkeypatch):
+    (ticket_id,) = make_tickets(
+        {"subject": "Email", "message": "Mailbox full", "status": "Open", "triage_status": TRIAGE_PENDING}
+    )
+    build_update = triage_worker.ticket_update
+
+    def agent_edits_before_update(*args):
+        # Lands after _store_triage re-read the ticket, right before its UPDATE runs
+        if read_counters().get(("category", "Email")) is None:
+            response = client.put(f"/api/tickets/update/{ticket_id}", data={
+                "category": "Email", "priority": "Medium", "status": "Open",
+            })
+            assert response.status_code == 200
+        return build_update(*args)
+
+    monkeypatch.setattr(triage_worker, "ticket_update", agent_edits_before_update)
+    stored = triage_worker._store_triage(ticket_id, {
+        "category": "IT", "priority": "Low", "ai_summary": "LLM summary",
+        "triage_source": SOURCE_LLM, "triage_status": TRIAGE_DONE,
+    })
+
+    assert stored is None
+    ticket = _ticket(session_factory, ticket_id)
+    assert (ticket.category, ticket.triage_source) == ("Email", SOURCE_AGENT)
+    assert read_counters() == _rebuilt_counters(session_factory, read_counters)
@@ -0,0 +1,229 @@
+import os
+from sqlalchemy import select, text, func, or_, bindparam
+from app.database import SessionLocal
+from app import models
+from app.services.hybrid_search import tokenize
+
+# Search configuration (override via environment)
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", "8"))
+# Best matches per source (ticket fields, messages) ranked before grouping by ticket
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "2000"))
+# bm25 column weights for subject, message and ai_summary
+SEARCH_TICKET_WEIGHTS = ", ".join(
+    str(float(weight)) for weight in os.getenv("SEARCH_TICKET_WEIGHTS", "4.0,1.0,2.0").split(",")
+)
+
+ENGINE_FTS = "fts5"
+ENGINE_LIKE = "like"
+
+# SQLite FTS5 tables: rowid is the ticket / message id, so updates are keyed lookups
+FTS_TABLES = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5("
+    "subject, message, ai_summary, tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5("
+    "text, ticket_id UNINDEXED, tokenize='porter unicode61 remove_diacritics 2')",
+)
+
+# Filter name -> SQL condition on the tickets table (aliased t)
+FILTER_CONDITIONS = {
+    "status": "t.status = :status",
+    "category": "t.category = :category",
+    "priority": "t.priority = :priority",
+    "customer_id": "t.customer_id = :customer_id",
+    "created_from": "t.created_at >= :created_from",
+    "created_to": "t.created_at < :created_to",
+}
+
+
+def search_engine(db):
+    """FTS5 on SQLite; a LIKE scan elsewhere."""
+    return ENGINE_FTS if db.bind.dialect.name == "sqlite" else ENGINE_LIKE
+
+
+# --- Index maintenance (run in the same transaction as the ticket/message write) ---
+def ticket_index_statements(db, tickets):
+    """Re-indexes the searchable fields of `tickets` (ids must be assigned, i.e. after flush)."""
+    if search_engine(db) != ENGINE_FTS:
+        return []
+    statements = []
+    for ticket in tickets:
+        statements.append(text("DELETE FROM ticket_fts WHERE rowid = :id").bindparams(id=ticket.id))
+        statements.append(text(
+            "INSERT INTO ticket_fts(rowid, subject, message, ai_summary) VALUES (:id, :subject, :message, :ai_summary)"
+        ).bindparams(
+            id=ticket.id,
+            subject=ticket.subject or "",
+            message=ticket.message or "",
+            ai_summary=ticket.ai_summary or "",
+        ))
+    return statements
+
+
+def message_index_statements(db, message):
+    if search_engine(db) != ENGINE_FTS:
+        return []
+    return [text("INSERT INTO message_fts(rowid, text, ticket_id) VALUES (:id, :text, :ticket_id)").bindparams(
+        id=message.id, text=message.text or "", ticket_id=message.ticket_id
+    )]
+
+
+# --- Queries ---
+def fts_match_expression(query: str):
+    """
+    Turns free text into a safe FTS5 expression: every term must match, and
+    the last one is a prefix so results follow the user as they type.
+    """
+    terms = tokenize(query)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    parts = [f'"{term}"' for term in terms]
+    parts[-1] += "*"
+    return " ".join(parts)
+
+
+def fts_search_statement(match: str, filters: dict, limit: int, offset: int):
+    """
+    Ranks ticket-field and message hits with bm25, keeps each ticket's best
+    hit and applies the filters inside each source so the candidate cap
+    never hides filtered matches. Ranking, grouping and paging use rowids
+    and scores only; highlighted snippets are built for the returned page.
+    """
+    active = {name: value for name, value in filters.items() if value is not None and name in FILTER_CONDITIONS}
+    conditions = "".join(f" AND {FILTER_CONDITIONS[name]}" for name in active)
+    sql = f"""
+        WITH hits AS (
+            SELECT * FROM (
+                SELECT f.rowid AS ticket_id, NULL AS message_id,
+                       bm25(ticket_fts, {SEARCH_TICKET_WEIGHTS}) AS score
+                FROM ticket_fts f JOIN tickets t ON t.id = f.rowid
+                WHERE ticket_fts MATCH :match{conditions}
+                ORDER BY score LIMIT :candidates
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT f.ticket_id AS ticket_id, f.rowid AS message_id,
+                       bm25(message_fts) AS score
+                FROM message_fts f JOIN tickets t ON t.id = f.ticket_id
+                WHERE message_fts MATCH :match{conditions}
+                ORDER BY score LIMIT :candidates
+            )
+        ), ranked AS (
+            SELECT ticket_id, message_id, score,
+                   ROW_NUMBER() OVER (PARTITION BY ticket_id ORDER BY score) AS rn,
+                   COUNT(*) OVER (PARTITION BY ticket_id) AS hits
+            FROM hits
+        ), page AS (
+            SELECT ticket_id, message_id, score, hits
+            FROM ranked
+            WHERE rn = 1
+            ORDER BY score, ticket_id
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT t.id, t.subject, t.category, t.priority, t.status, t.triage_status,
+               t.customer_id, t.created_at, u.name AS customer_name,
+               -p.score AS score,
+               CASE WHEN p.message_id IS NULL THEN (
+                   SELECT snippet(ticket_fts, -1, '[', ']', '…', 12) FROM ticket_fts
+                   WHERE ticket_fts MATCH :match AND rowid = p.ticket_id
+               ) ELSE (
+                   SELECT snippet(message_fts, 0, '[', ']', '…', 12) FROM message_fts
+                   WHERE message_fts MATCH :match AND rowid = p.message_id
+               ) END AS snippet,
+               p.message_id AS matched_message_id, p.hits
+        FROM page p
+        JOIN tickets t ON t.id = p.ticket_id
+        LEFT JOIN users u ON u.id = t.customer_id
+        ORDER BY p.score, t.id
+    """
+    datetime_type = models.Ticket.created_at.type
+    params = [
+        # Typed so dates are compared in the format SQLAlchemy stores them in
+        bindparam(name, value, type_=datetime_type if name.startswith("created_") else None)
+        for name, value in active.items()
+    ]
+    return text(sql).bindparams(
+        *params,
+        match=match,
+        candidates=max(SEARCH_CANDIDATES, offset + limit + 1),
+        limit=limit,
+        offset=offset,
+    ).columns(created_at=datetime_type)
+
+
+def like_search_statement(query: str, filters: dict, limit: int, offset: int):
+    """Unranked fallback for databases without FTS5: every term must appear in a ticket field or message."""
+    terms = tokenize(query)[:SEARCH_MAX_TERMS]
+    stmt = select(
+        models.Ticket.id,
+        models.Ticket.subject,
+        models.Ticket.category,
+        models.Ticket.priority,
+        models.Ticket.status,
+        models.Ticket.triage_status,
+        models.Ticket.customer_id,
+        models.Ticket.created_at,
+        models.User.name.label("customer_name"),
+    ).outerjoin(models.User, models.User.id == models.Ticket.customer_id)
+
+    for term in terms:
+        fields = [
+            func.lower(column).contains(term, autoescape=True)
+            for column in (models.Ticket.subject, models.Ticket.message, models.Ticket.ai_summary)
+        ]
+        fields.append(models.Ticket.id.in_(
+            select(models.Message.ticket_id).where(func.lower(models.Message.text).contains(term, autoescape=True))
+        ))
+        stmt = stmt.where(or_(*fields))
+
+    for name, value in filters.items():
+        if value is None or name not in FILTER_CONDITIONS:
+            continue
+        if name == "created_from":
+            stmt = stmt.where(models.Ticket.created_at >= value)
+        elif name == "created_to":
+            stmt = stmt.where(models.Ticket.created_at < value)
+        else:
+            stmt = stmt.where(getattr(models.Ticket, name) == value)
+
+    return stmt.order_by(models.Ticket.created_at.desc(), models.Ticket.id.desc()).limit(limit).offset(offset)
+
+
+# --- Build / repair ---
+def rebuild_search_index(db):
+    """Re-indexes every ticket and message (full scan; startup/repair only)."""
+    if search_engine(db) != ENGINE_FTS:
+        return
+    for ddl in FTS_TABLES:
+        db.execute(text(ddl))
+    db.execute(text("DELETE FROM ticket_fts"))
+    db.execute(text("DELETE FROM message_fts"))
+    db.execute(text(
+        "INSERT INTO ticket_fts(rowid, subject, message, ai_summary) "
+        "SELECT id, coalesce(subject, ''), coalesce(message, ''), coalesce(ai_summary, '') FROM tickets"
+    ))
+    db.execute(text(
+        "INSERT INTO message_fts(rowid, text, ticket_id) SELECT id, coalesce(text, ''), ticket_id FROM messages"
+    ))
+    # Merge the b-tree segments left by the bulk insert
+    db.execute(text("INSERT INTO ticket_fts(ticket_fts) VALUES ('optimize')"))
+    db.execute(text("INSERT INTO message_fts(message_fts) VALUES ('optimize')"))
+    db.commit()
+
+
+def ensure_search_index():
+    """Creates the FTS tables and indexes existing rows once for databases that predate them."""
+    db = SessionLocal()
+    try:
+        if search_engine(db) != ENGINE_FTS:
+            return
+        for ddl in FTS_TABLES:
+            db.execute(text(ddl))
+        db.commit()
+        indexed = db.execute(text("SELECT 1 FROM ticket_fts LIMIT 1")).first()
+        if indexed is None and db.query(models.Ticket.id).first() is not None:
+            rebuild_search_index(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Search Index Rebuild Error: {str(e)}")
+    finally:
+        db.close()
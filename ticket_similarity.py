@@ -0,0 +1,99 @@
+import os
+import time
+import datetime
+from sqlalchemy import select
+from app import models
+from app.services.embedding_service import embed_texts
+from app.services.rag_service import get_ticket_collection
+from app.services.triage_classifier import ticket_text
+
+# Duplicate detection (override via environment)
+TICKET_DUPLICATES_ENABLED = os.getenv("TICKET_DUPLICATES_ENABLED", "true").lower() in ("1", "true", "yes")
+# Cosine similarity at which a new ticket reuses an earlier ticket's triage
+TICKET_DUPLICATE_THRESHOLD = float(os.getenv("TICKET_DUPLICATE_THRESHOLD", "0.92"))
+# Only tickets raised this recently count as the same incident
+TICKET_DUPLICATE_WINDOW_HOURS = float(os.getenv("TICKET_DUPLICATE_WINDOW_HOURS", "24"))
+TICKET_DUPLICATE_CANDIDATES = int(os.getenv("TICKET_DUPLICATE_CANDIDATES", "5"))
+
+# Triage states a duplicate may copy from (mirrors triage_worker, which imports this module)
+_TRIAGED = "Triaged"
+
+
+def embed_ticket(ticket):
+    """MiniLM embedding of subject + message, or None when embedding fails."""
+    try:
+        return [float(x) for x in embed_texts([ticket_text(ticket.subject, ticket.message)])[0]]
+    except Exception as e:
+        print(f"Ticket Embedding Error: {str(e)}")
+        return None
+
+
+def index_ticket(ticket, embedding):
+    """Stores (or replaces) a ticket's embedding in the ticket collection."""
+    # created_at is naive UTC
+    created = ticket.created_at.replace(tzinfo=datetime.timezone.utc).timestamp() if ticket.created_at else time.time()
+    get_ticket_collection().upsert(
+        ids=[str(ticket.id)],
+        embeddings=[embedding],
+        metadatas=[{"created_ts": created, "customer_id": ticket.customer_id or 0}],
+    )
+
+
+def ticket_embedding(ticket):
+    """The stored embedding, computed and indexed on first use for tickets that predate the collection."""
+    stored = get_ticket_collection().get(ids=[str(ticket.id)], include=["embeddings"])
+    embeddings = stored.get("embeddings")
+    if embeddings is not None and len(embeddings):
+        return [float(x) for x in embeddings[0]]
+    embedding = embed_ticket(ticket)
+    if embedding is not None:
+        index_ticket(ticket, embedding)
+    return embedding
+
+
+def nearest_tickets(embedding, n_results: int, exclude_id: int = None, since_ts: float = None):
+    """[(ticket_id, cosine similarity)] best first."""
+    coll = get_ticket_collection()
+    total = coll.count()
+    if not total:
+        return []
+    result = coll.query(
+        query_embeddings=[embedding],
+        n_results=min(total, n_results + (exclude_id is not None)),
+        where={"created_ts": {"$gte": since_ts}} if since_ts is not None else None,
+        include=["distances"],
+    )
+    neighbours = []
+    for ticket_id, distance in zip(result["ids"][0], result["distances"][0]):
+        if exclude_id is not None and int(ticket_id) == exclude_id:
+            continue
+        neighbours.append((int(ticket_id), 1.0 - distance))
+    return neighbours[:n_results]
+
+
+def find_duplicate(db, ticket, embedding):
+    """
+    The closest recent, still-open, triaged ticket above the similarity
+    threshold, as (ticket, similarity); None when the ticket looks new.
+    Candidates come from Chroma; their status is checked in the database.
+    """
+    if not TICKET_DUPLICATES_ENABLED or embedding is None:
+        return None
+    since = time.time() - TICKET_DUPLICATE_WINDOW_HOURS * 3600
+    neighbours = [
+        (ticket_id, similarity)
+        for ticket_id, similarity in nearest_tickets(embedding, TICKET_DUPLICATE_CANDIDATES, ticket.id, since)
+        if similarity >= TICKET_DUPLICATE_THRESHOLD
+    ]
+    if not neighbours:
+        return None
+    candidates = {
+        t.id: t for t in db.execute(
+            select(models.Ticket).where(models.Ticket.id.in_([ticket_id for ticket_id, _ in neighbours]))
+        ).scalars()
+    }
+    for ticket_id, similarity in neighbours:
+        candidate = candidates.get(ticket_id)
+        if candidate and candidate.triage_status == _TRIAGED and candidate.status != "Completed" and candidate.category:
+            return candidate, similarity
+    return None
@@ -0,0 +1,192 @@
+import datetime
+from collections import Counter
+from sqlalchemy import select, func, delete, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app.database import SessionLocal
+from app import models
+
+# Ticket fields with a row per value in ticket_counters
+COUNTED_FIELDS = ("status", "category", "priority", "triage_status")
+TOTAL_DIMENSION = "total"
+TOTAL_VALUE = "all"
+
+
+def ticket_snapshot(ticket):
+    """The counted fields of a ticket, taken before and after a change."""
+    return {field: getattr(ticket, field) for field in COUNTED_FIELDS}
+
+
+def counter_deltas(before, after):
+    """
+    Net change to each (dimension, value) counter when a ticket goes from
+    `before` to `after`. Either side may be None (ticket created / removed).
+    """
+    deltas = Counter()
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        for field in COUNTED_FIELDS:
+            if state.get(field):
+                deltas[(field, state[field])] += sign
+    deltas[(TOTAL_DIMENSION, TOTAL_VALUE)] += (after is not None) - (before is not None)
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def _increment(db, table, keys: dict, increments: dict):
+    """Single-statement upsert adding `increments` to the row identified by `keys`."""
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(**keys, **increments)
+        return stmt.on_duplicate_key_update({col: table.c[col] + inc for col, inc in increments.items()})
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(table).values(**keys, **increments)
+        return stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={col: table.c[col] + inc for col, inc in increments.items()}
+        )
+    raise ValueError(f"Ticket stats are not supported on '{dialect}' databases")
+
+
+def ticket_update(ticket_id: int, before: dict, values: dict, *conditions):
+    """
+    Compare-and-set UPDATE of a ticket: writes `values` only while its counted
+    fields still equal `before` (and `conditions` hold). Run the counter
+    statements only when it matched a row, so a writer racing another never
+    applies a delta computed from a stale snapshot.
+    """
+    table = models.Ticket.__table__
+    guards = [table.c[field].is_(None) if value is None else table.c[field] == value for field, value in before.items()]
+    return update(table).where(table.c.id == ticket_id, *guards, *conditions).values(**values)
+
+
+def snapshot_after(before: dict, values: dict):
+    """The counted fields once `values` are applied on top of `before`."""
+    return {field: values.get(field, before[field]) for field in COUNTED_FIELDS}
+
+
+def counter_statements(db, before, after):
+    """Statements to run in the same transaction as the ticket write."""
+    return batch_counter_statements(db, [(before, after)])
+
+
+def batch_counter_statements(db, changes):
+    """One upsert per touched counter for a whole batch of (before, after) ticket changes."""
+    totals = Counter()
+    for before, after in changes:
+        totals.update(counter_deltas(before, after))
+    table = models.TicketCounter.__table__
+    return [
+        _increment(db, table, {"dimension": dimension, "value": value}, {"count": delta})
+        for (dimension, value), delta in totals.items() if delta
+    ]
+
+
+def workload_statement(db, agent_id: int, **increments):
+    return _increment(db, models.AgentWorkload.__table__, {"agent_id": agent_id}, increments)
+
+
+def first_response_statement(db, ticket, agent_id: int, now=None):
+    """
+    Records `agent_id` as the ticket's first responder. Returns the workload
+    statement to execute, or None when the ticket already had a response.
+    """
+    if ticket.first_responder_id is not None:
+        return None
+    now = now or datetime.datetime.utcnow()
+    ticket.first_responder_id = agent_id
+    ticket.first_response_at = now
+    seconds = max(0, int((now - ticket.created_at).total_seconds())) if ticket.created_at else 0
+    return workload_statement(db, agent_id, open_tickets=1, responded_tickets=1, response_seconds_total=seconds)
+
+
+def build_stats(counter_rows, workload_rows):
+    """Shapes counter and workload rows into the /stats payload."""
+    stats = {f"by_{field}": {} for field in COUNTED_FIELDS}
+    total = 0
+    for row in counter_rows:
+        if row.dimension == TOTAL_DIMENSION:
+            total = row.count
+        elif row.count:
+            stats[f"by_{row.dimension}"][row.value] = row.count
+
+    agents, responded, seconds = [], 0, 0
+    for row in workload_rows:
+        responded += row.responded_tickets
+        seconds += row.response_seconds_total
+        agents.append({
+            "agent_id": row.agent_id,
+            "name": row.name,
+            "open_tickets": row.open_tickets,
+            "completed_tickets": row.completed_tickets,
+            "responded_tickets": row.responded_tickets,
+            "avg_first_response_seconds": (
+                row.response_seconds_total / row.responded_tickets if row.responded_tickets else None
+            ),
+        })
+
+    stats["total"] = total
+    stats["first_response"] = {
+        "responded_tickets": responded,
+        "avg_seconds": seconds / responded if responded else None,
+    }
+    stats["agents"] = agents
+    return stats
+
+
+def workload_query():
+    return select(
+        models.AgentWorkload.agent_id,
+        models.AgentWorkload.open_tickets,
+        models.AgentWorkload.completed_tickets,
+        models.AgentWorkload.responded_tickets,
+        models.AgentWorkload.response_seconds_total,
+        models.User.name.label("name")
+    ).outerjoin(models.User, models.User.id == models.AgentWorkload.agent_id)
+
+
+def rebuild_ticket_stats(db):
+    """Recomputes every aggregate from the tickets table (full scan; startup/repair only)."""
+    db.execute(delete(models.TicketCounter))
+    db.execute(delete(models.AgentWorkload))
+
+    total = db.query(func.count(models.Ticket.id)).scalar() or 0
+    db.add(models.TicketCounter(dimension=TOTAL_DIMENSION, value=TOTAL_VALUE, count=total))
+    for field in COUNTED_FIELDS:
+        column = getattr(models.Ticket, field)
+        for value, count in db.query(column, func.count(models.Ticket.id)).filter(column.isnot(None)).group_by(column):
+            if value:
+                db.add(models.TicketCounter(dimension=field, value=value, count=count))
+
+    workload = {}
+    rows = db.query(
+        models.Ticket.first_responder_id, models.Ticket.status,
+        models.Ticket.created_at, models.Ticket.first_response_at
+    ).filter(models.Ticket.first_responder_id.isnot(None))
+    for agent_id, status, created_at, responded_at in rows:
+        entry = workload.setdefault(agent_id, models.AgentWorkload(
+            agent_id=agent_id, open_tickets=0, completed_tickets=0,
+            responded_tickets=0, response_seconds_total=0
+        ))
+        if status == "Completed":
+            entry.completed_tickets += 1
+        else:
+            entry.open_tickets += 1
+        entry.responded_tickets += 1
+        if created_at and responded_at:
+            entry.response_seconds_total += max(0, int((responded_at - created_at).total_seconds()))
+    db.add_all(workload.values())
+    db.commit()
+
+
+def ensure_ticket_stats():
+    """Builds the aggregates once for databases that predate them."""
+    db = SessionLocal()
+    try:
+        if db.query(models.TicketCounter).first() is None:
+            rebuild_ticket_stats(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Ticket Stats Rebuild Error: {str(e)}")
+    finally:
+        db.close()
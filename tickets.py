@@ -1,12 +1,34 @@
-from fastapi import APIRouter, Depends, Form, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Form, UploadFile, File, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_, or_, func
+from datetime import datetime
+from typing import Optional, List
 import os
-import shutil
-from app.database import get_db
+import json
+import base64
+import hashlib
+import asyncio
+import uuid
+from app.async_database import get_async_db, AsyncSessionLocal
 from app import models
-from app.services.agent_logic import agent_triage
-from app.services.auth_utils import get_current_user
-from fastapi.responses import FileResponse
+from app.services.triage_worker import triage_pool, TRIAGE_PENDING, TRIAGE_IMPORT_PENDING, TRIAGE_DONE, TRIAGE_FAILED
+from app.services.auth_utils import get_current_user, authenticate_token
+from app.services.attachment_text import get_attachment_text
+from app.services.attachment_store import save_upload, attachment_response, AttachmentTooLarge
+from app.services.events import get_broker, publish_ticket_event, format_sse, TICKETS_CHANNEL
+from app.services.ticket_stats import (
+    ticket_snapshot, counter_statements, workload_statement, first_response_statement,
+    ticket_update, snapshot_after, build_stats, workload_query
+)
+from app.services.jobs import job_registry
+from app.services.triage_classifier import triage_classifier, learn_from_review, ticket_text, SOURCE_AGENT
+from app.services.bulk_triage import run_import_job, run_retriage_job, RETRIAGE_SCOPES
+from app.services.ticket_similarity import ticket_embedding, nearest_tickets
+from app.services.ticket_search import (
+    search_engine, fts_match_expression, fts_search_statement, like_search_statement,
+    ticket_index_statements, message_index_statements, ENGINE_FTS
+)
+from fastapi.responses import StreamingResponse, Response
 
 router = APIRouter(
     prefix="/api/tickets",
@@ -15,12 +37,12 @@ router = APIRouter(
 
 # --- AGENT: Fetch All Tickets with Customer Names ---
 @router.get("/all")
-async def get_all_tickets(db: Session = Depends(get_db)):
-    """Fetch every ticket joined with customer names for the Agent Queue."""
-    results = db.query(
-        models.Ticket, 
-        models.User.name.label("customer_name")
-    ).join(models.User, models.Ticket.customer_id == models.User.id).all()
+async def get_all_tickets(db: AsyncSession = Depends(get_async_db)):
+    """Legacy full-table listing. The Agent Queue uses the paginated /queue endpoint."""
+    results = (await db.execute(
+        select(models.Ticket, models.User.name.label("customer_name"))
+        .join(models.User, models.Ticket.customer_id == models.User.id)
+    )).all()
     
     tickets = []
     for ticket, customer_name in results:
@@ -30,11 +52,285 @@ async def get_all_tickets(db: Session = Depends(get_db)):
         
     return tickets
 
+# Columns returned by the paginated queue (avoids per-row table reflection)
+QUEUE_COLUMNS = (
+    models.Ticket.id,
+    models.Ticket.subject,
+    models.Ticket.message,
+    models.Ticket.category,
+    models.Ticket.priority,
+    models.Ticket.ai_summary,
+    models.Ticket.status,
+    models.Ticket.triage_status,
+    models.Ticket.triage_source,
+    models.Ticket.customer_id,
+    models.Ticket.created_at,
+    models.Ticket.file_path,
+)
+
+def _encode_cursor(created_at: datetime, ticket_id: int):
+    raw = json.dumps([created_at.isoformat(), ticket_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, ticket_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# --- AGENT: Paginated, Filterable Ticket Queue ---
+@router.get("/queue")
+async def get_ticket_queue(
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = Query("newest", pattern="^(newest|oldest)$"),
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Keyset-paginated Agent Queue. Pass the returned `next_cursor` back as
+    `cursor` to fetch the following page; cost stays flat however deep you page.
+    """
+    query = select(
+        *QUEUE_COLUMNS,
+        models.User.name.label("customer_name")
+    ).join(models.User, models.Ticket.customer_id == models.User.id)
+
+    if status:
+        query = query.where(models.Ticket.status == status)
+    if category:
+        query = query.where(models.Ticket.category == category)
+    if priority:
+        query = query.where(models.Ticket.priority == priority)
+    if customer_id is not None:
+        query = query.where(models.Ticket.customer_id == customer_id)
+    if created_from:
+        query = query.where(models.Ticket.created_at >= created_from)
+    if created_to:
+        query = query.where(models.Ticket.created_at < created_to)
+
+    newest_first = sort == "newest"
+    if cursor:
+        after_created, after_id = _decode_cursor(cursor)
+        if newest_first:
+            query = query.where(or_(
+                models.Ticket.created_at < after_created,
+                and_(models.Ticket.created_at == after_created, models.Ticket.id < after_id)
+            ))
+        else:
+            query = query.where(or_(
+                models.Ticket.created_at > after_created,
+                and_(models.Ticket.created_at == after_created, models.Ticket.id > after_id)
+            ))
+
+    if newest_first:
+        query = query.order_by(models.Ticket.created_at.desc(), models.Ticket.id.desc())
+    else:
+        query = query.order_by(models.Ticket.created_at.asc(), models.Ticket.id.asc())
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    items = [dict(row._mapping) for row in rows[:limit]]
+
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
+
+# --- AGENT/ADMIN: Dashboard Stats (served from the aggregate tables) ---
+@router.get("/stats")
+async def get_ticket_stats(db: AsyncSession = Depends(get_async_db)):
+    counters = (await db.execute(select(models.TicketCounter))).scalars().all()
+    workload = (await db.execute(workload_query())).all()
+    return build_stats(counters, workload)
+
+# --- AGENT: Full-Text Search over Tickets and Messages ---
+@router.get("/search")
+async def search_tickets(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ranked search over subject, message, AI summary and the message thread.
+    Each ticket appears once, with a snippet of its best match.
+    """
+    filters = {
+        "status": status, "category": category, "priority": priority,
+        "customer_id": customer_id, "created_from": created_from, "created_to": created_to,
+    }
+    engine = search_engine(db)
+    if engine == ENGINE_FTS:
+        match = fts_match_expression(q)
+        if match is None:
+            return {"query": q, "engine": engine, "items": [], "has_more": False}
+        stmt = fts_search_statement(match, filters, limit + 1, offset)
+    else:
+        stmt = like_search_statement(q, filters, limit + 1, offset)
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(stmt)).all()
+    return {
+        "query": q,
+        "engine": engine,
+        "items": [dict(row._mapping) for row in rows[:limit]],
+        "has_more": len(rows) > limit,
+    }
+
+# --- ADMIN: Bulk Import & Re-triage (background jobs) ---
+BULK_JOB_KINDS = ("ticket_import", "ticket_retriage")
+
+@router.post("/admin/import", status_code=202)
+async def import_tickets(file: UploadFile = File(...), triage: bool = Form(True)):
+    """Imports tickets from a CSV or JSONL file and triages them in batches as a background job."""
+    if not file.filename.lower().endswith((".csv", ".jsonl")):
+        raise HTTPException(status_code=400, detail="Only .csv and .jsonl files are supported")
+
+    os.makedirs("app/temp_uploads", exist_ok=True)
+    file_path = f"app/temp_uploads/import_{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+    with open(file_path, "wb") as buffer:
+        while chunk := await file.read(1024 * 1024):
+            buffer.write(chunk)
+
+    job = job_registry.submit("ticket_import", run_import_job, file_path, triage)
+    return {"message": "Ticket import started", "job_id": job.id}
+
+@router.post("/admin/retriage", status_code=202)
+async def retriage_tickets(
+    scope: str = Form("failed"),
+    ticket_ids: Optional[str] = Form(None),
+    include_reviewed: bool = Form(False)
+):
+    """
+    Re-triages tickets by id (comma-separated) or by scope: failed, pending,
+    unfinished or all. Agent-labelled and Completed tickets are only
+    re-triaged with include_reviewed=true.
+    """
+    ids = None
+    if ticket_ids:
+        try:
+            ids = [int(part) for part in ticket_ids.split(",") if part.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ticket_ids must be comma-separated integers")
+    elif scope not in RETRIAGE_SCOPES:
+        raise HTTPException(status_code=400, detail=f"Invalid scope. Use one of: {', '.join(RETRIAGE_SCOPES)}")
+
+    job = job_registry.submit("ticket_retriage", run_retriage_job, scope, ids, include_reviewed)
+    return {"message": "Re-triage started", "job_id": job.id}
+
+@router.get("/admin/jobs")
+async def list_bulk_jobs():
+    return {"jobs": [job.to_dict() for job in job_registry.list() if job.kind in BULK_JOB_KINDS]}
+
+@router.get("/admin/jobs/{job_id}")
+async def get_bulk_job(job_id: str):
+    job = job_registry.get(job_id)
+    if not job or job.kind not in BULK_JOB_KINDS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.delete("/admin/jobs/{job_id}")
+async def cancel_bulk_job(job_id: str):
+    """Requests cancellation; pages already committed are kept."""
+    job = job_registry.get(job_id)
+    if not job or job.kind not in BULK_JOB_KINDS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.cancel()
+    return {"message": "Cancellation requested", "job_id": job.id}
+
+@router.get("/admin/classifier")
+async def get_classifier_stats():
+    """Training examples per label for the local pre-classifier, and its confidence threshold."""
+    return {
+        "threshold": triage_classifier.threshold,
+        "min_examples": triage_classifier.min_examples,
+        "examples": await asyncio.to_thread(triage_classifier.stats),
+    }
+
+# --- SHARED: Live Ticket & Message Events (Server-Sent Events) ---
+EVENT_HEARTBEAT_SECONDS = 15
+# Roles that may follow the whole queue and any ticket
+STAFF_ROLES = ("agent", "admin")
+
+@router.get("/events")
+async def stream_ticket_events(
+    request: Request,
+    channel: List[str] = Query([TICKETS_CHANNEL]),
+    token: str = Query(...)
+):
+    """
+    Pushes ticket activity instead of making dashboards poll. Channels:
+    `tickets` (whole queue), `ticket:{id}` (one thread), `customer:{id}` (a customer's tickets).
+    The bearer token comes as a query parameter since EventSource cannot set
+    headers. Staff may subscribe to any channel; customers only to their own
+    tickets and their customer channel.
+    """
+    current_user = await authenticate_token(token)
+    is_staff = current_user.role in STAFF_ROLES
+    ticket_ids = set()
+    for name in channel:
+        prefix, _, suffix = name.partition(":")
+        if not (name == TICKETS_CHANNEL or (prefix in ("ticket", "customer") and suffix.isdigit())):
+            raise HTTPException(status_code=400, detail=f"Unknown channel: {name}")
+        if is_staff:
+            continue
+        if name == TICKETS_CHANNEL or (prefix == "customer" and int(suffix) != current_user.id):
+            raise HTTPException(status_code=403, detail=f"Not allowed to subscribe to {name}")
+        if prefix == "ticket":
+            ticket_ids.add(int(suffix))
+    if ticket_ids:
+        async with AsyncSessionLocal() as db:
+            owners = dict((await db.execute(
+                select(models.Ticket.id, models.Ticket.customer_id).where(models.Ticket.id.in_(ticket_ids))
+            )).all())
+        denied = [ticket_id for ticket_id in ticket_ids if owners.get(ticket_id) != current_user.id]
+        if denied:
+            raise HTTPException(status_code=403, detail=f"Not allowed to subscribe to ticket:{denied[0]}")
+
+    broker = get_broker()
+    subscription = broker.subscribe(channel)
+
+    async def event_stream():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # --- SHARED: Route to Preview/Download uploaded files ---
 @router.get("/file/{ticket_id}")
-async def get_ticket_file(ticket_id: int, db: Session = Depends(get_db)):
-    """Serves the file content for the frontend preview modal or download."""
-    ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
+async def get_ticket_file(ticket_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Serves the file content for the frontend preview modal or download (ETag, Range, zero-copy)."""
+    ticket = await db.get(models.Ticket, ticket_id)
     
     if not ticket or not ticket.file_path:
         raise HTTPException(status_code=404, detail="No attachment found for this ticket")
@@ -42,25 +338,78 @@ async def get_ticket_file(ticket_id: int, db: Session = Depends(get_db)):
     if not os.path.exists(ticket.file_path):
         raise HTTPException(status_code=404, detail="Physical file missing from server storage")
     
-    return FileResponse(ticket.file_path)
+    return attachment_response(request, ticket.file_path, ticket.file_name, ticket.file_hash)
+
+# --- SHARED: Text Preview of an Attachment ---
+@router.get("/file/{ticket_id}/text")
+async def get_ticket_file_text(
+    ticket_id: int,
+    max_chars: int = Query(5000, ge=1, le=200000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Returns extracted attachment text, reusing the triage extraction cache."""
+    ticket = await db.get(models.Ticket, ticket_id)
+    if not ticket or not ticket.file_path:
+        raise HTTPException(status_code=404, detail="No attachment found for this ticket")
+
+    text = await asyncio.to_thread(get_attachment_text, ticket.file_path, max_chars, ticket.file_hash)
+    return {"ticket_id": ticket_id, "text": text}
 
 # --- CUSTOMER: Fetch My Tickets (Personalized) ---
 @router.get("/my-tickets")
 async def get_my_tickets(
     current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Fetch only tickets raised by the currently logged-in customer."""
-    return db.query(models.Ticket).filter(models.Ticket.customer_id == current_user.id).all()
+    result = await db.execute(select(models.Ticket).where(models.Ticket.customer_id == current_user.id))
+    return result.scalars().all()
+
+# --- Incremental thread helpers (cursors + ETags) ---
+async def _thread_version(db: AsyncSession, ticket_id: int):
+    """(count, max id) of a thread; messages are append-only so this identifies its state."""
+    count, max_id = (await db.execute(
+        select(func.count(models.Message.id), func.max(models.Message.id))
+        .where(models.Message.ticket_id == ticket_id)
+    )).one()
+    return count, max_id or 0
+
+def _etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def _thread_messages(db: AsyncSession, ticket_id: int, after_id: Optional[int], since: Optional[datetime]):
+    query = select(models.Message).where(models.Message.ticket_id == ticket_id)
+    if after_id is not None:
+        query = query.where(models.Message.id > after_id)
+    if since is not None:
+        query = query.where(models.Message.created_at > since)
+    query = query.order_by(models.Message.created_at.asc(), models.Message.id.asc())
+    return (await db.execute(query)).scalars().all()
 
 # --- SHARED: Get Detailed Ticket + Thread ---
 @router.get("/{ticket_id}")
-async def get_ticket_details(ticket_id: int, db: Session = Depends(get_db)):
-    """Fetch full details including customer name and message history."""
-    result = db.query(
-        models.Ticket, 
-        models.User.name.label("customer_name")
-    ).join(models.User, models.Ticket.customer_id == models.User.id).filter(models.Ticket.id == ticket_id).first()
+async def get_ticket_details(
+    ticket_id: int,
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Fetch full details including customer name and message history.
+    `after_id` / `since` limit the thread to newer messages; an unchanged
+    ticket answers If-None-Match with 304.
+    """
+    result = (await db.execute(
+        select(models.Ticket, models.User.name.label("customer_name"))
+        .join(models.User, models.Ticket.customer_id == models.User.id)
+        .where(models.Ticket.id == ticket_id)
+    )).first()
 
     if not result:
         raise HTTPException(status_code=404, detail="Ticket not found")
@@ -69,20 +418,80 @@ async def get_ticket_details(ticket_id: int, db: Session = Depends(get_db)):
     ticket_dict = {column.name: getattr(ticket, column.name) for column in ticket.__table__.columns}
     ticket_dict["customer_name"] = customer_name
 
-    messages = db.query(models.Message).filter(models.Message.ticket_id == ticket_id).order_by(models.Message.created_at.asc()).all()
+    count, max_id = await _thread_version(db, ticket_id)
+    fingerprint = json.dumps([ticket_dict, count, max_id, after_id, since], default=str, sort_keys=True)
+    etag = f'W/"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    messages = await _thread_messages(db, ticket_id, after_id, since)
     
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     return {
         "ticket": ticket_dict,
         "messages": messages
     }
 
+# --- AGENT: Similar Tickets (embedding neighbours / duplicate cluster) ---
+@router.get("/{ticket_id}/similar")
+async def get_similar_tickets(
+    ticket_id: int,
+    limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Nearest tickets by subject + message embedding, plus the size of this ticket's duplicate cluster."""
+    ticket = await db.get(models.Ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+    try:
+        embedding = await asyncio.to_thread(ticket_embedding, ticket)
+        if embedding is None:
+            raise RuntimeError("ticket could not be embedded")
+        neighbours = await asyncio.to_thread(nearest_tickets, embedding, limit, ticket_id)
+    except Exception as e:
+        print(f"Similar Tickets Error: {str(e)}")
+        raise HTTPException(status_code=503, detail="Similar-ticket lookup is unavailable")
+
+    similarity = dict(neighbours)
+    rows = (await db.execute(
+        select(*QUEUE_COLUMNS, models.Ticket.duplicate_of_id).where(models.Ticket.id.in_(list(similarity)))
+    )).all() if similarity else []
+    items = sorted(
+        ({**row._mapping, "similarity": round(similarity[row.id], 4)} for row in rows),
+        key=lambda item: item["similarity"], reverse=True
+    )
+
+    cluster_id = ticket.duplicate_of_id or ticket.id
+    duplicates = (await db.execute(
+        select(func.count(models.Ticket.id)).where(models.Ticket.duplicate_of_id == cluster_id)
+    )).scalar() or 0
+    return {"ticket_id": ticket_id, "cluster_id": cluster_id, "duplicates": duplicates, "items": items}
+
 # --- SHARED: Get Just Messages ---
 @router.get("/{ticket_id}/messages")
-async def get_messages(ticket_id: int, db: Session = Depends(get_db)):
-    """Fetch history, ordered so newest messages appear at the bottom."""
-    return db.query(models.Message).filter(
-        models.Message.ticket_id == int(ticket_id)
-    ).order_by(models.Message.created_at.asc()).all()
+async def get_messages(
+    ticket_id: int,
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Fetch history, ordered so newest messages appear at the bottom. Pass the
+    last seen message id as `after_id` (or a timestamp as `since`) to get only
+    newer messages; an unchanged thread answers If-None-Match with 304.
+    """
+    count, max_id = await _thread_version(db, ticket_id)
+    etag = f'W/"thread-{ticket_id}-{count}-{max_id}-{after_id}-{since.isoformat() if since else ""}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return await _thread_messages(db, ticket_id, after_id, since)
 
 # --- CUSTOMER: Raise Ticket ---
 @router.post("/raise")
@@ -90,63 +499,138 @@ async def raise_ticket(
     subject: str = Form(...),
     message: str = Form(...),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user) 
 ):
-    file_save_path = None
+    # Backpressure: refuse new work while the triage queue is saturated
+    if triage_pool.is_saturated():
+        raise HTTPException(
+            status_code=503,
+            detail="Triage queue is full. Please retry shortly.",
+            headers={"Retry-After": "30"}
+        )
+
+    stored = None
     if file and file.filename:
-        upload_dir = "app/temp_uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_save_path = os.path.join(upload_dir, file.filename)
-        with open(file_save_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Streamed to disk in chunks and stored by content hash (identical uploads share one file)
+        try:
+            stored = await save_upload(file)
+        except AttachmentTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
 
     try:
-        triage = agent_triage(file_save_path, message)
-        
-        raw_summary = triage.get('ai_summary', "No summary provided")
-        
-        if isinstance(raw_summary, list):
-            final_summary = " ".join(raw_summary)
-        else:
-            final_summary = str(raw_summary)
-
+        # Persist immediately; category, priority and ai_summary are filled in by the triage worker
         new_ticket = models.Ticket(
             subject=subject,
             message=message,
-            file_path=file_save_path, 
-            category=triage.get('assigned_to', 'IT'),
-            priority=triage.get('priority', 'Medium'),
-            ai_summary=final_summary,
+            file_path=stored.path if stored else None,
+            file_name=stored.filename if stored else None,
+            file_hash=stored.sha256 if stored else None,
+            file_size=stored.size if stored else None,
             customer_id=current_user.id,
-            status="Open"
+            status="Open",
+            triage_status=TRIAGE_PENDING
         )
         db.add(new_ticket)
-        db.commit()
-        return {"status": "success", "ticket_id": new_ticket.id}
+        # Assigns the id the search index is keyed on
+        await db.flush()
+        for stmt in counter_statements(db, None, ticket_snapshot(new_ticket)) + ticket_index_statements(db, [new_ticket]):
+            await db.execute(stmt)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Raise Ticket Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
 
+    publish_ticket_event("ticket.created", new_ticket.id, new_ticket.customer_id, {
+        "subject": new_ticket.subject,
+        "status": new_ticket.status,
+        "triage_status": new_ticket.triage_status,
+        "created_at": new_ticket.created_at,
+    })
+
+    if not triage_pool.submit(new_ticket.id):
+        print(f"Raise Ticket Warning: triage queue full, ticket {new_ticket.id} left pending for the next sweep")
+
+    return {"status": "success", "ticket_id": new_ticket.id, "triage_status": TRIAGE_PENDING}
+
+# --- SHARED: Poll Background Triage Progress ---
+@router.get("/{ticket_id}/triage")
+async def get_triage_status(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Lets the frontend poll until the AI triage fields are available."""
+    ticket = await db.get(models.Ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+    return {
+        "ticket_id": ticket.id,
+        "triage_status": ticket.triage_status,
+        "category": ticket.category,
+        "priority": ticket.priority,
+        "ai_summary": ticket.ai_summary,
+        "queue_depth": triage_pool.depth()
+    }
+
+# Compare-and-set attempts when a ticket changes between reading and writing
+TICKET_WRITE_ATTEMPTS = 3
+# Read alongside the counted fields and guarded by the write: counters and agent workload depend on them
+TICKET_GUARD_FIELDS = ("first_responder_id", "triage_source")
+
+async def _write_ticket(db: AsyncSession, ticket_id: int, change):
+    """
+    Loads a ticket, lets `change(ticket)` edit it (raising HTTPException to
+    refuse) and writes the edited columns with a compare-and-set UPDATE on the
+    values they were derived from, together with the matching counter deltas.
+    When another request changed the ticket in between, it re-reads and
+    re-applies instead of drifting the stats. `change` returns extra statements
+    to run in the same transaction; the caller commits. Returns the updated
+    ticket (detached).
+    """
+    columns = [column.name for column in models.Ticket.__table__.columns]
+    for _ in range(TICKET_WRITE_ATTEMPTS):
+        ticket = await db.get(models.Ticket, ticket_id)
+        if not ticket:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        # Edits are written by the guarded UPDATE below, never by an ORM flush
+        db.expunge(ticket)
+        read = {column: getattr(ticket, column) for column in columns}
+        before = ticket_snapshot(ticket)
+        statements = change(ticket) or []
+        values = {column: getattr(ticket, column) for column in columns if getattr(ticket, column) != read[column]}
+        if values:
+            guard = {**before, **{field: read[field] for field in TICKET_GUARD_FIELDS}}
+            if (await db.execute(ticket_update(ticket_id, guard, values))).rowcount != 1:
+                await db.rollback()
+                continue
+            statements = counter_statements(db, before, snapshot_after(before, values)) + statements
+        for stmt in statements:
+            await db.execute(stmt)
+        return ticket
+    raise HTTPException(status_code=409, detail="The ticket is being updated by someone else. Please try again.")
+
 # --- SHARED: Send Message in Thread ---
 @router.post("/{ticket_id}/message")
 async def send_message(
     ticket_id: int, 
     text: str = Form(...), 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
+    def change(ticket):
+        # --- LOCK CHECK: Prevent messages if status is Completed ---
+        if ticket.status == "Completed":
+            raise HTTPException(
+                status_code=403, 
+                detail="This ticket is closed and cannot receive new messages."
+            )
+        if current_user.role != "agent":
+            return []
+        if ticket.status == "Open":
+            ticket.status = "In Progress"
+        stmt = first_response_statement(db, ticket, current_user.id)
+        return [stmt] if stmt is not None else []
 
-    # --- LOCK CHECK: Prevent messages if status is Completed ---
-    if ticket.status == "Completed":
-        raise HTTPException(
-            status_code=403, 
-            detail="This ticket is closed and cannot receive new messages."
-        )
+    ticket = await _write_ticket(db, ticket_id, change)
 
     new_msg = models.Message(
         ticket_id=ticket_id,
@@ -155,13 +639,24 @@ async def send_message(
         text=text
     )
     db.add(new_msg)
-    
-    if current_user.role == "agent" and ticket.status == "Open":
-        ticket.status = "In Progress"
+    await db.flush()
+    for stmt in message_index_statements(db, new_msg):
+        await db.execute(stmt)
             
-    db.commit()
+    await db.commit()
+    publish_ticket_event("message.created", ticket.id, ticket.customer_id, {
+        "id": new_msg.id,
+        "sender_role": new_msg.sender_role,
+        "sender_name": new_msg.sender_name,
+        "text": new_msg.text,
+        "created_at": new_msg.created_at,
+        "ticket_status": ticket.status,
+    })
     return {"status": "success"}
 
+# Fire-and-forget work started by requests (classifier learning), kept alive until done
+_background_tasks = set()
+
 # --- AGENT: Update Ticket (Overrule AI) ---
 @router.put("/update/{ticket_id}")
 async def update_ticket(
@@ -169,21 +664,58 @@ async def update_ticket(
     category: str = Form(...), 
     priority: str = Form(...), 
     status: str = Form(...),
-    db: Session = Depends(get_db)
+    confirm_labels: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    # --- LOCK CHECK: Prevent editing or reopening if already Completed ---
-    if ticket.status == "Completed":
-        raise HTTPException(
-            status_code=403, 
-            detail="Completed tickets are locked and cannot be edited or reopened."
+    """
+    Agent edit of a ticket's labels and status. Changed labels (or unchanged
+    ones the agent confirms with confirm_labels) train the local classifier.
+    """
+    learning = {}
+
+    def change(ticket):
+        # --- LOCK CHECK: Prevent editing or reopening if already Completed ---
+        if ticket.status == "Completed":
+            raise HTTPException(
+                status_code=403, 
+                detail="Completed tickets are locked and cannot be edited or reopened."
+            )
+
+        # Agent-reviewed labels train the local pre-classifier; a re-correction replaces the earlier example
+        stored_labels = (ticket.category, ticket.priority)
+        previous_labels = stored_labels if ticket.triage_source == SOURCE_AGENT else None
+        learning.update(
+            should_learn=stored_labels != (category, priority) or confirm_labels,
+            previous_labels=previous_labels
         )
-    
-    ticket.category = category
-    ticket.priority = priority
-    ticket.status = status
-    db.commit()
+
+        ticket.category = category
+        ticket.priority = priority
+        ticket.status = status
+        # The agent has triaged it; keeps the background worker from overwriting these labels
+        if ticket.triage_status in (TRIAGE_PENDING, TRIAGE_IMPORT_PENDING, TRIAGE_FAILED):
+            ticket.triage_status = TRIAGE_DONE
+        if learning["should_learn"]:
+            ticket.triage_source = SOURCE_AGENT
+            ticket.triage_confidence = None
+        # Completing a ticket moves it from the first responder's open to completed workload
+        if status == "Completed" and ticket.first_responder_id is not None:
+            return [workload_statement(db, ticket.first_responder_id, open_tickets=-1, completed_tickets=1)]
+        return []
+
+    ticket = await _write_ticket(db, ticket_id, change)
+    should_learn, previous_labels = learning["should_learn"], learning["previous_labels"]
+    await db.commit()
+    if should_learn:
+        task = asyncio.create_task(asyncio.to_thread(
+            learn_from_review, ticket_text(ticket.subject, ticket.message), category, priority, previous_labels
+        ))
+        # The loop only keeps weak references to tasks
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    publish_ticket_event("ticket.updated", ticket.id, ticket.customer_id, {
+        "category": ticket.category,
+        "priority": ticket.priority,
+        "status": ticket.status,
+    })
     return {"message": "Ticket updated successfully"} 
\ No newline at end of file
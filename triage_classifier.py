@@ -0,0 +1,223 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+import numpy as np
+from app.services.embedding_service import embed_texts
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single dev server process, the thread lock is enough
+    fcntl = None
+
+# Classifier configuration (override via environment)
+TRIAGE_CLASSIFIER_ENABLED = os.getenv("TRIAGE_CLASSIFIER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Both category and priority must reach this confidence or the ticket goes to the LLM
+TRIAGE_CLASSIFIER_THRESHOLD = float(os.getenv("TRIAGE_CLASSIFIER_THRESHOLD", "0.85"))
+# Every label of a field needs this many agent-reviewed examples before it is trusted
+TRIAGE_CLASSIFIER_MIN_EXAMPLES = int(os.getenv("TRIAGE_CLASSIFIER_MIN_EXAMPLES", "20"))
+# Softmax temperature over cosine similarities; lower is more decisive
+TRIAGE_CLASSIFIER_TEMPERATURE = float(os.getenv("TRIAGE_CLASSIFIER_TEMPERATURE", "0.05"))
+TRIAGE_CLASSIFIER_PATH = os.getenv("TRIAGE_CLASSIFIER_PATH", "./local_rag_db/triage_centroids.json")
+
+# Ticket.triage_source values
+SOURCE_CLASSIFIER = "classifier"
+SOURCE_LLM = "llm"
+SOURCE_AGENT = "agent"
+SOURCE_IMPORT = "import"
+SOURCE_DUPLICATE = "duplicate"
+
+FIELDS = ("category", "priority")
+
+
+def ticket_text(subject, message):
+    return f"{subject or ''}\n{message or ''}".strip()
+
+
+def local_summary(message, max_chars=200):
+    """Stand-in summary for tickets the LLM never saw: the opening of the message."""
+    message = " ".join((message or "").split())
+    return message if len(message) <= max_chars else message[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+@dataclass
+class Decision:
+    category: str
+    priority: str
+    confidence: float
+
+
+class CentroidClassifier:
+    """
+    Nearest-centroid classifier over MiniLM embeddings of agent-reviewed
+    tickets. Keeps a running sum and count per label, so learning from a
+    correction is O(1) and no training pass is needed. Persisted as JSON
+    shared by all workers: updates are applied to the file's latest contents
+    under an exclusive file lock, and reads reload it after another worker wrote.
+    """
+
+    def __init__(self, path=TRIAGE_CLASSIFIER_PATH, threshold=TRIAGE_CLASSIFIER_THRESHOLD,
+                 min_examples=TRIAGE_CLASSIFIER_MIN_EXAMPLES, temperature=TRIAGE_CLASSIFIER_TEMPERATURE):
+        self.path = path
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self.temperature = temperature
+        self._lock = threading.Lock()
+        self._labels = None  # field -> label -> {"sum": np.ndarray, "count": int}
+        self._loaded_signature = None
+
+    def _signature(self):
+        """Identifies the file version on disk; every save replaces the file."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        signature = self._signature()
+        if self._labels is None or signature != self._loaded_signature:
+            self._loaded_signature = signature
+            self._labels = {field: {} for field in FIELDS}
+            if signature is not None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                for field in FIELDS:
+                    for label, entry in stored.get(field, {}).items():
+                        self._labels[field][label] = {"sum": np.array(entry["sum"], dtype=np.float32), "count": entry["count"]}
+        return self._labels
+
+    @contextmanager
+    def _update(self):
+        """
+        Yields the latest labels for a change and saves them. The file is re-read
+        under the lock, so concurrent workers merge instead of the last one winning.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._labels = None
+                yield self._load()
+                self._save()
+            except BaseException:
+                # Never keep a half-applied change in memory
+                self._labels = None
+                raise
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        stored = {
+            field: {label: {"sum": entry["sum"].tolist(), "count": entry["count"]} for label, entry in labels.items()}
+            for field, labels in self._labels.items()
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.path)
+        self._loaded_signature = self._signature()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _centroids(self, field):
+        """(labels, unit centroid matrix) or None while any label is under-trained."""
+        labels = self._load()[field]
+        if len(labels) < 2 or any(entry["count"] < self.min_examples for entry in labels.values()):
+            return None
+        names = sorted(labels)
+        return names, np.stack([self._unit(labels[name]["sum"]) for name in names])
+
+    def _predict(self, centroids, unit_embeddings):
+        names, matrix = centroids
+        scores = unit_embeddings @ matrix.T / self.temperature
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        return [(names[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    @staticmethod
+    def _add(labels, embedding, values, sign):
+        for field, label in zip(FIELDS, values):
+            entry = labels[field].setdefault(label, {"sum": np.zeros_like(embedding), "count": 0})
+            entry["sum"] = entry["sum"] + sign * embedding
+            entry["count"] += sign
+            if entry["count"] <= 0:
+                del labels[field][label]
+
+    def classify_many(self, texts, embeddings=None):
+        """
+        One Decision (or None when not confident) per text. Embeddings are
+        computed in a single batch unless the caller already has them;
+        nothing is embedded until both fields have enough training data.
+        """
+        if not TRIAGE_CLASSIFIER_ENABLED or not texts:
+            return [None] * len(texts)
+        with self._lock:
+            category_centroids = self._centroids("category")
+            priority_centroids = self._centroids("priority")
+        if category_centroids is None or priority_centroids is None:
+            return [None] * len(texts)
+
+        try:
+            unit = np.stack([self._unit(e) for e in (embeddings if embeddings is not None else embed_texts(texts))])
+        except Exception as e:
+            # Never block triage on the classifier; the LLM path still works
+            print(f"Triage Classifier Error: {str(e)}")
+            return [None] * len(texts)
+        decisions = []
+        for (category, c_conf), (priority, p_conf) in zip(
+            self._predict(category_centroids, unit), self._predict(priority_centroids, unit)
+        ):
+            confidence = min(c_conf, p_conf)
+            decisions.append(Decision(category, priority, confidence) if confidence >= self.threshold else None)
+        return decisions
+
+    def classify(self, text, embedding=None):
+        return self.classify_many([text], None if embedding is None else [embedding])[0]
+
+    def learn(self, text, category, priority, previous=None):
+        """
+        Adds an agent-reviewed ticket to the centroids. `previous` is the
+        (category, priority) the same ticket was learned with before, which is
+        withdrawn so a re-correction does not count twice.
+        """
+        embedding = self._unit(embed_texts([text])[0])
+        with self._lock, self._update() as labels:
+            if previous is not None:
+                self._add(labels, embedding, previous, -1)
+            self._add(labels, embedding, (category, priority), 1)
+
+    def learn_many(self, texts, categories, priorities):
+        """Batch form of `learn` for labelled imports; embeds and saves once."""
+        if not texts:
+            return
+        embeddings = [self._unit(e) for e in embed_texts(texts)]
+        with self._lock, self._update() as labels:
+            for embedding, category, priority in zip(embeddings, categories, priorities):
+                self._add(labels, embedding, (category, priority), 1)
+
+    def stats(self):
+        with self._lock:
+            labels = self._load()
+            return {field: {label: entry["count"] for label, entry in labels[field].items()} for field in FIELDS}
+
+
+triage_classifier = CentroidClassifier()
+
+
+def learn_from_review(text, category, priority, previous=None):
+    """Background-safe wrapper used by the update endpoint."""
+    try:
+        triage_classifier.learn(text, category, priority, previous)
+    except Exception as e:
+        print(f"Triage Classifier Error: {str(e)}")
@@ -0,0 +1,286 @@
+import os
+import asyncio
+from sqlalchemy import or_
+from app.database import SessionLocal
+from app import models
+from app.services.agent_logic import agent_triage
+from app.services.llm_gateway import LLMUnavailable
+from app.services.events import publish_ticket_event
+from app.services.metrics import stage, gauge
+from app.services.ticket_stats import ticket_snapshot, counter_statements, ticket_update, snapshot_after
+from app.services.ticket_search import ticket_index_statements
+from app.services.triage_classifier import (
+    triage_classifier, ticket_text, local_summary, SOURCE_CLASSIFIER, SOURCE_LLM, SOURCE_DUPLICATE, SOURCE_AGENT
+)
+from app.services.ticket_similarity import embed_ticket, index_ticket, find_duplicate
+
+# Triage states stored on Ticket.triage_status
+TRIAGE_PENDING = "Pending triage"
+TRIAGE_DONE = "Triaged"
+TRIAGE_FAILED = "Triage failed"
+# Imported tickets waiting for the batched import job; the worker and its sweep leave them alone
+TRIAGE_IMPORT_PENDING = "Import pending"
+
+# Pool configuration (override via environment)
+TRIAGE_WORKERS = int(os.getenv("TRIAGE_WORKERS", "4"))
+TRIAGE_QUEUE_SIZE = int(os.getenv("TRIAGE_QUEUE_SIZE", "500"))
+TRIAGE_MAX_RETRIES = int(os.getenv("TRIAGE_MAX_RETRIES", "3"))
+TRIAGE_RETRY_BACKOFF = float(os.getenv("TRIAGE_RETRY_BACKOFF", "2.0"))
+# Seconds between sweeps that re-queue tickets left pending (full queue, restart)
+TRIAGE_SWEEP_INTERVAL = float(os.getenv("TRIAGE_SWEEP_INTERVAL", "60"))
+# Compare-and-set attempts when the ticket changes between reading and writing
+TRIAGE_WRITE_ATTEMPTS = 3
+
+
+def _is_triageable(ticket):
+    # Agent decisions always win over background triage
+    return ticket is not None and ticket.triage_status == TRIAGE_PENDING and ticket.triage_source != SOURCE_AGENT
+
+
+def _load_pending(ticket_id: int):
+    """A detached copy of the ticket if it still needs triage, else None."""
+    db = SessionLocal()
+    try:
+        ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
+        if not _is_triageable(ticket):
+            return None
+        db.expunge(ticket)
+        return ticket
+    finally:
+        db.close()
+
+
+def _store_triage(ticket_id: int, values: dict):
+    """
+    Writes a triage result if the ticket is still waiting for one. The row is
+    re-read and written with a compare-and-set UPDATE, so an agent edit made
+    while the LLM was working is never overwritten and counters move exactly
+    once. Returns the updated (detached) ticket, or None when it was skipped.
+    """
+    db = SessionLocal()
+    try:
+        for _ in range(TRIAGE_WRITE_ATTEMPTS):
+            ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
+            if not _is_triageable(ticket):
+                return None
+            before = ticket_snapshot(ticket)
+            guard = (
+                models.Ticket.triage_status == TRIAGE_PENDING,
+                or_(models.Ticket.triage_source.is_(None), models.Ticket.triage_source != SOURCE_AGENT),
+            )
+            if db.execute(ticket_update(ticket_id, before, values, *guard)).rowcount != 1:
+                # Changed between the read and the write: re-read and try again
+                db.rollback()
+                continue
+            db.expunge(ticket)
+            for field, value in values.items():
+                setattr(ticket, field, value)
+            for stmt in counter_statements(db, before, snapshot_after(before, values)) + ticket_index_statements(db, [ticket]):
+                db.execute(stmt)
+            db.commit()
+            return ticket
+        return None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _triage_ticket(ticket_id: int):
+    """Triages one ticket (duplicate reuse, local classifier, then the LLM) and stores the result."""
+    ticket = _load_pending(ticket_id)
+    if ticket is None:
+        return
+
+    # No transaction is held while the model or the LLM runs. One embedding
+    # serves duplicate detection, the classifier and similar-ticket lookup.
+    with stage("ticket_embedding"):
+        embedding = embed_ticket(ticket)
+    # Indexed before any triage write so similar-ticket lookups see it even when
+    # triage fails or is skipped for an agent edit. Duplicate lookup excludes the ticket itself.
+    if embedding is not None:
+        try:
+            index_ticket(ticket, embedding)
+        except Exception as e:
+            print(f"Ticket Embedding Error: {str(e)}")
+    with stage("duplicate_lookup"):
+        db = SessionLocal()
+        try:
+            duplicate = find_duplicate(db, ticket, embedding)
+        finally:
+            db.close()
+    decision = None
+    if duplicate is None:
+        # Confident local prediction next; the LLM only sees ambiguous tickets
+        with stage("triage_classifier"):
+            decision = triage_classifier.classify(ticket_text(ticket.subject, ticket.message), embedding)
+    if duplicate is not None:
+        # Same incident as a recent open ticket: reuse its labels instead of a new LLM call.
+        # Its summary describes another customer's ticket, so this one gets its own.
+        original, similarity = duplicate
+        values = {
+            "category": original.category,
+            "priority": original.priority,
+            "ai_summary": local_summary(ticket.message),
+            "triage_source": SOURCE_DUPLICATE,
+            "triage_confidence": similarity,
+            "duplicate_of_id": original.duplicate_of_id or original.id,
+        }
+    elif decision is not None:
+        values = {
+            "category": decision.category,
+            "priority": decision.priority,
+            "ai_summary": local_summary(ticket.message),
+            "triage_source": SOURCE_CLASSIFIER,
+            "triage_confidence": decision.confidence,
+        }
+    else:
+        with stage("triage_llm"):
+            triage = agent_triage(ticket.file_path, ticket.message)
+
+        raw_summary = triage.get('ai_summary', "No summary provided")
+        if isinstance(raw_summary, list):
+            final_summary = " ".join(raw_summary)
+        else:
+            final_summary = str(raw_summary)
+
+        values = {
+            "category": triage.get('assigned_to', 'IT'),
+            "priority": triage.get('priority', 'Medium'),
+            "ai_summary": final_summary,
+            "triage_source": SOURCE_LLM,
+            "triage_confidence": None,
+        }
+    values["triage_status"] = TRIAGE_DONE
+
+    ticket = _store_triage(ticket_id, values)
+    if ticket is None:
+        print(f"Triage Skipped (ticket {ticket_id}): changed by an agent while triage was running")
+        return
+    publish_ticket_event("ticket.triaged", ticket.id, ticket.customer_id, {
+        "category": ticket.category,
+        "priority": ticket.priority,
+        "ai_summary": ticket.ai_summary,
+        "triage_status": ticket.triage_status,
+        "triage_source": ticket.triage_source,
+        "duplicate_of_id": ticket.duplicate_of_id,
+    })
+
+
+def _mark_failed(ticket_id: int):
+    """Flags a ticket whose triage exhausted all retries so agents can triage it by hand."""
+    ticket = _store_triage(ticket_id, {
+        "triage_status": TRIAGE_FAILED,
+        "ai_summary": "AI triage could not be completed. Please triage manually.",
+    })
+    if ticket is not None:
+        publish_ticket_event("ticket.triage_failed", ticket.id, ticket.customer_id, {
+            "triage_status": ticket.triage_status,
+        })
+
+
+def _pending_ticket_ids(limit: int):
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Ticket.id).filter(
+            models.Ticket.triage_status == TRIAGE_PENDING
+        ).order_by(models.Ticket.id.asc()).limit(limit).all()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+
+class TriagePool:
+    """
+    Bounded queue of ticket ids drained by a fixed number of async workers.
+    The LLM call and attachment parsing run in threads so the event loop stays free.
+    """
+
+    def __init__(self, workers=TRIAGE_WORKERS, queue_size=TRIAGE_QUEUE_SIZE, max_retries=TRIAGE_MAX_RETRIES):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.queue = None
+        self._tasks = []
+        # Queued or in-progress ids, so the sweep never enqueues a ticket twice
+        self._active = set()
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        # Its first pass picks up tickets left pending by a previous shutdown
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def is_saturated(self):
+        return self.queue is not None and self.queue.full()
+
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def submit(self, ticket_id: int):
+        """Enqueues a ticket for triage. Returns False when the queue is full."""
+        if self.queue is None:
+            return False
+        if ticket_id in self._active:
+            return True
+        try:
+            self.queue.put_nowait(ticket_id)
+        except asyncio.QueueFull:
+            return False
+        self._active.add(ticket_id)
+        return True
+
+    async def _sweep(self):
+        """
+        Re-queues pending tickets that never made it into the queue (it was
+        full when they were raised, or the process restarted). Waits for room
+        instead of dropping them.
+        """
+        while True:
+            try:
+                for ticket_id in await asyncio.to_thread(_pending_ticket_ids, self.queue_size * 2):
+                    if ticket_id not in self._active:
+                        self._active.add(ticket_id)
+                        await self.queue.put(ticket_id)
+            except Exception as e:
+                print(f"Triage Sweep Error: {str(e)}")
+            await asyncio.sleep(TRIAGE_SWEEP_INTERVAL)
+
+    async def _worker(self):
+        while True:
+            ticket_id = await self.queue.get()
+            try:
+                await self._process(ticket_id)
+            finally:
+                self._active.discard(ticket_id)
+                self.queue.task_done()
+
+    async def _process(self, ticket_id: int):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await asyncio.to_thread(_triage_ticket, ticket_id)
+                return
+            except LLMUnavailable as e:
+                # The gateway already retried with backoff; retrying here would multiply upstream calls
+                print(f"Triage Error (ticket {ticket_id}): {str(e)}")
+                break
+            except Exception as e:
+                print(f"Triage Error (ticket {ticket_id}, attempt {attempt}): {str(e)}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(TRIAGE_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+        try:
+            await asyncio.to_thread(_mark_failed, ticket_id)
+        except Exception as e:
+            print(f"Triage Error (ticket {ticket_id}): could not mark as failed: {str(e)}")
+
+
+triage_pool = TriagePool()
+gauge("triage_queue_depth", "Tickets waiting for background triage", triage_pool.depth)